@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# tools/ 下的脚本以同级模块互相导入
+TOOLS_DIR = os.path.join(ROOT, 'tools')
+if TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def stub_server(tmp_path):
+    """启动 tools/stub_openai_server.py：start(*参数) 返回 base_url，测试结束后关闭"""
+    servers = []
+
+    def start(*args):
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(TOOLS_DIR, 'stub_openai_server.py'), '--port', str(port),
+             '--data-dir', str(tmp_path / f'stub-{port}'), *args],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        servers.append(server)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return f"http://127.0.0.1:{port}/v1"
+            except OSError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError('stub server did not start')
+                time.sleep(0.05)
+
+    yield start
+    for server in servers:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+@pytest.fixture
+def hexo_site(tmp_path):
+    """create(titles) 创建一个带脚手架、提示词和数据集 dataset.json 的临时 Hexo 站点，返回站点目录"""
+
+    def create(titles, category='python'):
+        site = tmp_path / 'site'
+        site.mkdir()
+        shutil.copy(os.path.join(ROOT, '_config.yml'), site / '_config.yml')
+        shutil.copytree(os.path.join(ROOT, 'scaffolds'), site / 'scaffolds')
+        (site / 'source' / '_posts').mkdir(parents=True)
+        (site / 'prompt.txt').write_text('You write technical blog posts.\n', encoding='utf-8')
+        posts = [{'index': i, 'post_category': category, 'filename': f'post-{i}.md', 'post_title': title,
+                  'post_file': f'source/_posts/post-{i}.md', 'created': False}
+                 for i, title in enumerate(titles, 1)]
+        (site / 'dataset.json').write_text(json.dumps(posts, indent=4), encoding='utf-8')
+        return site
+
+    return create
+
+
+@pytest.fixture
+def run_generator(tmp_path):
+    """run(site, base_url, *参数) 在站点目录中针对桩服务运行 generate_articles_pro.py"""
+
+    def run(site, base_url, *args):
+        env = dict(os.environ, OPENAI_BASE_URL=base_url, OPENAI_API_KEY='stub',
+                   LLM_CACHE_DIR=str(tmp_path / 'cache'), ARTICLE_PARTIAL_DIR=str(tmp_path / 'partials'))
+        result = subprocess.run(
+            [sys.executable, os.path.join(TOOLS_DIR, 'generate_articles_pro.py'), '--prompt-file', 'prompt.txt',
+             *args], cwd=site, env=env, capture_output=True, text=True, timeout=120)
+        assert result.returncode == 0, result.stdout + result.stderr
+        return result
+
+    return run
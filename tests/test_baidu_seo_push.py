@@ -0,0 +1,84 @@
+import json
+
+from baidu_seo_push import PushJournal, batch_push_urls, create_session, ACCEPTED, NOT_VALID, UNKNOWN
+
+SITE = 'https://gitceo.com'
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """按顺序返回预设的响应，记录每次推送的链接"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.batches = []
+
+    def post(self, endpoint, params, data, timeout):
+        self.batches.append(data.decode('utf-8').split('\n'))
+        return self.responses.pop(0)
+
+
+def write_urls(tmp_path, urls):
+    path = tmp_path / 'urls.txt'
+    path.write_text(''.join(f"{url}\n" for url in urls), encoding='utf-8')
+    return str(path)
+
+
+def test_session_does_not_resend_posts_on_server_errors():
+    retry = create_session().get_adapter(SITE).max_retries
+    assert retry.connect == 3
+    assert retry.read == 0
+    assert retry.status == 0
+
+
+def test_server_error_marks_batch_unknown_and_stops(tmp_path):
+    urls = [f"{SITE}/a", f"{SITE}/b", f"{SITE}/c"]
+    file_path = write_urls(tmp_path, urls)
+    journal_file = str(tmp_path / 'journal.jsonl')
+    session = FakeSession(FakeResponse(200, {'success': 1, 'remain': 10}), FakeResponse(503, {}))
+    stats = batch_push_urls(SITE, 'token', file_path, batch_size=1, journal_file=journal_file, session=session)
+
+    # 5xx 的那一批不在本次运行中重发，后面的批次也不再推送
+    assert session.batches == [urls[:1], urls[1:2]]
+    assert (stats['requests'], stats['accepted'], stats['unknown']) == (2, 1, 1)
+    with open(journal_file, encoding='utf-8') as f:
+        assert [json.loads(line)['status'] for line in f] == [ACCEPTED, UNKNOWN]
+    assert open(file_path, encoding='utf-8').read() == f"{urls[1]}\n{urls[2]}\n"
+
+    # 结果未知的链接由下次运行重新推送
+    session = FakeSession(FakeResponse(200, {'success': 2, 'remain': 8}))
+    stats = batch_push_urls(SITE, 'token', file_path, journal_file=journal_file, session=session)
+    assert session.batches == [urls[1:]]
+    assert open(file_path, encoding='utf-8').read() == ''
+
+
+def test_only_accepted_urls_are_skipped_on_reload(tmp_path):
+    urls = [f"{SITE}/a", "https://other.com/b", f"{SITE}/c"]
+    file_path = write_urls(tmp_path, urls)
+    journal_file = str(tmp_path / 'journal.jsonl')
+    session = FakeSession(FakeResponse(200, {'success': 1, 'remain': 0, 'not_same_site': [urls[1]],
+                                             'not_valid': []}))
+    batch_push_urls(SITE, 'token', file_path, journal_file=journal_file, session=session)
+
+    with open(journal_file, encoding='utf-8') as f:
+        statuses = [json.loads(line)['status'] for line in f]
+    assert statuses == [ACCEPTED, 'not_same_site']
+    assert PushJournal(journal_file).load() == {urls[0]}
+    assert open(file_path, encoding='utf-8').read() == f"{urls[1]}\n{urls[2]}\n"
+
+    # 无效链接在下次运行时重新推送
+    session = FakeSession(FakeResponse(200, {'success': 1, 'remain': 5, 'not_valid': [urls[1]]}))
+    stats = batch_push_urls(SITE, 'token', file_path, journal_file=journal_file, session=session)
+    assert session.batches == [urls[1:]]
+    assert (stats['accepted'], stats['rejected']) == (1, 1)
+    assert open(file_path, encoding='utf-8').read() == f"{urls[1]}\n"
+    assert NOT_VALID in open(journal_file, encoding='utf-8').read()
@@ -0,0 +1,83 @@
+import pytest
+
+import dedup_titles
+from dedup_titles import DEFAULT_THRESHOLD, MinHasher, find_clusters, normalize, shingles
+
+# 同一主题的入门指南，措辞不同但应当判为重复（tools/titles 中的实际标题）
+JQUERY_UI_GUIDES = [
+    "A Beginner's Guide to jQuery UI: Start Building Interactive Interfaces",
+    "The Ultimate Guide to jQuery UI for Beginners: Learn Everything You Need",
+    "Mastering jQuery UI: Your Path from Zero to Hero in UI Development",
+    "Getting Started with jQuery UI: Tips and Tricks for New Developers",
+    "An Easy Start to Learning jQuery UI: Tutorials for Beginners",
+]
+DOCKER_GUIDES = [
+    "Getting Started with Docker: A Beginner's Guide to Containerization",
+    "Docker Basics: Learn to Build & Deploy Containers from Scratch",
+    "How to Use Docker: A Comprehensive Guide for New Developers",
+    "Mastering Docker: Step-by-Step Instructions for Absolute Beginners",
+    "The Ultimate Guide to Docker: Learning from the Ground Up",
+]
+# 句式相同但主题不同，不应判为重复
+NEAR_MISSES = [
+    ("JSON 与PHP集成 - 在PHP中使用JSON", "JSON 与Python集成 - 在Python中使用JSON"),
+    ("JavaScript 对象 - 创建和操作对象", "JavaScript 数组 - 创建和操作数组"),
+    ("学习使用 PowerShell 进行自动化任务", "进阶学习：使用 PowerShell 进行 DevOps 自动化"),
+    ("Understanding Docker Networking: A Beginner's Guide",
+     "Beginner’s Guide to Docker Volumes: Managing Data with Ease"),
+    ("A Beginner's Guide to Docker Compose: Orchestrating Your Containers",
+     "Getting Started with Docker: A Beginner's Guide to Containerization"),
+    ("Learn XML: How to validate XML documents with DTD", "A Beginner's Guide to XML: Understanding the Basics"),
+]
+
+
+def similarity(a, b):
+    hasher = MinHasher()
+    return float((hasher.signature(shingles(a)) == hasher.signature(shingles(b))).mean())
+
+
+def test_normalize_keeps_subject_words_outside_boilerplate_phrases():
+    assert normalize("Getting Started with the New Developer Tools") == ['new', 'developer', 'tool']
+    assert normalize("What's New in Python 3.12") == ['new', 'python', '3', '12']
+    assert normalize("Docker for Developers: Containerized Development") == \
+        ['docker', 'developer', 'containerized', 'development']
+
+
+def test_normalize_uses_main_title_of_introductory_titles():
+    assert normalize(JQUERY_UI_GUIDES[0]) == ['jquery', 'ui']
+    assert normalize("Understanding Docker Images: Creating Your First Image from Scratch") == ['docker', 'image']
+    # 主标题只有套话时取整个标题
+    assert normalize("Step-by-Step: Creating and Running Your First Docker Container") == \
+        ['creating', 'running', 'first', 'docker', 'container']
+
+
+def test_normalize_splits_cjk_into_bigrams():
+    assert normalize("从零开始学习 Docker：你的第一步指南") == ['docker']
+    assert normalize("学习使用 PowerShell 进行自动化任务") == ['powershell', '自动', '动化', '化任', '任务']
+    assert normalize("用 XML") == ['用', 'xml']
+
+
+@pytest.mark.parametrize('titles', [JQUERY_UI_GUIDES, DOCKER_GUIDES], ids=['jquery-ui', 'docker'])
+def test_paraphrased_guides_cluster(titles):
+    assert [[i for i, _ in cluster] for cluster in find_clusters(titles)] == [list(range(len(titles)))]
+
+
+@pytest.mark.parametrize('a, b', NEAR_MISSES)
+def test_near_misses_do_not_cluster(a, b):
+    assert similarity(a, b) < DEFAULT_THRESHOLD
+    assert find_clusters([a, b]) == []
+
+
+def test_clusters_only_within_group():
+    titles = DOCKER_GUIDES[:2] + JQUERY_UI_GUIDES[:1]
+    assert find_clusters(titles, groups=['docker', 'containers', 'docker']) == []
+
+
+def test_bucket_members_are_compared_beyond_the_first(monkeypatch):
+    # 所有标题落在同一个桶里：第一个标题与其他标题都不相似，后两个标题仍然要被找出来
+    monkeypatch.setattr(dedup_titles, 'lsh_params', lambda threshold, num_perm: (1, 0))
+    monkeypatch.setattr(dedup_titles, 'MAX_BUCKET_COMPARISONS', 1)
+    titles = ["Kubernetes Operators in Go", "Managing Docker Volumes and Bind Mounts on Linux Servers",
+              "Managing Docker Volumes and Bind Mounts on Linux Hosts"]
+    assert DEFAULT_THRESHOLD <= similarity(titles[1], titles[2]) < 1
+    assert [[i for i, _ in cluster] for cluster in find_clusters(titles)] == [[1, 2]]
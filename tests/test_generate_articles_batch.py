@@ -0,0 +1,22 @@
+import json
+
+TITLES = ["Getting Started with Python Generators", "Understanding Docker Volumes"]
+
+
+def test_batch_mode_end_to_end(stub_server, hexo_site, run_generator):
+    site = hexo_site(TITLES)
+    base_url = stub_server('--batch-delay', '0.1')
+    run_generator(site, base_url, '--batch', '--poll-interval', '0.1', '--dataset-file', 'dataset.json',
+                  '--metrics-file', 'metrics.jsonl')
+
+    with open(site / 'dataset.json', 'r', encoding='utf-8') as f:
+        assert [post['created'] for post in json.load(f)] == [True, True]
+    for i, title in enumerate(TITLES, 1):
+        content = (site / 'source' / '_posts' / f'post-{i}.md').read_text(encoding='utf-8')
+        assert f'### Introduction to {title}' in content
+    assert not (site / 'dataset.json.batch.json').exists()
+    assert not (site / 'dataset.json.batch.jsonl').exists()
+    with open(site / 'metrics.jsonl', 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert sorted(record['label'] for record in records) == sorted(f'撰写文章：{title}' for title in TITLES)
+    assert all(record['status'] == 'ok' for record in records)
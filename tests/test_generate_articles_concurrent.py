@@ -0,0 +1,41 @@
+import json
+import urllib.request
+
+TITLES = [f"Python Topic {i}: Working with Module {i}" for i in range(1, 8)]
+
+
+def stub_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/stub/stats", timeout=10) as response:
+        return json.load(response)
+
+
+def test_concurrent_mode_respects_limit_and_keeps_dataset_order(stub_server, hexo_site, run_generator):
+    site = hexo_site(TITLES)
+    base_url = stub_server('--latency', '0.3')
+    run_generator(site, base_url, '--concurrency', '3', '--dataset-file', 'dataset.json')
+
+    stats = stub_stats(base_url)
+    assert len(stats['requests']) == len(TITLES)
+    # 7 篇文章、3 个 worker：同时进行的请求数达到但不超过上限
+    assert stats['max_in_flight'] == 3
+
+    with open(site / 'dataset.json', 'r', encoding='utf-8') as f:
+        posts = json.load(f)
+    assert [post['post_title'] for post in posts] == TITLES
+    assert all(post['created'] for post in posts)
+    # 每篇文章的内容对应自己的标题，并发写入没有串位
+    for post in posts:
+        content = (site / post['post_file']).read_text(encoding='utf-8')
+        assert f"### Introduction to {post['post_title']}" in content
+
+
+def test_concurrent_mode_skips_created_posts(stub_server, hexo_site, run_generator):
+    site = hexo_site(TITLES[:3])
+    posts = json.loads((site / 'dataset.json').read_text(encoding='utf-8'))
+    posts[1]['created'] = True
+    (site / 'dataset.json').write_text(json.dumps(posts), encoding='utf-8')
+    base_url = stub_server()
+    run_generator(site, base_url, '--concurrency', '4', '--dataset-file', 'dataset.json')
+
+    assert len(stub_stats(base_url)['requests']) == 2
+    assert not (site / posts[1]['post_file']).exists()
@@ -0,0 +1,81 @@
+import os
+import json
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from hexo_scaffold import HexoScaffolder, current_time, render_scaffold, slugize
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'hexo_new')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATE = datetime(2024, 7, 25, 20, 27, 12)
+
+with open(os.path.join(FIXTURES, 'cases.json'), 'r', encoding='utf-8') as f:
+    CASES = json.load(f)
+
+
+def read_scaffold(layout='post'):
+    with open(os.path.join(ROOT, 'scaffolds', f'{layout}.md'), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+# hexo-util test/slugize.spec 中的用例
+@pytest.mark.parametrize('title, expected', [
+    ('foo bar', 'foo-bar'),
+    ('foo bar baz', 'foo-bar-baz'),
+    ('foo~!@#$%^&*()-_+=[]{}|\\;:"\'<>,.?/bar', 'foo-bar'),
+    ('foo\u0000bar', 'foo-bar'),
+    ('-foo bar-', 'foo-bar'),
+    ('Ĩñŧėřñåŧîőñàłĩżâŧĩöñ', 'Internationalization'),
+    ('Ｆｕｌｌｗｉｄｔｈ', 'Fullwidth'),
+    ('你好 世界', '你好-世界'),
+])
+def test_slugize(title, expected):
+    assert slugize(title) == expected
+
+
+@pytest.mark.parametrize('transform, expected', [(0, 'Foo-Bar'), (1, 'foo-bar'), (2, 'FOO-BAR')])
+def test_slugize_transform(transform, expected):
+    assert slugize('Foo Bar', transform) == expected
+
+
+@pytest.mark.parametrize('case', CASES, ids=[case['expected'] for case in CASES])
+def test_slugize_hexo_new_filename(case):
+    assert slugize(case['title']) == case['slug']
+
+
+@pytest.mark.parametrize('case', CASES, ids=[case['expected'] for case in CASES])
+def test_render_scaffold_matches_hexo_new(case):
+    with open(os.path.join(FIXTURES, case['expected']), 'r', encoding='utf-8') as f:
+        expected = f.read()
+    assert render_scaffold(read_scaffold(), {'title': case['title'], 'date': DATE, 'layout': 'post'}) == expected
+
+
+def test_render_scaffold_requires_front_matter():
+    with pytest.raises(ValueError):
+        render_scaffold('title: {{ title }}\n', {'title': 'x', 'date': DATE})
+
+
+def test_current_time_uses_configured_timezone():
+    now = current_time('Asia/Hong_Kong')
+    assert now.utcoffset() == timedelta(hours=8)
+    assert now.microsecond == 0
+    # 无效时区退回本机时区
+    assert current_time('Not/AZone').tzinfo is None
+
+
+def test_create_dates_posts_in_configured_timezone(tmp_path):
+    (tmp_path / '_config.yml').write_text("timezone: 'Asia/Hong_Kong'\nnew_post_name: :title.md\n", encoding='utf-8')
+    (tmp_path / 'scaffolds').mkdir()
+    (tmp_path / 'scaffolds' / 'post.md').write_text(read_scaffold(), encoding='utf-8')
+    scaffolder = HexoScaffolder(str(tmp_path))
+
+    first, second = scaffolder.create_many(['Foo: Bar', 'Foo: Bar'])
+    assert first == os.path.join(str(tmp_path), 'source', '_posts', 'Foo-Bar.md')
+    assert second == os.path.join(str(tmp_path), 'source', '_posts', 'Foo-Bar-1.md')
+    with open(first, 'r', encoding='utf-8') as f:
+        date_line = [line for line in f if line.startswith('date: ')][0]
+    written = datetime.strptime(date_line[6:].strip(), '%Y-%m-%d %H:%M:%S')
+    expected = datetime.now(ZoneInfo('Asia/Hong_Kong')).replace(tzinfo=None)
+    assert abs(written - expected) < timedelta(seconds=5)
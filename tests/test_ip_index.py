@@ -0,0 +1,82 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from ip_index import IPIndex, build_index
+
+LOCATIONS = """geoname_id,locale_code,continent_code,continent_name,country_iso_code,country_name,is_in_european_union
+1814991,en,AS,Asia,CN,China,0
+6252001,en,NA,"North America",US,"United States",0
+2921044,en,EU,Europe,DE,Germany,1
+6255148,en,EU,Europe,,Europe,0
+"""
+IPV4_BLOCKS = """network,geoname_id,registered_country_geoname_id,represented_country_geoname_id,is_anonymous_proxy,is_satellite_provider
+1.0.1.0/24,1814991,1814991,,0,0
+8.8.8.0/24,6252001,6252001,,0,0
+9.0.0.0/8,,2921044,,0,0
+200.0.0.0/16,6255148,6255148,,0,0
+"""
+IPV6_BLOCKS = """network,geoname_id,registered_country_geoname_id,represented_country_geoname_id,is_anonymous_proxy,is_satellite_provider
+2001:db8::/32,2921044,2921044,,0,0
+2400:cb00::/64,1814991,1814991,,0,0
+2400:cb00:0:0:8000::/65,6252001,6252001,,0,0
+"""
+
+
+@pytest.fixture
+def index_file(tmp_path):
+    files = {}
+    for name, content in [('ipv4', IPV4_BLOCKS), ('ipv6', IPV6_BLOCKS), ('locations', LOCATIONS)]:
+        files[name] = tmp_path / f'{name}.csv'
+        files[name].write_text(content, encoding='utf-8')
+    path = str(tmp_path / 'country.idx')
+    assert build_index(files['ipv4'], files['ipv6'], files['locations'], path) == (4, 3)
+    return path
+
+
+def test_lookup_ipv4_ranges(index_file):
+    ips = ['1.0.1.0', '1.0.1.255', '1.0.2.0', '1.0.0.255', '8.8.8.8', '9.255.255.255', '200.0.3.4', '0.0.0.0',
+           '255.255.255.255']
+    # 9.0.0.0/8 has no geoname id and falls back to the registered country; 200.0.0.0/16 only has a continent
+    assert list(IPIndex(index_file).lookup(ips)) == ['CN', 'CN', '--', '--', 'US', 'DE', 'EU', '--', '--']
+
+
+def test_lookup_ipv6_ranges(index_file):
+    ips = ['2001:db8::1', '2001:db8:ffff:ffff:ffff:ffff:ffff:ffff', '2001:db9::', '2400:cb00::1',
+           '2400:cb00::7fff:ffff:ffff:ffff', '2400:cb00::8000:0:0:1', '2400:cb00:0:1::']
+    assert list(IPIndex(index_file).lookup(ips)) == ['DE', 'DE', '--', 'CN', 'CN', 'US', '--']
+
+
+def test_lookup_mixed_batch_and_invalid_addresses(index_file):
+    ips = ['8.8.8.8', '2001:db8::1', '', 'not-an-ip', '1.0.1.7', '::1', None]
+    assert list(IPIndex(index_file).lookup(ips)) == ['US', 'DE', '--', '--', 'CN', '--', '--']
+
+
+@pytest.mark.parametrize('ip', ['134744072', '8.8.2056', '9.1', '0x8.8.8.8', '8.8.8.8 junk'])
+def test_lookup_rejects_non_dotted_quad_ipv4(index_file, ip):
+    # inet_aton would read these as 8.8.8.8 or 9.0.0.1
+    assert list(IPIndex(index_file).lookup([ip, '8.8.8.8'])) == ['--', 'US']
+
+
+def test_tag_cli_appends_country_column(index_file, tmp_path):
+    log_file = tmp_path / 'access.log'
+    log_file.write_text(
+        '2024-05-01T10:00:00 8.8.8.8 GET /\n'
+        '2024-05-01T10:00:01 2001:db8::7 GET /about\n'
+        '2024-05-01T10:00:02 9.1 GET /\n'
+        'truncated\n', encoding='utf-8')
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools', 'ip_index.py')
+    result = subprocess.run(
+        [sys.executable, script, 'tag', str(log_file), '--field', '1', '--separator', '\t',
+         '--index-file', index_file], capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == [
+        '2024-05-01T10:00:00 8.8.8.8 GET /\tUS',
+        '2024-05-01T10:00:01 2001:db8::7 GET /about\tDE',
+        '2024-05-01T10:00:02 9.1 GET /\t--',
+        'truncated\t--',
+    ]
+    assert 'Tagged 4 lines' in result.stderr
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import subprocess
+
+from job_queue import JobQueue, DONE, FAILED, LEASED, PENDING
+
+
+def make_queue(tmp_path, count=1, **kwargs):
+    dataset_file = str(tmp_path / 'dataset.json')
+    posts = [{'filename': f'post-{i}', 'post_title': f'Post {i}', 'created': False} for i in range(count)]
+    (tmp_path / 'dataset.json').write_text(json.dumps(posts), encoding='utf-8')
+    job_queue = JobQueue(str(tmp_path / 'queue.db'), **kwargs)
+    job_queue.import_dataset(dataset_file)
+    return job_queue, dataset_file
+
+
+def expire_leases(job_queue):
+    job_queue.conn.execute("UPDATE jobs SET lease_expires = 0 WHERE status = ?", (LEASED,))
+
+
+def test_expired_lease_is_taken_over_and_old_worker_cannot_complete(tmp_path):
+    job_queue, dataset_file = make_queue(tmp_path)
+    post = job_queue.lease('a')
+    assert job_queue.lease('b') is None
+
+    expire_leases(job_queue)
+    assert job_queue.lease('b')['filename'] == post['filename']
+    assert not job_queue.complete(post, 'a')
+    assert job_queue.complete(post, 'b')
+    assert job_queue.stats()[dataset_file][DONE] == 1
+
+
+def test_lease_expiring_on_last_attempt_moves_job_to_failed(tmp_path):
+    job_queue, dataset_file = make_queue(tmp_path, max_attempts=2)
+    for worker in ('a', 'b'):
+        assert job_queue.lease(worker) is not None
+        expire_leases(job_queue)
+
+    assert job_queue.lease('c') is None
+    assert job_queue.stats()[dataset_file] == {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 1}
+
+    assert job_queue.retry_failed() == 1
+    assert job_queue.lease('c') is not None
+
+
+def test_release_and_reclaim(tmp_path):
+    job_queue, dataset_file = make_queue(tmp_path, count=2, max_attempts=1)
+    first = job_queue.lease('a')
+    job_queue.lease('b')
+    assert job_queue.release(first, 'a')
+    expire_leases(job_queue)
+    assert job_queue.reclaim() == 1
+    assert job_queue.stats()[dataset_file][FAILED] == 2
+
+
+def test_rollback_journal_by_default_and_wal_on_request(tmp_path):
+    job_queue, _ = make_queue(tmp_path)
+    assert job_queue.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+    job_queue.close()
+
+    # WAL 只在显式要求时启用，并保存在数据库文件中
+    JobQueue(str(tmp_path / 'queue.db'), journal_mode='wal').close()
+    job_queue = JobQueue(str(tmp_path / 'queue.db'))
+    assert job_queue.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    job_queue.close()
+
+
+def test_queue_workers_generate_posts(stub_server, hexo_site, run_generator):
+    site = hexo_site(["Python Generators in Depth", "Understanding Docker Volumes"])
+    job_queue = JobQueue(str(site / 'queue.db'))
+    job_queue.import_dataset(str(site / 'dataset.json'))
+    run_generator(site, stub_server(), '--queue', 'queue.db', '--worker-id', 'worker/1')
+
+    assert list(job_queue.stats().values()) == [{PENDING: 0, LEASED: 0, DONE: 2, FAILED: 0}]
+    for i in (1, 2):
+        assert (site / 'source' / '_posts' / f'post-{i}.md').exists()
+    job_queue.close()
+
+
+def test_compact_requires_dataset_file(tmp_path):
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools', 'generate_articles_pro.py')
+    result = subprocess.run([sys.executable, script, '--queue', str(tmp_path / 'queue.db'), '--compact'],
+                            env=dict(os.environ, OPENAI_API_KEY='stub'), capture_output=True, text=True, timeout=60)
+    assert result.returncode == 2
+    assert '--compact requires --dataset-file' in result.stderr
@@ -0,0 +1,27 @@
+from llm_cache import ResponseCache, cache_key
+
+MODELS = ["primary-model", "fallback-model"]
+
+
+def test_lookup_returns_the_model_that_generated_the_content(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(cache_key("fallback-model", "system", "user"), "from fallback", {"model": "fallback-model"})
+    assert cache.lookup(MODELS, "system", "user") == ("from fallback", "fallback-model")
+
+    cache.put(cache_key("primary-model", "system", "user"), "from primary", {"model": "primary-model"})
+    assert cache.lookup(MODELS, "system", "user") == ("from primary", "primary-model")
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_lookup_ignores_fallback_output_stored_under_primary_key(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(cache_key("primary-model", "system", "user"), "mislabeled", {"model": "fallback-model"})
+    assert cache.lookup(MODELS, "system", "user") == (None, None)
+    assert cache.misses == 1
+
+
+def test_lookup_disabled(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(cache_key("primary-model", "system", "user"), "content", {"model": "primary-model"})
+    cache.enabled = False
+    assert cache.lookup(MODELS, "system", "user") == (None, None)
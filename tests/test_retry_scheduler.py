@@ -0,0 +1,103 @@
+import json
+import urllib.request
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from retry_scheduler import RetryScheduler, ContentError, classify_error, RATE_LIMIT, SERVER_ERROR, TIMEOUT
+
+MODELS = ['primary-model', 'fallback-model']
+
+
+def stub_requests(base_url):
+    with urllib.request.urlopen(f"{base_url}/stub/stats", timeout=10) as response:
+        return json.load(response)['requests']
+
+
+def make_request(base_url):
+    """request(model)：向桩服务发起一次非流式请求，空内容视为内容错误"""
+    client = openai.OpenAI(base_url=base_url, api_key='stub', max_retries=0, timeout=10)
+
+    def request(model):
+        response = client.chat.completions.create(
+            model=model, messages=[{"role": "user", "content": "撰写文章：Retry Test"}])
+        content = response.choices[0].message.content
+        if not content:
+            raise ContentError(f"{model} 返回了空内容")
+        return content, model
+
+    return request
+
+
+def test_retries_rate_limit_and_server_error_on_same_model(stub_server):
+    base_url = stub_server('--fail-first', '2', '--fail-kinds', '429,500', '--retry-after', '0.4')
+    scheduler = RetryScheduler(MODELS, max_retries=3, base_delay=0.01)
+    content, model = scheduler.call(make_request(base_url))
+
+    assert model == 'primary-model' and 'Retry Test' in content
+    assert (scheduler.stats['requests'], scheduler.stats['retries'], scheduler.stats['fallbacks']) == (3, 2, 0)
+    assert scheduler.stats['errors'] == {RATE_LIMIT: 1, SERVER_ERROR: 1}
+    requests = stub_requests(base_url)
+    assert [(entry['model'], entry['fault']) for entry in requests] == \
+        [('primary-model', '429'), ('primary-model', '500'), ('primary-model', None)]
+    # 429 之后至少等待 Retry-After；500 之后按 base_delay 退避，远小于 Retry-After
+    assert requests[1]['time'] - requests[0]['time'] >= 0.4
+    assert requests[2]['time'] - requests[1]['time'] < 0.4
+
+
+def test_falls_back_after_max_retries(stub_server):
+    base_url = stub_server('--fail-rate', '1', '--fail-kinds', '503', '--fail-model', 'primary-model')
+    scheduler = RetryScheduler(MODELS, max_retries=2, base_delay=0.01)
+    _, model = scheduler.call(make_request(base_url))
+
+    assert model == 'fallback-model'
+    assert (scheduler.stats['retries'], scheduler.stats['fallbacks'], scheduler.stats['failures']) == (2, 1, 0)
+    assert [entry['model'] for entry in stub_requests(base_url)] == ['primary-model'] * 3 + ['fallback-model']
+
+
+def test_content_error_falls_back_without_retry(stub_server):
+    base_url = stub_server('--fail-rate', '1', '--fail-kinds', 'content_filter', '--fail-model', 'primary-model')
+    scheduler = RetryScheduler(MODELS, max_retries=3, base_delay=0.01)
+    _, model = scheduler.call(make_request(base_url))
+
+    assert model == 'fallback-model'
+    assert (scheduler.stats['retries'], scheduler.stats['fallbacks']) == (0, 1)
+
+
+def test_raises_last_error_when_every_model_fails(stub_server):
+    base_url = stub_server('--fail-rate', '1', '--fail-kinds', '500')
+    scheduler = RetryScheduler(MODELS, max_retries=1, base_delay=0.01)
+    with pytest.raises(openai.InternalServerError):
+        scheduler.call(make_request(base_url))
+
+    assert scheduler.stats['failures'] == 1
+    assert [entry['model'] for entry in stub_requests(base_url)] == ['primary-model'] * 2 + ['fallback-model'] * 2
+
+
+def test_backoff_is_bounded_and_honours_retry_after():
+    scheduler = RetryScheduler(MODELS, base_delay=1.0, max_delay=4.0)
+    for attempt in range(6):
+        assert all(0 <= scheduler.backoff(attempt) <= min(4.0, 2 ** attempt) for _ in range(50))
+    error = SimpleNamespace(response=SimpleNamespace(headers={'retry-after': '2.5'}))
+    assert 2.5 <= scheduler.backoff(0, error) <= 4.0
+    # Retry-After 也不超过 max_delay
+    error = SimpleNamespace(response=SimpleNamespace(headers={'retry-after-ms': '30000'}))
+    assert scheduler.backoff(0, error) == 4.0
+
+
+def test_transport_errors_are_retryable():
+    assert classify_error(ConnectionResetError()) == TIMEOUT
+    assert classify_error(TimeoutError()) == TIMEOUT
+
+
+def test_generator_recovers_from_rate_limit_and_interrupted_stream(stub_server, hexo_site, run_generator):
+    site = hexo_site(["Understanding Python Descriptors"])
+    base_url = stub_server('--fail-first', '2', '--fail-kinds', '429,disconnect', '--retry-after', '0.1')
+    result = run_generator(site, base_url, '--auto-save', '--dataset-file', 'dataset.json', '--max-retries', '2')
+
+    assert [entry['fault'] for entry in stub_requests(base_url)] == ['429', 'disconnect', None]
+    assert '第 2 次重试' in result.stdout
+    content = (site / 'source' / '_posts' / 'post-1.md').read_text(encoding='utf-8')
+    # 中断后从断点续写，文章只出现一次结尾
+    assert content.count('Thanks for reading.') == 1
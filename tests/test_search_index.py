@@ -0,0 +1,114 @@
+import os
+import json
+import shutil
+import subprocess
+
+import pytest
+
+import search_index
+from corpus_index import CorpusIndex
+from search_index import MAX_PREFIX, SearchIndex, assign_prefixes, shard_file, tokenize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENT_JS = os.path.join(ROOT, 'themes', 'book', 'source', 'js', 'search_index.js')
+with open(os.path.join(ROOT, 'tests', 'fixtures', 'search_queries.json'), 'r', encoding='utf-8') as f:
+    QUERIES = json.load(f)
+
+requires_node = pytest.mark.skipif(shutil.which('node') is None, reason='需要 node')
+
+
+def run_client(expression, **inputs):
+    """在 node 中加载主题的 search_index.js，对 inputs 求 expression，返回 JSON 结果"""
+    script = ("const vm = require('vm'), fs = require('fs');\n"
+              f"vm.runInThisContext(fs.readFileSync({json.dumps(CLIENT_JS)}, 'utf8'));\n"
+              f"const inputs = {json.dumps(inputs, ensure_ascii=False)};\n"
+              f"process.stdout.write(JSON.stringify({expression}));\n")
+    result = subprocess.run(['node', '-e', script], capture_output=True, text=True, encoding='utf-8', timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout)
+
+
+@requires_node
+def test_client_tokenizer_matches_python():
+    tokens = run_client("inputs.queries.map(searchIndexFunc.tokenize)", queries=QUERIES)
+    assert tokens == [tokenize(query) for query in QUERIES]
+
+
+def test_tokenize_words_and_cjk_bigrams():
+    assert tokenize("How to use the Docker CLI") == ['how', 'use', 'docker', 'cli']
+    assert tokenize("从零开始学习 Docker") == ['从零', '零开', '开始', '始学', '学习', 'docker']
+    assert tokenize("中 C++") == ['中', 'c++']
+
+
+@requires_node
+def test_prefix_query_fetches_a_bounded_number_of_shards():
+    shards = {'': 1, 's': 1, 'se': 1, 'sea': 1, 'sear': 1, 'sa': 1, 'sb': 1, 'sc': 1, 'sd': 1, 'sf': 1, 'p': 1}
+    manifest = {'max_prefix': MAX_PREFIX, 'shards': shards}
+    expression = ("[['s', true], ['se', true], ['s', false], ['search', true], ['x', true]]"
+                  ".map(q => searchIndexFunc.shardsFor(inputs.manifest, q[0], q[1]))")
+    files = run_client(expression, manifest=manifest)
+    limit = run_client("[searchIndexFunc.MIN_PREFIX_LENGTH, searchIndexFunc.MAX_PREFIX_SHARDS]")
+    assert limit == [2, 4]
+    # 单个字母按前缀匹配时也只多取 4 个分片：最短的子前缀优先
+    assert files[0] == [shard_file(prefix) for prefix in ['s', 'sa', 'sb', 'sc', 'sd']]
+    assert files[1] == [shard_file(prefix) for prefix in ['se', 'sea', 'sear']]
+    assert files[2] == [shard_file('s')]
+    assert files[3] == [shard_file('sear')]
+    assert files[4] == [shard_file('')]
+
+
+def test_assign_prefixes_splits_large_prefixes(monkeypatch):
+    monkeypatch.setattr(search_index, 'TARGET_SHARD_BYTES', 100)
+    sizes = {'python': 60, 'pytest': 50, 'php': 20, 'perl': 10, 'java': 30, 'go': 5}
+    shards = assign_prefixes(sizes)
+
+    # 每个词恰好在一个分片中，且以分片前缀开头
+    assert sorted(term for terms in shards.values() for term in terms) == sorted(sizes)
+    assert all(term.startswith(prefix) for prefix, terms in shards.items() for term in terms)
+    # 'p' 下共 140 字节超过目标大小，较小的子前缀留在 'p' 分片中，'py' 一直拆分到两个词分开为止
+    assert shards == {'': ['go', 'java'], 'p': ['perl', 'php'], 'pyt': ['pytest'], 'pyth': ['python']}
+
+
+def test_assign_prefixes_stops_at_max_prefix(monkeypatch):
+    monkeypatch.setattr(search_index, 'TARGET_SHARD_BYTES', 10)
+    shards = assign_prefixes({'abcdef': 50, 'abcdxy': 50, 'abcd': 5})
+    assert shards == {'abcd': ['abcd', 'abcdef', 'abcdxy']}
+    assert all(len(prefix) <= MAX_PREFIX for prefix in shards)
+
+
+def write_post(site, name, title, body):
+    (site / 'source' / '_posts' / f'{name}.md').write_text(
+        f'---\ntitle: "{title}"\ndate: 2024-05-01 10:00:00\ncategories: python\ntags: [python]\n---\n\n{body}\n',
+        encoding='utf-8')
+
+
+def refresh(site):
+    with CorpusIndex(str(site)) as corpus:
+        posts, doc_ids, terms, stats = SearchIndex(corpus).refresh()
+        return {os.path.basename(post['path']): doc_id for post, doc_id in zip(posts, doc_ids)}, terms, stats
+
+
+def test_refresh_keeps_doc_ids_and_reuses_free_ones(tmp_path):
+    site = tmp_path / 'site'
+    (site / 'source' / '_posts').mkdir(parents=True)
+    shutil.copy(os.path.join(ROOT, '_config.yml'), site / '_config.yml')
+    for name in ('alpha', 'beta', 'gamma'):
+        write_post(site, name, f'{name.title()} Post', f'All about {name}.')
+
+    doc_ids, _, stats = refresh(site)
+    assert sorted(doc_ids.values()) == [0, 1, 2]
+    assert stats['tokenized'] == 3
+
+    # 修改一篇、删除一篇、新增一篇：未变化的文章不重新分词，文档号不变，新文章使用被删除文章空出的文档号
+    write_post(site, 'alpha', 'Alpha Post', 'All about alpha, now with generators.')
+    os.remove(site / 'source' / '_posts' / 'beta.md')
+    write_post(site, 'delta', 'Delta Post', 'All about delta.')
+    new_ids, terms, stats = refresh(site)
+    assert (stats['tokenized'], stats['removed']) == (2, 1)
+    assert new_ids == {'alpha.md': doc_ids['alpha.md'], 'gamma.md': doc_ids['gamma.md'],
+                       'delta.md': doc_ids['beta.md']}
+    assert any('generators' in post_terms for post_terms in terms)
+
+    # 没有变化时不重新分词
+    assert refresh(site)[0] == new_ids
+    assert refresh(site)[2]['tokenized'] == 0
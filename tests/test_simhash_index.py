@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from simhash_index import hamming_pairs, popcount
+
+VALUES = np.array([0, 1, 0xff, (1 << 64) - 1, 0x8000000000000001], dtype=np.uint64)
+
+
+@pytest.fixture(params=['numpy2', 'numpy1'])
+def numpy_version(request, monkeypatch):
+    # numpy 1.x 没有 np.bitwise_count
+    if request.param == 'numpy1' and hasattr(np, 'bitwise_count'):
+        monkeypatch.delattr(np, 'bitwise_count')
+    return request.param
+
+
+def test_popcount(numpy_version):
+    assert popcount(VALUES).tolist() == [0, 1, 8, 64, 2]
+    assert popcount(VALUES[::2]).tolist() == [0, 8, 2]
+    assert popcount(VALUES[:0]).tolist() == []
+
+
+def test_hamming_pairs(numpy_version):
+    fingerprints = np.array([0, 0b111, 1 << 63, (1 << 64) - 1], dtype=np.uint64)
+    assert hamming_pairs(fingerprints, max_distance=3) == {(0, 1): 3, (0, 2): 1}
+    assert hamming_pairs(fingerprints, max_distance=3, targets={1}) == {(0, 1): 3}
@@ -0,0 +1,145 @@
+import pytest
+
+from stream_validator import MAX_FRONT_MATTER_LINES, MAX_LEADING_LINES, InvalidOutputError, StreamValidator
+
+FRONT_MATTER = """---
+title: "Python Generators"
+date: 2024-05-01 10:00:00
+categories: python
+tags: [python]
+keywords: python, generators
+description: "How generators work"
+---
+"""
+BODY = """
+Generators produce values lazily.
+
+<!-- more -->
+
+### Example
+
+```python
+def count():
+    yield 1
+```
+
+Thanks for reading.
+"""
+ARTICLE = FRONT_MATTER + BODY
+
+
+def validate(text, chunk_size=7, validator=None):
+    """按固定大小切块输入，模拟流式输出，返回校验器和全部输出"""
+    validator = validator or StreamValidator()
+    output = ''.join(validator.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size))
+    return validator, output + validator.finish()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, len(ARTICLE)])
+def test_valid_article_passes_through_unchanged(chunk_size):
+    validator, output = validate(ARTICLE, chunk_size)
+    assert output == ARTICLE
+    assert validator.repairs == [] and validator.warnings == []
+
+
+def test_feed_returns_only_complete_lines():
+    validator = StreamValidator()
+    assert validator.feed('---\ntitle: "Py') == '---\n'
+    assert validator.feed('thon"\n') == 'title: "Python"\n'
+
+
+def test_last_line_without_newline_is_written_on_finish():
+    _, output = validate(ARTICLE.rstrip('\n'))
+    assert output == ARTICLE
+
+
+def test_markdown_wrapper_is_removed():
+    validator, output = validate("```markdown\n" + ARTICLE + "```\n")
+    assert output == ARTICLE
+    assert validator.repairs == ["去掉 ```markdown 包裹"]
+
+
+def test_code_block_after_wrapper_like_fence_is_kept():
+    # 包裹内正文中的 ``` 后面还有内容，说明它是代码块开始而不是包裹结束
+    text = "```markdown\n" + FRONT_MATTER + "\n<!-- more -->\n\n```\n\nplain code\n```\n"
+    _, output = validate(text)
+    assert output == FRONT_MATTER + "\n<!-- more -->\n\n```\n\nplain code\n```\n"
+
+
+def test_missing_front_matter_delimiters_are_added():
+    text = FRONT_MATTER[len('---\n'):].replace('---\n', '') + "### Example\n\n<!-- more -->\n"
+    validator, output = validate(text)
+    assert output.startswith('---\ntitle: "Python Generators"\n')
+    assert 'description: "How generators work"\n---\n\n### Example\n' in output
+    assert validator.repairs == ["补上 front matter 开头的 ---", "补上 front matter 结尾的 ---"]
+
+
+def test_title_is_quoted_and_description_quotes_are_escaped():
+    text = ARTICLE.replace('title: "Python Generators"', "title: Python's \"yield\"") \
+        .replace('description: "How generators work"', 'description: How "yield" works')
+    validator, output = validate(text)
+    assert 'title: "Python\'s \\"yield\\""\n' in output
+    assert 'description: "How &quot;yield&quot; works"\n' in output
+    assert len(validator.repairs) == 2
+
+
+def test_truncated_code_block_is_closed():
+    text = ARTICLE[:ARTICLE.index('    yield 1')] + '    yie'
+    validator, output = validate(text)
+    assert output.endswith("def count():\n    yie\n```\n")
+    assert validator.repairs == ["补全未闭合的代码块"]
+
+
+def test_missing_more_marker_and_recommended_keys_warn():
+    text = ARTICLE.replace('<!-- more -->\n', '').replace('keywords: python, generators\n', '')
+    validator, _ = validate(text)
+    assert validator.warnings == ["front matter 缺少 keywords", "缺少 <!-- more --> 摘要标记"]
+
+
+def test_malformed_date_warns():
+    validator, _ = validate(ARTICLE.replace('2024-05-01 10:00:00', 'May 1st'))
+    assert validator.warnings == ["date 格式不正确: May 1st"]
+
+
+@pytest.mark.parametrize('text', [
+    '---\ntitle: "Python Generators"\ndate: 2024-05-01',
+    '---\n',
+    '',
+], ids=['mid-front-matter', 'after-opening', 'empty'])
+def test_stream_truncated_before_body_fails_on_finish(text):
+    validator = StreamValidator()
+    validator.feed(text)
+    with pytest.raises(InvalidOutputError, match='front matter 仍不完整'):
+        validator.finish()
+
+
+def test_missing_required_key_fails_when_front_matter_closes():
+    validator = StreamValidator()
+    text = ARTICLE.replace('tags: [python]\n', '')
+    with pytest.raises(InvalidOutputError, match='tags'):
+        validator.feed(text)
+
+
+@pytest.mark.parametrize('text', [
+    'Sure! Here is your article:\n',
+    '\n' * (MAX_LEADING_LINES + 1),
+], ids=['chatter', 'blank-lines'])
+def test_output_without_front_matter_fails_early(text):
+    with pytest.raises(InvalidOutputError, match='front matter 开头'):
+        StreamValidator().feed(text)
+
+
+def test_unterminated_front_matter_fails_early():
+    text = '---\n' + 'note: x\n' * (MAX_FRONT_MATTER_LINES + 1)
+    with pytest.raises(InvalidOutputError, match='front matter 过长'):
+        StreamValidator().feed(text)
+
+
+def test_prime_restores_state_for_resumed_stream():
+    # 断点续写：已写出的内容中有未闭合的代码块，续写部分应从同一状态继续
+    split = ARTICLE.index('    yield 1')
+    validator = StreamValidator()
+    validator.prime(ARTICLE[:split])
+    validator, output = validate(ARTICLE[split:], validator=validator)
+    assert output == ARTICLE[split:]
+    assert validator.repairs == []
@@ -0,0 +1,172 @@
+// Client for the sharded static search index written by tools/search_index.py.
+// Only the manifest, the shards matching the query terms and the document
+// chunks of the top results are downloaded.
+
+/*exported searchIndexFunc*/
+var searchIndexFunc = function(root, searchId, contentId) {
+
+  var MAX_RESULTS = 10;
+  var MAX_PREFIX_TERMS = 50;
+  var base = root + "search/";
+  var cache = {};
+  var manifest = null;
+  var tokenize = searchIndexFunc.tokenize;
+
+  function escapeHtml(text) {
+    return String(text).replace(/[&<>"']/g, function(c) {
+      return { "&": "&amp;", "<": "&lt;", ">": "&gt;", "\"": "&quot;", "'": "&#39;" }[c];
+    });
+  }
+
+  function fetchJson(name, gzipped) {
+    if (!cache[name]) {
+      var url = base + name + (manifest && manifest.files[name] ? "?v=" + manifest.files[name] : "");
+      cache[name] = fetch(url).then(function(response) {
+        if (!response.ok) { throw new Error(response.status); }
+        if (!gzipped) { return response.json(); }
+        var stream = response.body.pipeThrough(new DecompressionStream("gzip"));
+        return new Response(stream).json();
+      });
+    }
+    return cache[name];
+  }
+
+  function decode(postings) {
+    var docs = [], doc = 0;
+    for (var i = 0; i < postings.length; i += 2) {
+      doc += postings[i];
+      docs.push([doc, postings[i + 1]]);
+    }
+    return docs;
+  }
+
+  // Scores of the documents matching every query term (the last one as a prefix).
+  function search(tokens) {
+    return Promise.all(tokens.map(function(token, i) {
+      var isPrefix = i === tokens.length - 1 && token.length >= searchIndexFunc.MIN_PREFIX_LENGTH;
+      return Promise.all(searchIndexFunc.shardsFor(manifest, token, isPrefix).map(function(name) { return fetchJson(name, true); }))
+        .then(function(shards) {
+          var scores = {}, matched = 0;
+          shards.forEach(function(shard) {
+            Object.keys(shard).forEach(function(term) {
+              if (term !== token && !(isPrefix && term.indexOf(token) === 0)) { return; }
+              if (matched++ >= MAX_PREFIX_TERMS) { return; }
+              var postings = decode(shard[term]);
+              var idf = Math.log(1 + manifest.docs / postings.length);
+              postings.forEach(function(posting) {
+                var score = (1 + Math.log(posting[1])) * idf;
+                scores[posting[0]] = Math.max(scores[posting[0]] || 0, score);
+              });
+            });
+          });
+          return scores;
+        });
+    })).then(function(perToken) {
+      var total = {};
+      Object.keys(perToken[0] || {}).forEach(function(doc) {
+        var sum = 0;
+        for (var i = 0; i < perToken.length; i++) {
+          if (!(doc in perToken[i])) { return; }
+          sum += perToken[i][doc];
+        }
+        total[doc] = sum;
+      });
+      return Object.keys(total).sort(function(a, b) { return total[b] - total[a]; }).slice(0, MAX_RESULTS)
+        .map(Number);
+    });
+  }
+
+  function render(docIds, $resultContent) {
+    var chunks = {};
+    docIds.forEach(function(id) { chunks[Math.floor(id / manifest.doc_chunk)] = true; });
+    return Promise.all(Object.keys(chunks).map(function(chunk) {
+      return fetchJson("docs/" + chunk + ".json.gz", true).then(function(docs) { chunks[chunk] = docs; });
+    })).then(function() {
+      $resultContent.innerHTML = "";
+      if (!docIds.length) { return; }
+      var result = "<ul class=\"search-result-list\">";
+      docIds.forEach(function(id) {
+        var doc = chunks[Math.floor(id / manifest.doc_chunk)][id % manifest.doc_chunk];
+        if (!doc) { return; }
+        result += "<li><a href='" + escapeHtml(root + doc[0]) + "' class='search-result-title'>" +
+          escapeHtml(doc[1]) + "</a>";
+        if (doc[2]) { result += "<p class=\"search-result\">" + escapeHtml(doc[2]) + "...</p>"; }
+        result += "</li>";
+      });
+      $resultContent.innerHTML = result + "</ul>";
+    });
+  }
+
+  var $input = document.getElementById(searchId);
+  if (!$input) { return; }
+  var $resultContent = document.getElementById(contentId);
+  var timer = null, latest = 0;
+
+  fetchJson("index.json", false).then(function(data) {
+    manifest = data;
+    $input.addEventListener("input", function() {
+      var value = this.value;
+      clearTimeout(timer);
+      timer = setTimeout(function() {
+        var query = ++latest;
+        var tokens = tokenize(value);
+        if (!tokens.length) {
+          $resultContent.innerHTML = "";
+          return;
+        }
+        search(tokens).then(function(docIds) {
+          if (query === latest) { return render(docIds, $resultContent); }
+        });
+      }, 150);
+    });
+  });
+};
+
+searchIndexFunc.STOPWORDS = ("a an the and or of for to with in on at by from as is are was were be been it its this " +
+  "that these those you your we our they their he she his her not no but if then than so such can will would should " +
+  "could").split(" ");
+searchIndexFunc.WORD = /[a-z0-9][a-z0-9+#]*|[㐀-鿿]+/g;
+// The last query term is matched as a prefix only from this length on, and a
+// prefix query fetches at most MAX_PREFIX_SHARDS shards besides its own: a
+// single letter would otherwise pull every shard under that letter.
+searchIndexFunc.MIN_PREFIX_LENGTH = 2;
+searchIndexFunc.MAX_PREFIX_SHARDS = 4;
+
+// Must match tokenize() in tools/search_index.py
+searchIndexFunc.tokenize = function(text) {
+  var tokens = [];
+  (text.toLowerCase().match(searchIndexFunc.WORD) || []).forEach(function(word) {
+    if (word[0] >= "㐀") {
+      for (var i = 0; i < Math.max(1, word.length - 1); i++) {
+        tokens.push(word.substr(i, 2));
+      }
+    } else if (searchIndexFunc.STOPWORDS.indexOf(word) < 0 && word.length <= 32) {
+      tokens.push(word);
+    }
+  });
+  return tokens;
+};
+
+// Shard files that may hold the term: the longest matching prefix, plus the
+// shortest longer shards under the term when it is matched as a prefix.
+searchIndexFunc.shardsFor = function(manifest, term, isPrefix) {
+  var names = [];
+  for (var length = Math.min(term.length, manifest.max_prefix); length >= 0; length--) {
+    if (manifest.shards.hasOwnProperty(term.slice(0, length))) {
+      names.push(term.slice(0, length));
+      break;
+    }
+  }
+  if (isPrefix) {
+    names = names.concat(Object.keys(manifest.shards).filter(function(key) {
+      return key.length > term.length && key.indexOf(term) === 0;
+    }).sort(function(a, b) {
+      return a.length - b.length || (a < b ? -1 : 1);
+    }).slice(0, searchIndexFunc.MAX_PREFIX_SHARDS));
+  }
+  return names.map(function(prefix) {
+    var bytes = new TextEncoder().encode(prefix);
+    return (Array.prototype.map.call(bytes, function(b) { return ("0" + b.toString(16)).slice(-2); }).join("") ||
+      "_") + ".json.gz";
+  });
+};
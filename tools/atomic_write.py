@@ -0,0 +1,25 @@
+"""
+原子写文件：先写入同目录下的临时文件并落盘，再用 os.replace 替换，写到一半崩溃时原文件保持完整
+"""
+import os
+import json
+
+
+def write_bytes_atomically(file_path, data):
+    """原子地写出 bytes"""
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+
+
+def write_text_atomically(file_path, text):
+    """原子地写出文本（UTF-8），原样写出换行符"""
+    write_bytes_atomically(file_path, text.encode('utf-8'))
+
+
+def write_json_atomically(file_path, data):
+    """原子地写出 JSON，缩进 4 个空格"""
+    write_text_atomically(file_path, json.dumps(data, indent=4))
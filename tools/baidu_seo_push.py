@@ -1,50 +1,204 @@
+"""
+向百度普通收录接口推送链接
+- 复用同一个 HTTP 连接池，每次请求最多推送 MAX_BATCH_SIZE 个链接
+- 收到 remain 后按剩余配额缩小批次，配额用尽时停止
+- 每个链接的推送结果追加写入日志文件，再次运行时跳过已被接受的链接，中途崩溃也不会重复推送
+- POST 不自动重发：5xx 时百度可能已经计入配额，这批链接在日志中记为 unknown 并停止本次推送，由下次运行重新推送
+用法：
+    python tools/build_manifest.py --urls-file public/baidu_urls.txt
+    BAIDU_SEO_SITE=https://gitceo.com BAIDU_SEO_KEY=... python tools/baidu_seo_push.py
+本地测试：
+    python tools/stub_baidu_push_server.py --port 8766 --quota 3000
+    BAIDU_PUSH_ENDPOINT=http://127.0.0.1:8766/urls BAIDU_SEO_SITE=https://gitceo.com BAIDU_SEO_KEY=stub \
+        python tools/baidu_seo_push.py
+"""
 import os
+import json
+import time
+import argparse
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from atomic_write import write_text_atomically
 
-def batch_push_urls(site, token, file_path, batch_size=10):
-    url = f"http://data.zz.baidu.com/urls?site={site}&token={token}"
-    headers = {'Content-Type': 'text/plain'}
+DEFAULT_ENDPOINT = os.getenv('BAIDU_PUSH_ENDPOINT', 'http://data.zz.baidu.com/urls')
+DEFAULT_JOURNAL_FILE = os.getenv('BAIDU_PUSH_JOURNAL', 'baidu_push.journal.jsonl')
+# 百度接口单次请求最多接受的链接数
+MAX_BATCH_SIZE = 2000
 
-    # 从文件读取URLs
-    with open(file_path, 'r') as file:
-        urls = file.readlines()
+ACCEPTED = 'accepted'
+NOT_SAME_SITE = 'not_same_site'
+NOT_VALID = 'not_valid'
+# 5xx：不确定百度是否已经接受
+UNKNOWN = 'unknown'
 
-    # 处理每批次的URLs
-    start_index = 0
-    while start_index < len(urls):
-        # 取当前批次的URLs
-        end_index = min(start_index + batch_size, len(urls))
-        batch_urls = urls[start_index:end_index]
-        data = ''.join(batch_urls)
 
-        # 发送POST请求
-        response = requests.post(url, headers=headers, data=data)
-        response_data = response.json()
+class PushJournal:
+    """
+    链接推送日志，每个链接的推送结果占一行
+    :param journal_file: 日志文件路径
+    """
 
-        if response.status_code == 200:
-            print(f"Batch successful: {response_data.get('success', 0)} URLs pushed.")
-            print(f"Remaining quota: {response_data.get('remain', 0)}")
+    def __init__(self, journal_file=DEFAULT_JOURNAL_FILE):
+        self.journal_file = journal_file
+        self._journal = None
 
-            # 更新开始索引到下一批次
-            start_index += batch_size
+    def load(self):
+        """
+        读取已被接受的链接集合，忽略崩溃时写了一半的最后一行
+        被判定为无效和结果未知的链接只做记录，下次运行时重新推送（例如修正站点配置之后）
+        """
+        done = set()
+        if not os.path.exists(self.journal_file):
+            return done
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get('status') == ACCEPTED and 'url' in entry:
+                    done.add(entry['url'])
+        return done
 
-            # 成功推送后，从列表中移除已推送的URLs
-            urls = urls[end_index:]
+    def record(self, results):
+        """记录一批链接的推送结果，立即落盘"""
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+        now = time.time()
+        for url, status in results:
+            self._journal.write(json.dumps({'url': url, 'status': status, 'time': now}, ensure_ascii=False) + '\n')
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
 
-            # 检查是否还有剩余的配额，如果没有则提前退出
-            if response_data.get('remain', 0) <= 0:
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+def create_session(retries=3):
+    """
+    带连接池的 Session，只对建立连接失败自动退避重试
+    请求已发出后的读超时和 5xx 不重发，避免同一批链接被重复计入配额
+    """
+    session = requests.Session()
+    retry = Retry(total=retries, connect=retries, read=0, status=0, other=0, backoff_factor=1,
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Content-Type'] = 'text/plain'
+    return session
+
+
+def read_urls(file_path):
+    """读取链接文件，去掉空行和重复链接，保持顺序"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+
+def batch_push_urls(site, token, file_path, batch_size=MAX_BATCH_SIZE, endpoint=DEFAULT_ENDPOINT,
+                    journal_file=DEFAULT_JOURNAL_FILE, session=None, timeout=30):
+    """
+    推送链接文件中尚未被接受的链接，结束后文件中只保留仍未被接受的链接
+    :param site: 站点，如 https://gitceo.com
+    :param token: 推送 token
+    :param file_path: 链接文件，每行一个
+    :param batch_size: 每次请求的链接数，不超过 MAX_BATCH_SIZE
+    :param endpoint: 推送接口地址
+    :param journal_file: 推送日志文件
+    :param session: requests.Session，默认新建
+    :return: 统计 dict：pending / requests / accepted / rejected / unknown / remain / seconds
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    urls = read_urls(file_path)
+    journal = PushJournal(journal_file)
+    done = journal.load()
+    pending = [url for url in urls if url not in done]
+    session = session or create_session()
+    stats = {'pending': len(pending), 'requests': 0, 'accepted': 0, 'rejected': 0, 'unknown': 0, 'remain': None,
+             'seconds': 0.0}
+    print(f"{len(urls)} 个链接，已推送过 {len(urls) - len(pending)} 个，待推送 {len(pending)} 个")
+
+    started = time.perf_counter()
+    index = 0
+    try:
+        while index < len(pending):
+            # 知道剩余配额后不再发送超出配额的链接
+            size = batch_size if stats['remain'] is None else min(batch_size, stats['remain'])
+            batch = pending[index:index + size]
+            try:
+                response = session.post(endpoint, params={'site': site, 'token': token},
+                                        data='\n'.join(batch).encode('utf-8'), timeout=timeout)
+            except requests.RequestException as e:
+                print(f"Error pushing batch: {e}")
+                break
+            stats['requests'] += 1
+            try:
+                response_data = response.json()
+            except ValueError:
+                response_data = {}
+            if response.status_code >= 500:
+                # 不知道这批链接是否已计入配额，重发可能重复消耗，留给下次运行
+                journal.record((url, UNKNOWN) for url in batch)
+                stats['unknown'] += len(batch)
+                print(f"Server error {response.status_code}: {len(batch)} URLs marked unknown, "
+                      f"they will be pushed again on the next run. Stopping.")
+                break
+            if response.status_code != 200:
+                print(f"Error pushing batch: {response_data.get('message', response.text[:200] or response.status_code)}")
+                if response_data.get('message') == 'over quota':
+                    stats['remain'] = 0
+                break
+
+            # 接口只返回成功数量和无效链接列表；配额不足时只接受了前 success 个有效链接
+            invalid = {url: NOT_SAME_SITE for url in response_data.get('not_same_site', [])}
+            invalid.update({url: NOT_VALID for url in response_data.get('not_valid', [])})
+            success = response_data.get('success', 0)
+            results = []
+            accepted = 0
+            for url in batch:
+                if url in invalid:
+                    results.append((url, invalid[url]))
+                elif accepted < success:
+                    results.append((url, ACCEPTED))
+                    accepted += 1
+            journal.record(results)
+            done.update(url for url, status in results if status == ACCEPTED)
+            stats['accepted'] += accepted
+            stats['rejected'] += len(results) - accepted
+            stats['remain'] = response_data.get('remain', 0)
+            index += len(batch)
+            print(f"Batch successful: {success} URLs pushed, {len(invalid)} invalid, remaining quota: {stats['remain']}")
+            if stats['remain'] <= 0:
                 print("No remaining quota. Stopping.")
                 break
-        else:
-            print(f"Error pushing batch: {response_data.get('message', 'No error message')}")
-            break
+    finally:
+        journal.close()
+        stats['seconds'] = time.perf_counter() - started
+        # 文件中只保留尚未被接受的链接
+        write_text_atomically(file_path, ''.join(f"{url}\n" for url in urls if url not in done))
+    return stats
 
-    # 推送完成后，更新文件内容
-    with open(file_path, 'w') as file:
-        file.writelines(urls)
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="向百度普通收录接口推送链接")
+    parser.add_argument('--file', default='public/baidu_urls.txt', help='链接文件，每行一个')
+    parser.add_argument('--site', default=os.getenv('BAIDU_SEO_SITE'))
+    parser.add_argument('--token', default=os.getenv('BAIDU_SEO_KEY'))
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE, help='每次请求的链接数')
+    parser.add_argument('--endpoint', default=DEFAULT_ENDPOINT, help='推送接口地址')
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL_FILE, help='推送日志文件')
+    args = parser.parse_args()
+    if not args.site or not args.token:
+        parser.error("需要 --site/--token 或环境变量 BAIDU_SEO_SITE/BAIDU_SEO_KEY")
 
-# 使用函数
-batch_push_urls(os.getenv('BAIDU_SEO_SITE'), os.getenv('BAIDU_SEO_KEY'), 'public/baidu_urls.txt')
+    result = batch_push_urls(args.site, args.token, args.file, args.batch_size, args.endpoint, args.journal)
+    sent = result['accepted'] + result['rejected'] + result['unknown']
+    rate = sent / result['seconds'] if result['seconds'] else 0.0
+    print(f"推送 {sent} 个链接（接受 {result['accepted']}，无效 {result['rejected']}，"
+          f"结果未知 {result['unknown']}），请求 {result['requests']} 次，"
+          f"用时 {result['seconds']:.2f}s，{rate:.0f} URLs/s，剩余配额 {result['remain']}")
@@ -0,0 +1,199 @@
+"""
+构建清单：记录每篇文章、每个标签/分类页和首页的内容哈希与 lastmod，对比上一次构建得到新增、修改和删除的链接
+sitemap 和搜索引擎推送只需要处理变化的部分
+lastmod 不依赖文件 mtime（CI 检出后所有文件的 mtime 都是检出时间）：
+- 文章：front matter 有 updated 时用 updated；新文章用 date；内容哈希变化时为本次构建时间；否则沿用清单中的值
+- 标签/分类页：新页面为其中文章 lastmod 的最大值；其中文章增减或修改时为本次构建时间
+- 首页：同上，只看最新的 HOME_POSTS 篇文章
+清单默认写在站点根目录（运行目录）的 build_manifest.json，可用 BUILD_MANIFEST 环境变量或 --manifest 指定
+清单是构建状态而不是源码，已加入 .gitignore；CI 中应把它缓存到下一次构建
+用法：
+    python tools/build_manifest.py --urls-file public/baidu_urls.txt     # 变化的链接写入文件，并更新清单
+    python tools/build_manifest.py --dry-run                            # 只查看变化，不更新清单
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+from corpus_index import CorpusIndex
+from atomic_write import write_json_atomically
+from hexo_scaffold import slugize
+
+DEFAULT_MANIFEST_FILE = os.getenv("BUILD_MANIFEST", "build_manifest.json")
+MANIFEST_VERSION = 1
+# 首页展示的文章数，与 _config.yml 中 index_generator.per_page 一致
+HOME_POSTS = 10
+
+POST = 'post'
+TAG = 'tag'
+CATEGORY = 'category'
+HOME = 'home'
+
+
+def _hash(parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def parse_date(value, tz):
+    """把 front matter 中的日期转换为带时区的 datetime，无法解析时返回 None"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if not isinstance(value, datetime):
+        return None
+    return value.replace(tzinfo=tz) if value.tzinfo is None else value
+
+
+def format_date(value):
+    return value.isoformat(timespec='seconds')
+
+
+def taxonomy_permalink(config, directory, names):
+    """标签/分类页的链接，names 为分类层级（标签只有一层）"""
+    path = '/'.join(slugize(str(name), config['filename_case']) for name in names)
+    return f"{config['url'].rstrip('/')}{config['root'].rstrip('/')}/{directory}/{path}/"
+
+
+class BuildManifest:
+    """
+    构建清单
+    :param manifest_file: 清单 JSON 文件路径
+    """
+
+    def __init__(self, manifest_file=DEFAULT_MANIFEST_FILE):
+        self.manifest_file = manifest_file
+        self.entries = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                self.entries = manifest['urls']
+
+    def build(self, index, now=None):
+        """
+        根据语料索引计算本次构建的所有链接
+        :param index: CorpusIndex
+        :param now: 本次构建时间，默认为当前时间
+        :return: {url: {'kind', 'hash', 'lastmod'}}
+        """
+        config = index.config
+        tz = ZoneInfo(config['timezone']) if config['timezone'] else datetime.now().astimezone().tzinfo
+        now = (now or datetime.now(timezone.utc)).astimezone(tz).replace(microsecond=0)
+        entries = {}
+        taxonomies = {}
+        posts = []
+        for post in index.posts(with_errors=False):
+            if post['front_matter'].get('published') is False:
+                continue
+            url = post['permalink']
+            previous = self.entries.get(url)
+            updated = parse_date(post['front_matter'].get('updated'), tz)
+            posted = parse_date(post['date'], tz)
+            if updated:
+                lastmod = format_date(updated)
+            elif previous is None:
+                lastmod = format_date(posted or now)
+            elif previous['hash'] != post['hash']:
+                lastmod = format_date(now)
+            else:
+                lastmod = previous['lastmod']
+            entries[url] = {'kind': POST, 'hash': post['hash'], 'lastmod': lastmod}
+            posts.append((posted or now, url))
+
+            members = [(TAG, config['tag_dir'], [tag]) for tag in post['tags']]
+            # hexo 中一个分类列表表示层级，每一级都有自己的分类页
+            members += [(CATEGORY, config['category_dir'], post['categories'][:depth])
+                        for depth in range(1, len(post['categories']) + 1)]
+            for kind, directory, names in members:
+                page_url = taxonomy_permalink(config, directory, names)
+                taxonomies.setdefault(page_url, (kind, []))[1].append(url)
+
+        for page_url, (kind, urls) in taxonomies.items():
+            entries[page_url] = self._page_entry(page_url, kind, sorted(urls), entries, now)
+        latest = [url for _, url in sorted(posts, reverse=True)[:HOME_POSTS]]
+        home_url = f"{config['url'].rstrip('/')}{config['root']}"
+        entries[home_url] = self._page_entry(home_url, HOME, latest, entries, now)
+        return entries
+
+    def _page_entry(self, url, kind, post_urls, entries, now):
+        """列表页的哈希由其中文章的链接和哈希决定，新页面的 lastmod 为其中文章 lastmod 的最大值，内容变化时为本次构建时间"""
+        page_hash = _hash(f"{post_url} {entries[post_url]['hash']}" for post_url in post_urls)
+        previous = self.entries.get(url)
+        if previous is None:
+            lastmod = max((entries[post_url]['lastmod'] for post_url in post_urls), default=format_date(now))
+        elif previous['hash'] != page_hash:
+            lastmod = format_date(now)
+        else:
+            lastmod = previous['lastmod']
+        return {'kind': kind, 'hash': page_hash, 'lastmod': lastmod}
+
+    def diff(self, entries):
+        """
+        与上一次构建对比
+        :return: {'added': [...], 'changed': [...], 'removed': [...]}，每项为 {'url', 'kind', 'lastmod'}
+        """
+        delta = {'added': [], 'changed': [], 'removed': []}
+        for url, entry in sorted(entries.items()):
+            previous = self.entries.get(url)
+            if previous is None:
+                delta['added'].append({'url': url, 'kind': entry['kind'], 'lastmod': entry['lastmod']})
+            elif previous['hash'] != entry['hash'] or previous['lastmod'] != entry['lastmod']:
+                delta['changed'].append({'url': url, 'kind': entry['kind'], 'lastmod': entry['lastmod']})
+        for url, entry in sorted(self.entries.items()):
+            if url not in entries:
+                delta['removed'].append({'url': url, 'kind': entry['kind'], 'lastmod': entry['lastmod']})
+        return delta
+
+    def save(self, entries):
+        write_json_atomically(self.manifest_file, {
+            'version': MANIFEST_VERSION,
+            'built': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'urls': dict(sorted(entries.items())),
+        })
+        self.entries = entries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="对比上一次构建，列出新增和修改的链接")
+    parser.add_argument('--root', default='.', help='Hexo 站点根目录')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST_FILE, help='清单文件')
+    parser.add_argument('--urls-file', help='把新增和修改的链接写入这个文件，每行一个，供推送使用')
+    parser.add_argument('--delta-file', help='把变化写入这个 JSON 文件，供生成 sitemap 使用')
+    parser.add_argument('--kinds', default='post,tag,category,home', help='写入 --urls-file 的链接类型')
+    parser.add_argument('--dry-run', action='store_true', help='不更新清单')
+    args = parser.parse_args()
+
+    manifest = BuildManifest(args.manifest)
+    with CorpusIndex(args.root) as corpus:
+        corpus.refresh()
+        entries = manifest.build(corpus)
+    delta = manifest.diff(entries)
+
+    if args.urls_file:
+        kinds = set(args.kinds.split(','))
+        with open(args.urls_file, 'w', encoding='utf-8') as f:
+            for item in delta['added'] + delta['changed']:
+                if item['kind'] in kinds:
+                    f.write(item['url'] + '\n')
+    if args.delta_file:
+        write_json_atomically(args.delta_file, delta)
+    if not args.urls_file and not args.delta_file:
+        for status in ('added', 'changed', 'removed'):
+            for item in delta[status]:
+                print(f"{status}\t{item['kind']}\t{item['lastmod']}\t{item['url']}")
+    if not args.dry_run:
+        manifest.save(entries)
+    print(f"共 {len(entries)} 个链接：新增 {len(delta['added'])}，修改 {len(delta['changed'])}，"
+          f"删除 {len(delta['removed'])}", file=sys.stderr)
@@ -1,34 +1,225 @@
+"""
+校验文章的 front matter：只读取文件开头的 front matter 部分并按 YAML 解析，检查主题和 sitemap 依赖的字段
+用法：
+    python tools/check.py                         # 默认检查 source/_posts
+    python tools/check.py check/ --format json    # 每个有问题的文件输出一行 JSON，带错误码
+有错误时退出码为 1
+"""
 import os
+import re
+import sys
+import json
+import argparse
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor
 
-def check_hexo_front_matter(directory):
-    problematic_files = []
+import yaml
 
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith(".md"):
-                file_path = os.path.join(root, file)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    di = 0
-                    for line in lines:
-                        if line == "---\n":
-                            di += 1
-                    if di < 2:
-                        problematic_files.append(file_path)
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
-    return problematic_files
+# 只读取文件开头这么多字节来查找 front matter，超过视为缺少结尾的 ---
+HEADER_LIMIT = 64 * 1024
+CLOSING_LINE = re.compile(rb'^---[ \t]*\r?$', re.M)
+
+# front matter 字段及其要求的类型，主题和 sitemap 依赖这些字段
+REQUIRED_FIELDS = {
+    'title': str,
+    'date': datetime,
+    'categories': list,
+    'tags': list,
+}
+RECOMMENDED_FIELDS = {
+    'keywords': str,
+    'description': str,
+}
+OPTIONAL_FIELDS = {
+    'updated': datetime,
+}
+DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d', '%Y/%m/%d %H:%M:%S', '%Y/%m/%d')
+
+# 错误码
+ERROR_CODES = {
+    'FM001': "文件没有以 --- 开头",
+    'FM002': f"前 {HEADER_LIMIT // 1024}KB 内没有找到结尾的 ---",
+    'FM003': "front matter 不是合法的 YAML",
+    'FM004': "front matter 不是键值映射",
+    'FM005': "文件无法读取或不是 UTF-8 编码",
+    'FM010': "缺少必需字段",
+    'FM011': "字段类型不正确",
+    'FM012': "日期无法解析",
+    'FM013': "字段为空",
+    'FM101': "缺少推荐字段",
+}
+WARNING_CODES = {'FM101'}
+
+
+def _issue(code, key=None, detail=None):
+    issue = {'code': code, 'severity': 'warning' if code in WARNING_CODES else 'error',
+             'message': ERROR_CODES[code]}
+    if key:
+        issue['key'] = key
+    if detail:
+        issue['detail'] = detail
+    return issue
+
+
+def read_front_matter(file_path):
+    """
+    只读取文件开头的有限字节，取出 front matter 文本
+    :return: (front matter 文本, 问题)，出错时前者为 None
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(HEADER_LIMIT)
+    except OSError as e:
+        return None, _issue('FM005', detail=str(e))
+    if head.startswith(b'\xef\xbb\xbf'):
+        head = head[3:]
+    first_line_end = head.find(b'\n')
+    if first_line_end < 0 or head[:first_line_end].rstrip() != b'---':
+        return None, _issue('FM001')
+    closing = CLOSING_LINE.search(head, first_line_end + 1)
+    if not closing:
+        return None, _issue('FM002')
+    try:
+        return head[first_line_end + 1:closing.start()].decode('utf-8'), None
+    except UnicodeDecodeError as e:
+        return None, _issue('FM005', detail=str(e))
+
+
+def _check_type(key, value, expected):
+    if expected is datetime:
+        if isinstance(value, datetime):
+            return None
+        if isinstance(value, date):
+            return None
+        if isinstance(value, str):
+            for fmt in DATE_FORMATS:
+                try:
+                    datetime.strptime(value.strip(), fmt)
+                    return None
+                except ValueError:
+                    continue
+        return _issue('FM012', key, repr(value))
+    if expected is list:
+        # hexo 也接受单个字符串作为分类或标签
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list):
+            return _issue('FM011', key, f"应为列表，实际为 {type(value).__name__}")
+        if not value:
+            return _issue('FM013', key)
+        if any(not isinstance(item, (str, int, float)) or str(item).strip() == '' for item in value):
+            return _issue('FM011', key, "列表项应为非空字符串")
+        return None
+    if not isinstance(value, expected):
+        return _issue('FM011', key, f"应为 {expected.__name__}，实际为 {type(value).__name__}")
+    if isinstance(value, str) and not value.strip():
+        return _issue('FM013', key)
+    return None
+
+
+def check_file(file_path):
+    """
+    校验一篇文章的 front matter
+    :return: {'path': 路径, 'ok': 是否没有错误, 'issues': [问题 dict]}
+    """
+    text, issue = read_front_matter(file_path)
+    issues = [issue] if issue else []
+    if text is not None:
+        try:
+            front_matter = yaml.load(text, Loader=YAML_LOADER)
+        except yaml.YAMLError as e:
+            front_matter = None
+            issues.append(_issue('FM003', detail=' '.join(str(e).split())))
+        except ValueError as e:
+            # 形如日期但取值非法（如 2024-13-01）时 YAML 构造 datetime 会失败
+            front_matter = None
+            issues.append(_issue('FM012', detail=str(e)))
+        else:
+            if not isinstance(front_matter, dict):
+                issues.append(_issue('FM004'))
+            else:
+                for fields, missing_code in ((REQUIRED_FIELDS, 'FM010'), (RECOMMENDED_FIELDS, 'FM101'),
+                                             (OPTIONAL_FIELDS, None)):
+                    for key, expected in fields.items():
+                        value = front_matter.get(key)
+                        if value is None:
+                            if missing_code:
+                                issues.append(_issue(missing_code, key))
+                            continue
+                        problem = _check_type(key, value, expected)
+                        if problem:
+                            issues.append(problem)
+    return {'path': file_path, 'ok': not any(i['severity'] == 'error' for i in issues), 'issues': issues}
+
+
+def _check_many(paths):
+    return [check_file(path) for path in paths]
+
+
+def list_posts(directory):
+    """递归列出目录下所有 .md 文件"""
+    paths = []
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.md'):
+                    paths.append(entry.path)
+    paths.sort()
+    return paths
+
+
+def check_hexo_front_matter(directory, workers=None, chunk_size=256):
+    """
+    用进程池并行校验目录下所有文章的 front matter
+    :param directory: 文章目录
+    :param workers: 进程数，默认按 CPU 数；为 1 时在当前进程中执行
+    :param chunk_size: 每个任务包含的文件数
+    :return: 每个文件的校验结果列表，顺序与路径排序一致
+    """
+    paths = list_posts(directory)
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return [result for chunk in chunks for result in _check_many(chunk)]
+    with ProcessPoolExecutor(workers) as pool:
+        return [result for results in pool.map(_check_many, chunks) for result in results]
 
 
 def main():
-    directory = "source/_posts"  # 请替换为你的 Hexo 文件目录
-    problematic_files = check_hexo_front_matter(directory)
-
-    if problematic_files:
-        print("以下文件的文件头缺少 --- 作为结尾：")
-        for file in problematic_files:
-            print(file)
-    else:
-        print("所有文件的文件头都正确地包含 --- 作为结尾。")
+    parser = argparse.ArgumentParser(description="校验 Hexo 文章的 front matter")
+    parser.add_argument('directory', nargs='?', default="source/_posts", help='文章目录')
+    parser.add_argument('--format', choices=['text', 'json'], default='text',
+                        help='json 时每个有问题的文件输出一行 JSON')
+    parser.add_argument('--all', action='store_true', help='同时输出没有问题的文件')
+    parser.add_argument('--no-warnings', action='store_true', help='忽略警告')
+    parser.add_argument('--workers', type=int, help='进程数')
+    args = parser.parse_args()
+
+    results = check_hexo_front_matter(args.directory, args.workers)
+    failed = 0
+    for result in results:
+        if args.no_warnings:
+            result['issues'] = [issue for issue in result['issues'] if issue['severity'] == 'error']
+        if not result['ok']:
+            failed += 1
+        if not result['issues'] and not args.all:
+            continue
+        if args.format == 'json':
+            print(json.dumps(result, ensure_ascii=False))
+        else:
+            for issue in result['issues']:
+                key = f" [{issue['key']}]" if issue.get('key') else ''
+                detail = f": {issue['detail']}" if issue.get('detail') else ''
+                print(f"{result['path']}: {issue['code']} {issue['severity']}{key} {issue['message']}{detail}")
+
+    summary = f"检查 {len(results)} 个文件，{failed} 个文件的 front matter 有错误。"
+    print(summary if args.format == 'text' else json.dumps({'checked': len(results), 'failed': failed}),
+          file=sys.stderr)
+    sys.exit(1 if failed else 0)
 
 
 if __name__ == "__main__":
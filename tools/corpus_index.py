@@ -0,0 +1,344 @@
+"""
+文章语料索引：解析 source/_posts 下每篇文章的 front matter、内容哈希、大小和固定链接，缓存到 SQLite
+以 路径 + mtime + 大小 判断文件是否变化，再次运行时只重新解析变化的文件，检查、修复、sitemap、推送等工具都可以直接查询
+用法：
+    python tools/corpus_index.py            # 刷新索引并打印统计
+    python tools/corpus_index.py --json     # 输出所有文章的索引数据
+    from corpus_index import CorpusIndex
+    with CorpusIndex() as index:
+        for post in index.posts():
+            ...
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from hexo_scaffold import load_hexo_config, slugize
+
+DEFAULT_INDEX_FILE = os.getenv("CORPUS_INDEX", ".corpus_index.sqlite")
+# 变化的文件超过这个数量时用多进程解析
+PARALLEL_THRESHOLD = 200
+# 索引格式变化时递增，旧索引会被整体重建
+SCHEMA_VERSION = 1
+
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+# 与 hexo-front-matter 相同的两种写法：带开头分隔符，或只有结尾分隔符
+FRONT_MATTER = re.compile(r'^(-{3,}|;{3,})\r?\n([\s\S]*?)\r?\n\1[ \t]*(?:\r?\n([\s\S]*)|$)')
+FRONT_MATTER_NO_OPENING = re.compile(r'^([\s\S]+?)\r?\n(-{3,}|;{3,})[ \t]*(?:\r?\n([\s\S]*)|$)')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    title TEXT,
+    date TEXT,
+    categories TEXT,
+    tags TEXT,
+    keywords TEXT,
+    description TEXT,
+    permalink TEXT,
+    front_matter TEXT,
+    body_offset INTEGER,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+COLUMNS = ('path', 'mtime_ns', 'size', 'hash', 'title', 'date', 'categories', 'tags', 'keywords',
+           'description', 'permalink', 'front_matter', 'body_offset', 'error')
+JSON_COLUMNS = ('categories', 'tags', 'front_matter')
+
+
+def split_front_matter(text):
+    """
+    拆分 front matter 与正文
+    :return: (front matter 文本, 正文起始偏移)，没有 front matter 时前者为 None
+    """
+    match = FRONT_MATTER.match(text)
+    if match:
+        return match.group(2), match.start(3) if match.group(3) is not None else len(text)
+    match = FRONT_MATTER_NO_OPENING.match(text)
+    if match and ':' in match.group(1):
+        return match.group(1), match.start(3) if match.group(3) is not None else len(text)
+    return None, 0
+
+
+def _to_json_value(value):
+    """把 YAML 解析出的日期等值转换为可以存进 JSON 的形式"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, dict):
+        return {str(k): _to_json_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_json_value(v) for v in value]
+    return value
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(item) for item in value if item is not None]
+    return [str(value)]
+
+
+def _as_text(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return ', '.join(str(item) for item in value)
+    return str(value)
+
+
+def _as_json_date(value):
+    value = _to_json_value(value)
+    return None if value is None else str(value)
+
+
+def make_permalink(config, slug, front_matter):
+    """按 _config.yml 的 permalink 规则生成文章的完整链接，front matter 中的 permalink 优先"""
+    url = config['url'].rstrip('/')
+    if front_matter.get('permalink'):
+        return f"{url}/{str(front_matter['permalink']).lstrip('/')}"
+    post_date = front_matter.get('date')
+    if isinstance(post_date, str):
+        try:
+            post_date = datetime.strptime(post_date[:19], '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            post_date = None
+    if isinstance(post_date, date) and not isinstance(post_date, datetime):
+        post_date = datetime(post_date.year, post_date.month, post_date.day)
+    categories = _as_list(front_matter.get('categories'))
+    values = {
+        'title': slug,
+        'name': os.path.basename(slug),
+        'post_title': slugize(str(front_matter.get('title', '')), config['filename_case']),
+        'category': slugize(categories[0]) if categories else 'uncategorized',
+    }
+    if post_date:
+        values.update(year=post_date.strftime('%Y'), month=post_date.strftime('%m'), day=post_date.strftime('%d'),
+                      i_month=str(post_date.month), i_day=str(post_date.day), hour=post_date.strftime('%H'),
+                      minute=post_date.strftime('%M'), second=post_date.strftime('%S'))
+    path = re.sub(r':(\w+)', lambda m: values.get(m.group(1), m.group(0)), config['permalink'])
+    return f"{url}/{path.lstrip('/')}"
+
+
+def parse_post(path, posts_dir, config):
+    """
+    解析一篇文章
+    :return: 索引记录 dict（不含 mtime_ns 和 size）
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    record = dict.fromkeys(COLUMNS)
+    record['path'] = path
+    record['hash'] = hashlib.sha256(raw).hexdigest()
+    record['categories'] = record['tags'] = []
+    record['front_matter'] = {}
+    record['body_offset'] = 0
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        record['error'] = f"decode: {e}"
+        return record
+    front_matter_text, body_offset = split_front_matter(text)
+    # 记录字节偏移，便于只读取正文
+    record['body_offset'] = len(text[:body_offset].encode('utf-8'))
+    front_matter = {}
+    if front_matter_text is None:
+        record['error'] = "missing front matter"
+    else:
+        try:
+            front_matter = yaml.load(front_matter_text, Loader=YAML_LOADER) or {}
+            if not isinstance(front_matter, dict):
+                raise ValueError("front matter is not a mapping")
+        except (yaml.YAMLError, ValueError) as e:
+            record['error'] = f"yaml: {str(e).splitlines()[0]}"
+            front_matter = {}
+    slug = os.path.splitext(os.path.relpath(path, posts_dir))[0].replace(os.sep, '/')
+    record.update(
+        title=_as_text(front_matter.get('title')),
+        date=_as_json_date(front_matter.get('date')),
+        categories=_as_list(front_matter.get('categories')),
+        tags=_as_list(front_matter.get('tags')),
+        keywords=_as_text(front_matter.get('keywords')),
+        description=_as_text(front_matter.get('description')),
+        permalink=make_permalink(config, slug, front_matter),
+        front_matter=_to_json_value(front_matter),
+    )
+    return record
+
+
+def _parse_many(args):
+    paths, posts_dir, config = args
+    return [parse_post(path, posts_dir, config) for path in paths]
+
+
+def scan_posts(posts_dir):
+    """递归列出目录下所有 .md 文件及其 (mtime_ns, size)"""
+    found = {}
+    stack = [posts_dir]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.md'):
+                    stat = entry.stat()
+                    found[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+
+class CorpusIndex:
+    """
+    文章语料索引
+    :param root: Hexo 站点根目录
+    :param index_file: 索引数据库文件，默认在站点根目录下
+    :param posts_dir: 文章目录，默认为 <source_dir>/_posts
+    """
+
+    def __init__(self, root='.', index_file=None, posts_dir=None):
+        self.root = root
+        self.config = load_hexo_config(os.path.join(root, '_config.yml'))
+        self.posts_dir = os.path.normpath(posts_dir or os.path.join(root, self.config['source_dir'], '_posts'))
+        self.index_file = index_file or os.path.join(root, DEFAULT_INDEX_FILE)
+        self.conn = sqlite3.connect(self.index_file)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._check_version()
+        self.refreshed = False
+
+    def _check_version(self):
+        """索引格式或站点配置变化时清空索引"""
+        fingerprint = json.dumps({'schema': SCHEMA_VERSION, 'config': self.config}, sort_keys=True)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row is None or row[0] != fingerprint:
+            with self.conn:
+                self.conn.execute("DELETE FROM posts")
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)",
+                                  (fingerprint,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def refresh(self, workers=None):
+        """
+        同步索引与磁盘：解析新增和变化的文件，删除已不存在的文件
+        :param workers: 解析进程数，默认按 CPU 数
+        :return: 统计 dict：total / parsed / removed / seconds
+        """
+        started = time.perf_counter()
+        found = scan_posts(self.posts_dir)
+        known = {row[0]: (row[1], row[2]) for row in self.conn.execute("SELECT path, mtime_ns, size FROM posts")}
+        changed = [path for path, signature in found.items() if known.get(path) != signature]
+        removed = [path for path in known if path not in found]
+
+        if len(changed) >= PARALLEL_THRESHOLD and (workers or os.cpu_count() or 1) > 1:
+            workers = workers or os.cpu_count()
+            chunk = max(1, len(changed) // (workers * 4))
+            batches = [(changed[i:i + chunk], self.posts_dir, self.config) for i in range(0, len(changed), chunk)]
+            with ProcessPoolExecutor(workers) as pool:
+                records = [record for batch in pool.map(_parse_many, batches) for record in batch]
+        else:
+            records = _parse_many((changed, self.posts_dir, self.config))
+
+        rows = []
+        for record in records:
+            record['mtime_ns'], record['size'] = found[record['path']]
+            rows.append(tuple(json.dumps(record[column], ensure_ascii=False) if column in JSON_COLUMNS
+                              else record[column] for column in COLUMNS))
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO posts ({', '.join(COLUMNS)}) "
+                                  f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+            self.conn.executemany("DELETE FROM posts WHERE path = ?", [(path,) for path in removed])
+        self.refreshed = True
+        return {'total': len(found), 'parsed': len(changed), 'removed': len(removed),
+                'seconds': time.perf_counter() - started}
+
+    def _ensure_fresh(self):
+        if not self.refreshed:
+            self.refresh()
+
+    @staticmethod
+    def _row_to_post(row):
+        post = dict(row)
+        for column in JSON_COLUMNS:
+            post[column] = json.loads(post[column]) if post[column] else ([] if column != 'front_matter' else {})
+        return post
+
+    def posts(self, category=None, tag=None, with_errors=True):
+        """
+        按路径顺序返回所有文章的索引记录
+        :param category: 只返回包含该分类的文章
+        :param tag: 只返回包含该标签的文章
+        :param with_errors: 是否包含 front matter 解析失败的文章
+        """
+        self._ensure_fresh()
+        for row in self.conn.execute("SELECT * FROM posts ORDER BY path"):
+            post = self._row_to_post(row)
+            if category and category not in post['categories']:
+                continue
+            if tag and tag not in post['tags']:
+                continue
+            if not with_errors and post['error']:
+                continue
+            yield post
+
+    def get(self, path):
+        """按路径查询一篇文章，不存在时返回 None"""
+        self._ensure_fresh()
+        row = self.conn.execute("SELECT * FROM posts WHERE path = ?", (path,)).fetchone()
+        return self._row_to_post(row) if row else None
+
+    def by_permalink(self, permalink):
+        self._ensure_fresh()
+        row = self.conn.execute("SELECT * FROM posts WHERE permalink = ?", (permalink,)).fetchone()
+        return self._row_to_post(row) if row else None
+
+    def body(self, post):
+        """读取文章正文（front matter 之后的部分）"""
+        with open(post['path'], 'rb') as f:
+            f.seek(post['body_offset'] or 0)
+            return f.read().decode('utf-8', errors='replace')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="刷新并查询文章语料索引")
+    parser.add_argument('--root', default='.', help='Hexo 站点根目录')
+    parser.add_argument('--index-file', help=f'索引文件，默认 <root>/{DEFAULT_INDEX_FILE}')
+    parser.add_argument('--workers', type=int, help='解析进程数')
+    parser.add_argument('--json', action='store_true', help='以 JSON Lines 输出所有文章的索引记录')
+    parser.add_argument('--errors', action='store_true', help='只列出 front matter 解析失败的文章')
+    args = parser.parse_args()
+
+    with CorpusIndex(args.root, args.index_file) as index:
+        stats = index.refresh(args.workers)
+        if args.json:
+            for post in index.posts():
+                sys.stdout.write(json.dumps(post, ensure_ascii=False) + '\n')
+        elif args.errors:
+            for post in index.posts():
+                if post['error']:
+                    print(f"{post['path']}: {post['error']}")
+        print(f"索引 {stats['total']} 篇文章，重新解析 {stats['parsed']} 篇，移除 {stats['removed']} 篇，"
+              f"用时 {stats['seconds']:.3f}s", file=sys.stderr)
@@ -0,0 +1,77 @@
+import os
+import json
+import time
+
+from atomic_write import write_json_atomically
+
+
+def is_pending(post):
+    """文章还需要生成：尚未创建，且没有被 dedup_titles.py 标记为其他文章的重复"""
+    return not post.get('created') and not post.get('duplicate_of')
+
+
+class DatasetJournal:
+    """
+    数据集的追加式进度日志
+    每篇文章完成时只向 <dataset>.journal.jsonl 追加一行，运行结束（或手动）时再压缩回数据集 JSON 文件
+    :param dataset_file: 数据集 JSON 文件路径
+    :param journal_file: 日志文件路径，默认在数据集文件名后加 .journal.jsonl
+    """
+
+    def __init__(self, dataset_file, journal_file=None):
+        self.dataset_file = dataset_file
+        self.journal_file = journal_file or f"{dataset_file}.journal.jsonl"
+        self._journal = None
+
+    def replay(self):
+        """读取日志中已完成文章的 filename 集合，忽略崩溃时写了一半的最后一行"""
+        created = set()
+        if not os.path.exists(self.journal_file):
+            return created
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if event.get('created'):
+                    created.add(event['filename'])
+                else:
+                    created.discard(event['filename'])
+        return created
+
+    def load(self):
+        """加载数据集并回放日志，返回带最新 created 状态的文章列表"""
+        with open(self.dataset_file, 'r') as f:
+            posts = json.load(f)
+        created = self.replay()
+        if created:
+            for post in posts:
+                if post['filename'] in created:
+                    post['created'] = True
+        return posts
+
+    def mark_created(self, post):
+        """记录一篇文章已创建，立即落盘"""
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+        event = {'filename': post['filename'], 'index': post.get('index'), 'created': True, 'time': time.time()}
+        self._journal.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        post['created'] = True
+
+    def compact(self, posts=None):
+        """把日志合并回数据集文件并清空日志"""
+        if posts is None:
+            posts = self.load()
+        self.close()
+        write_json_atomically(self.dataset_file, posts)
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        return posts
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
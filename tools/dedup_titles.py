@@ -0,0 +1,364 @@
+"""
+标题近似去重：在生成文章之前找出各数据集中意思几乎相同的标题（如同一主题的多篇入门指南），
+避免为重复的标题生成文章、让两篇相似的文章在搜索结果中互相竞争
+标题去掉入门套话（「A Beginner's Guide to」「Getting Started with」「Basics」等）后只保留主题词，
+按词（中文按相邻字对）和相邻词对切分为 shingle，用 MinHash 签名 + LSH 分桶找候选对，再用签名估计的 Jaccard 相似度确认；
+每个标题在桶内最多比较 MAX_BUCKET_COMPARISONS 次，整体复杂度与标题数近似线性
+默认只在同一分类、同一语言内比较（「HTML5 入门」和「CSS3 入门」句式相同但不是重复）
+用法：
+    python tools/dedup_titles.py                       # 只输出报告
+    python tools/dedup_titles.py --mark                # 在数据集中给重复的标题加上 duplicate_of，生成时跳过
+    python tools/dedup_titles.py --remove              # 直接从数据集中删除尚未生成的重复标题
+    python tools/dedup_titles.py tools/titles/articles_dataset_05.json --threshold 0.6
+"""
+import os
+import re
+import sys
+import glob
+import json
+import hashlib
+import argparse
+import unicodedata
+
+import numpy as np
+
+from atomic_write import write_json_atomically
+from llm_metrics import estimate_cost, estimate_tokens
+
+DEFAULT_DATASETS = ('tools/titles/*.json', 'tools/datasets/program_az_guids*.json')
+DEFAULT_THRESHOLD = 0.7
+NUM_PERM = 128
+SEED = 1
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+# 生成一篇文章的输入（系统提示词 + 标题）和输出 token 数，无法从提示词文件和已生成的文章估计时使用
+DEFAULT_PROMPT_TOKENS = 600
+DEFAULT_COMPLETION_TOKENS = 1500
+# LSH 桶内每个标题最多与前面多少个标题比较，大桶（大量同主题的标题）不会退化为平方复杂度
+MAX_BUCKET_COMPARISONS = 32
+
+# 只去掉虚词；started、new、developer 之类的词可能是标题的主题，只在下面的套话短语中才去掉
+STOPWORDS = set("""
+a an the and or of for to with in on at by from as into vs your you our it its this that
+how what why when is are be can do
+""".split())
+# 入门类标题的套话短语，整个短语出现时才去掉；同一主题的入门指南去掉套话后只剩主题词，可以互相匹配
+BOILERPLATE = re.compile(r"""
+    (?:\b(?:a|an|the|your)\s+)?
+    (?:\b(?:ultimate|complete|comprehensive|essential|definitive|practical|quick|simple|easy|gentle|friendly
+        |beginners?|newbies?|step[\s-]by[\s-]step|in[\s-]depth|hands[\s-]on)\s+)*
+    \b(?:guide|tutorial|introduction|intro|overview|primer|walkthrough|handbook|crash\s+course)s?\b
+    (?:\s+(?:to|for|on|of)\b)?
+  | (?:\b(?:an?)\s+)?\b(?:easy|quick|gentle|smooth)\s+start\b(?:\s+(?:to|with|for)\b)?
+  | \b(?:getting|get)\s+started\b(?:\s+(?:with|in|on)\b)?
+  | (?:^|(?<=\bto\s))(?:understanding|mastering|learning|exploring|discovering)\b
+  | (?:\bthe\s+)?\b(?:basics|fundamentals|essentials)\b(?:\s+of\b)?
+  | \bhow\s+to\s+(?:use|learn)\b
+  | \bfor\s+(?:absolute\s+|complete\s+|total\s+)?
+        (?:beginners|newbies|novices|dummies|new\s+(?:developers|users|programmers|learners))\b
+  | \b(?:absolute\s+)?(?:beginners?|newbies?|novices?)\b
+  | \bfrom\s+(?:scratch|zero|the\s+ground\s+up)\b
+  | \bfirst\s+steps\b(?:\s+(?:with|in)\b)?
+  | \bstep[\s-]by[\s-]step\b
+  | \bmade\s+easy\b | \bexplained\b | \b101\b
+""", re.VERBOSE)
+CJK_BOILERPLATE = re.compile(r"从零开始|零基础|快速上手|进阶(?:学习|教程|指南)|(?:入门|新手|初学者)(?:指南|教程)?|(?:完全|全面|实用|快速)?(?:指南|教程)"
+                             r"|深入理解|理解|了解|掌握|(?<![器度化])学习|详解|简介")
+# 中文虚词，替换为空格，避免在相邻字对中与实词连在一起
+CJK_FUNCTION_WORDS = re.compile(r"如何|怎样|怎么|使用|利用|进行|以及|及其|与|和|的")
+# 主标题与副标题之间的分隔符
+SUBTITLE = re.compile(r"\s*[:：|｜—–]\s*|\s+-\s+")
+TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*|[㐀-鿿]+")
+CJK = re.compile(r"[㐀-鿿]")
+
+
+def _content_words(text):
+    """去掉虚词，简单去掉英文复数；连续的中文切分为相邻字对，单个汉字保留为一个词"""
+    text = CJK_FUNCTION_WORDS.sub(' ', text)
+    words = []
+    for word in TOKEN.findall(text):
+        if CJK.match(word):
+            # 单字会让「使用」「学习」等常见字在不相关的标题之间大量重合
+            words.extend(word[i:i + 2] for i in range(max(1, len(word) - 1)))
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        if word not in STOPWORDS:
+            words.append(word)
+    return words
+
+
+def _strip_boilerplate(text):
+    """去掉套话短语，返回 (剩下的文本, 是否去掉了套话)"""
+    stripped = CJK_BOILERPLATE.sub(' ', BOILERPLATE.sub(' ', text))
+    return stripped, stripped != text
+
+
+def normalize(title):
+    """
+    小写、去掉变音符号和标点、去掉套话和虚词后的主题词
+    主标题带有入门套话时（「A Beginner's Guide to Docker: ...」「Docker Basics: ...」）只取主标题，
+    副标题的措辞在同一主题的入门指南之间各不相同；否则取整个标题
+    """
+    text = unicodedata.normalize('NFKC', title).lower().replace("’", "'")
+    text = re.sub(r"'s\b|(?<=s)'", "", text)
+    head = SUBTITLE.split(text, maxsplit=1)[0]
+    head, has_boilerplate = _strip_boilerplate(head)
+    words = _content_words(head)
+    if has_boilerplate and words:
+        return words
+    return _content_words(_strip_boilerplate(text)[0])
+
+
+def shingles(title):
+    """词和相邻词对组成的集合"""
+    words = normalize(title)
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+class MinHasher:
+    """
+    用 num_perm 个形如 (a * x + b) mod p 的哈希函数计算 MinHash 签名
+    :param num_perm: 签名长度
+    :param seed: 随机种子，同一种子的签名可以互相比较
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, tokens):
+        hashes = np.array([int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=4).digest(), 'little')
+                           for token in tokens], dtype=np.uint64)
+        # uint64 乘法溢出时按 2^64 取模，作为哈希函数没有影响
+        values = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+        return values.min(axis=0)
+
+
+def lsh_params(threshold, num_perm):
+    """选择 bands * rows <= num_perm，使 S 曲线的拐点 (1/bands)^(1/rows) 最接近阈值"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def find_clusters(titles, groups=None, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM):
+    """
+    找出近似重复的标题
+    :param titles: 标题列表
+    :param groups: 与 titles 对应的分组（如分类），只在同一分组内比较；为 None 时全部一起比较
+    :return: 簇列表，每个簇为 [(下标, 与簇中第一个标题的估计相似度), ...]，按下标排序，只包含两个以上标题的簇
+    """
+    hasher = MinHasher(num_perm)
+    bands, rows = lsh_params(threshold, num_perm)
+    token_sets = [shingles(title) for title in titles]
+    valid = [i for i, tokens in enumerate(token_sets) if tokens]
+    signatures = np.zeros((len(titles), num_perm), dtype=np.uint64)
+    for i in valid:
+        signatures[i] = hasher.signature(token_sets[i])
+
+    union_find = UnionFind(len(titles))
+    # 签名完全相同的标题直接合并，LSH 只处理每个不同签名的第一个标题
+    representatives = []
+    first_seen = {}
+    for i in valid:
+        key = (groups[i] if groups else None, signatures[i].tobytes())
+        if key in first_seen:
+            union_find.union(first_seen[key], i)
+        else:
+            first_seen[key] = i
+            representatives.append(i)
+
+    checked = set()
+    for band in range(bands):
+        buckets = {}
+        for i in representatives:
+            key = (groups[i] if groups else None, signatures[i, band * rows:(band + 1) * rows].tobytes())
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            # 每个标题与桶中前面最多 MAX_BUCKET_COMPARISONS 个标题比较（不只是桶中第一个）
+            for position, other in enumerate(members[1:], 1):
+                for first in members[max(0, position - MAX_BUCKET_COMPARISONS):position]:
+                    pair = (first, other)
+                    if pair in checked or union_find.find(first) == union_find.find(other):
+                        continue
+                    checked.add(pair)
+                    if np.mean(signatures[first] == signatures[other]) >= threshold:
+                        union_find.union(*pair)
+
+    groups = {}
+    for i in valid:
+        groups.setdefault(union_find.find(i), []).append(i)
+    clusters = []
+    for members in groups.values():
+        if len(members) > 1:
+            first = signatures[members[0]]
+            clusters.append([(i, float(np.mean(signatures[i] == first))) for i in members])
+    return sorted(clusters, key=lambda cluster: cluster[0][0])
+
+
+def load_entries(dataset_files):
+    """
+    读取数据集中的所有标题
+    支持 titles/*.json（文章列表）和 datasets/*.json（分类 -> 标题列表）两种格式
+    :return: (数据 dict {文件: 内容}, 标题条目列表)
+    """
+    data = {}
+    entries = []
+    for dataset_file in dataset_files:
+        with open(dataset_file, 'r', encoding='utf-8') as f:
+            content = json.load(f)
+        data[dataset_file] = content
+        if isinstance(content, list):
+            for position, post in enumerate(content):
+                entries.append({'file': dataset_file, 'key': position, 'title': post['post_title'],
+                                'category': str(post.get('post_category', '')).lower(),
+                                'filename': post.get('filename'), 'post_file': post.get('post_file'),
+                                'created': bool(post.get('created'))})
+        else:
+            for category, titles in content.items():
+                for position, title in enumerate(titles):
+                    entries.append({'file': dataset_file, 'key': (category, position), 'title': title,
+                                    'category': category.lower(), 'filename': None, 'post_file': None,
+                                    'created': False})
+    # 分类 -> 标题列表的文件是生成数据集的来源，与数据集中完全相同的标题是同一篇文章，不算重复
+    dataset_titles = {entry['title'] for entry in entries if isinstance(entry['key'], int)}
+    entries = [entry for entry in entries if isinstance(entry['key'], int) or entry['title'] not in dataset_titles]
+    return data, entries
+
+
+def average_article_tokens(entries, sample=200):
+    """用已生成文章的平均长度估计一篇文章的输出 token 数"""
+    sizes = []
+    for entry in entries:
+        if entry['created'] and entry['post_file'] and os.path.exists(entry['post_file']):
+            with open(entry['post_file'], 'r', encoding='utf-8') as f:
+                sizes.append(estimate_tokens(f.read()))
+            if len(sizes) >= sample:
+                break
+    return sum(sizes) // len(sizes) if sizes else DEFAULT_COMPLETION_TOKENS
+
+
+def plan_duplicates(entries, clusters):
+    """
+    为每个簇选出保留的标题：优先保留已经生成的文章，其次是最先出现的标题
+    :return: [(保留的条目下标, [重复的条目下标, ...]), ...]
+    """
+    plans = []
+    for cluster in clusters:
+        members = [i for i, _ in cluster]
+        keep = next((i for i in members if entries[i]['created']), members[0])
+        plans.append((keep, [i for i in members if i != keep]))
+    return plans
+
+
+def apply_plans(data, entries, plans, remove=False):
+    """
+    在数据集中标记或删除尚未生成的重复标题，已生成的文章不做改动
+    分类 -> 标题列表格式的数据集无法标记，只在 remove 时删除
+    :return: 修改的标题数
+    """
+    removals = {}
+    touched = set()
+    for keep, duplicates in plans:
+        canonical = entries[keep]
+        for i in duplicates:
+            entry = entries[i]
+            if entry['created']:
+                continue
+            if remove:
+                removals.setdefault(entry['file'], []).append(entry['key'])
+            elif isinstance(entry['key'], int):
+                data[entry['file']][entry['key']]['duplicate_of'] = canonical['filename'] or canonical['title']
+            else:
+                continue
+            touched.add(i)
+    for dataset_file, keys in removals.items():
+        content = data[dataset_file]
+        # 从后往前删除，避免下标变化
+        for key in sorted(keys, key=lambda k: k if isinstance(k, int) else k[1], reverse=True):
+            if isinstance(key, int):
+                del content[key]
+            else:
+                del content[key[0]][key[1]]
+    for dataset_file in {entries[i]['file'] for i in touched}:
+        write_json_atomically(dataset_file, data[dataset_file])
+    return len(touched)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="找出数据集中近似重复的标题")
+    parser.add_argument('datasets', nargs='*', help='数据集文件，默认为 tools/titles 和 tools/datasets 下的所有数据集')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='判定为重复的 Jaccard 相似度')
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument('--mark', action='store_true', help='给重复的标题加上 duplicate_of，生成时跳过')
+    action.add_argument('--remove', action='store_true', help='从数据集中删除尚未生成的重复标题')
+    parser.add_argument('--model', default='gpt-4o-mini-2024-07-18', help='估算节省费用使用的模型')
+    parser.add_argument('--system-prompt', default='tools/system_prompt.txt', help='估算输入 token 数使用的系统提示词')
+    parser.add_argument('--across-categories', action='store_true', help='不同分类的标题之间也比较')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出簇')
+    args = parser.parse_args()
+
+    dataset_files = args.datasets or sorted(path for pattern in DEFAULT_DATASETS for path in glob.glob(pattern))
+    data, entries = load_entries(dataset_files)
+    # 中文标题与英文标题面向不同的读者，即使主题相同也不算重复
+    languages = [bool(CJK.search(entry['title'])) for entry in entries]
+    groups = languages if args.across_categories else list(zip([entry['category'] for entry in entries], languages))
+    clusters = find_clusters([entry['title'] for entry in entries], groups, args.threshold)
+    plans = plan_duplicates(entries, clusters)
+
+    for cluster, (keep, _) in zip(clusters, plans):
+        if args.json:
+            print(json.dumps([{**entries[i], 'key': entries[i]['key'], 'similarity': round(similarity, 3),
+                               'keep': i == keep} for i, similarity in cluster], ensure_ascii=False))
+            continue
+        print(f"\n簇（{len(cluster)} 个标题）")
+        for i, similarity in cluster:
+            entry = entries[i]
+            flag = '保留' if i == keep else ('已生成' if entry['created'] else '重复')
+            print(f"  [{flag}] {similarity:.2f} {entry['title']}  ({os.path.basename(entry['file'])})")
+
+    pending = sum(1 for _, duplicates in plans for i in duplicates if not entries[i]['created'])
+    existing = sum(1 for _, duplicates in plans for i in duplicates if entries[i]['created'])
+    completion_tokens = average_article_tokens(entries)
+    prompt_tokens = DEFAULT_PROMPT_TOKENS
+    if os.path.exists(args.system_prompt):
+        with open(args.system_prompt, 'r', encoding='utf-8') as f:
+            prompt_tokens = estimate_tokens(f.read()) + 30
+    saved_tokens = pending * (prompt_tokens + completion_tokens)
+    cost = estimate_cost(args.model, pending * prompt_tokens, pending * completion_tokens)
+    print(f"\n{len(entries)} 个标题，{len(clusters)} 个重复簇：尚未生成的重复标题 {pending} 个，"
+          f"已经生成的重复文章 {existing} 篇", file=sys.stderr)
+    print(f"跳过尚未生成的重复标题预计节省 {saved_tokens} tokens（每篇约 {prompt_tokens} 输入 + "
+          f"{completion_tokens} 输出）" + (f"，约 ${cost:.2f}（{args.model}）" if cost is not None else ""),
+          file=sys.stderr)
+
+    if args.mark or args.remove:
+        changed = apply_plans(data, entries, plans, remove=args.remove)
+        print(f"{'删除' if args.remove else '标记'}了 {changed} 个重复标题", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,52 +1,249 @@
-import base64
-import os
+"""
+修正生成文章的格式：所有修正规则在一次逐行扫描中完成，只有内容确实发生变化的文件才会原子地写回，
+其余文件保持不动（不改变 mtime，Hexo 的缓存不会失效）
+规则：
+- strip_fence: 去掉整篇文章外层的 ```markdown ... ``` 包裹
+- quote_title: title 加双引号
+- escape_description: description 中的双引号转义为 &quot;
+- relink_images: markdown 图片链接统一指向 IMAGE_PATH
+用法：
+    python tools/fix_format.py check/
+    python tools/fix_format.py source/_posts --dry-run      # 只输出 diff，不写文件
+    python tools/fix_format.py check/ --rules quote_title,escape_description
+"""
 import re
+import sys
+import difflib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
+from check import list_posts
+from atomic_write import write_text_atomically
 
-def clean_code_files(directory):
-    # 遍历目录下的所有文件
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            try:
-                print(f"Checking {file_path}")
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-
-                # 如果文件以 ```markdown 开头且以 ``` 结尾，修改内容
-                if lines[0].strip() == '```markdown' and lines[-1].strip() == '```':
-                    print(f" YES GOT\n")
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.writelines(lines[1:-1])
-
-                # 检查并修改第二行的 title 格式
-                if len(lines) > 1 and lines[1].startswith('title: '):
-                    title_content = lines[1][7:].strip()
-                    if not (title_content.startswith('"') and title_content.endswith('"')):
-                        lines[1] = f'title: "{title_content}"\n'
-
-                # 修改 description 标签
-                for i, line in enumerate(lines):
-                    if line.startswith('description: '):
-                        description_content = line[13:].strip()
-                        if '"' in description_content:
-                            description_content = description_content.replace('"', '&quot;')
-                            lines[i] = f'description: "{description_content}"\n'
-
-                # 修改 markdown 格式图片链接
-                for i, line in enumerate(lines):
-                    lines[i] = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)',
-                                      r'![\1](/images/python-standard-libs.png)', line)
-
-                # 将修改后的内容写回文件
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.writelines(lines)
-
-                    print(f'Processed file: {file_path}')
-            except Exception as e:
-                print(f'Error processing file {file_path}: {e}')
-
-
-# 使用示例
-directory_path = 'check/'  # 将此替换为你的文件夹路径
-clean_code_files(directory_path)
+IMAGE_PATH = '/images/python-standard-libs.png'
+IMAGE_LINK = re.compile(r'!\[([^\]]*)\]\(([^)]+)\)')
+WRAPPER_FENCE = re.compile(r'^(`{3,}|~{3,})\s*(markdown|md)?\s*$', re.IGNORECASE)
+FENCE = re.compile(r'^\s*(`{3,}|~{3,})')
+UNESCAPED_QUOTE = re.compile(r'(?<!\\)"')
+
+# 扫描到的位置
+START = 'start'
+FRONT_MATTER = 'front_matter'
+BODY = 'body'
+
+
+class LineContext:
+    """当前行在文件中的位置，由 rewrite 维护"""
+
+    def __init__(self):
+        self.number = 0
+        self.is_last = False
+        self.section = START
+
+    def advance(self, line):
+        """根据写出的行更新所处的位置"""
+        stripped = line.strip()
+        if self.section == START:
+            if stripped == '---':
+                self.section = FRONT_MATTER
+            elif stripped:
+                self.section = BODY
+        elif self.section == FRONT_MATTER and stripped == '---':
+            self.section = BODY
+
+
+class Transform:
+    """
+    修正规则基类，每个文件开始前调用 reset
+    apply 接收不含换行符的一行，返回修正后的行，返回 None 表示删除这一行
+    """
+    name = None
+
+    def reset(self):
+        pass
+
+    def apply(self, line, ctx):
+        return line
+
+
+class StripFence(Transform):
+    """第一行是 ```markdown 时删除它，以及最后一行与之配对的 ```"""
+    name = 'strip_fence'
+
+    def reset(self):
+        self.wrapped = False
+        self.fence = None
+
+    def apply(self, line, ctx):
+        stripped = line.strip()
+        if ctx.number == 1 and WRAPPER_FENCE.match(stripped):
+            self.wrapped = True
+            return None
+        match = FENCE.match(line)
+        if not match:
+            return line
+        marker = match.group(1)
+        if self.fence is None:
+            # 最后一行单独的 ``` 且之前没有未闭合的代码块，是包裹的结束标记
+            if self.wrapped and ctx.is_last and stripped == marker:
+                return None
+            self.fence = marker
+        elif marker[0] == self.fence[0] and len(marker) >= len(self.fence) and stripped == marker:
+            self.fence = None
+        return line
+
+
+class QuoteTitle(Transform):
+    """title 的值用双引号包起来，值中的双引号转义"""
+    name = 'quote_title'
+
+    def apply(self, line, ctx):
+        if ctx.section != FRONT_MATTER or not line.startswith('title:'):
+            return line
+        value = line[6:].strip()
+        if not value:
+            return line
+        if len(value) > 1 and value[0] == value[-1] == '"':
+            inner = value[1:-1]
+            if not UNESCAPED_QUOTE.search(inner):
+                return line
+        else:
+            inner = value.strip("'")
+        inner = UNESCAPED_QUOTE.sub(r'\\"', inner)
+        return f'title: "{inner}"'
+
+
+class EscapeDescription(Transform):
+    """description 中的双引号替换为 &quot;，整体用双引号包起来"""
+    name = 'escape_description'
+
+    def apply(self, line, ctx):
+        if ctx.section != FRONT_MATTER or not line.startswith('description:'):
+            return line
+        value = line[12:].strip()
+        inner = value[1:-1] if len(value) > 1 and value[0] == value[-1] == '"' else value
+        if '"' not in inner:
+            return line
+        return f'description: "{inner.replace(chr(34), "&quot;")}"'
+
+
+class RelinkImages(Transform):
+    """正文中的 markdown 图片统一指向 IMAGE_PATH"""
+    name = 'relink_images'
+    replacement = f'![\\1]({IMAGE_PATH})'
+
+    def apply(self, line, ctx):
+        if ctx.section != BODY or '![' not in line:
+            return line
+        return IMAGE_LINK.sub(self.replacement, line)
+
+
+# 按执行顺序排列，strip_fence 必须在最前面，后面的规则才能正确判断 front matter 的位置
+RULES = {rule.name: rule for rule in (StripFence, QuoteTitle, EscapeDescription, RelinkImages)}
+
+
+def rewrite(text, transforms):
+    """
+    对文本逐行依次应用所有规则，只扫描一遍
+    :param text: 文件内容
+    :param transforms: Transform 实例列表
+    :return: 修正后的文本，换行符保持原样
+    """
+    for transform in transforms:
+        transform.reset()
+    lines = text.splitlines(keepends=True)
+    ctx = LineContext()
+    output = []
+    for number, raw in enumerate(lines, 1):
+        line = raw.rstrip('\r\n')
+        ending = raw[len(line):]
+        ctx.number = number
+        ctx.is_last = number == len(lines)
+        for transform in transforms:
+            line = transform.apply(line, ctx)
+            if line is None:
+                break
+        if line is None:
+            continue
+        output.append(line + ending)
+        ctx.advance(line)
+    return ''.join(output)
+
+
+def fix_file(file_path, rule_names, dry_run=False):
+    """
+    修正一个文件，内容没有变化时不写回
+    :return: {'path', 'changed', 'diff'（仅 dry_run）, 'error'}
+    """
+    result = {'path': file_path, 'changed': False, 'diff': None, 'error': None}
+    try:
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        fixed = rewrite(text, [RULES[name]() for name in rule_names])
+        if fixed == text:
+            return result
+        result['changed'] = True
+        if dry_run:
+            result['diff'] = ''.join(difflib.unified_diff(
+                text.splitlines(keepends=True), fixed.splitlines(keepends=True), file_path, file_path))
+        else:
+            write_text_atomically(file_path, fixed)
+    except (OSError, UnicodeDecodeError) as e:
+        result['error'] = str(e)
+    return result
+
+
+def _fix_many(paths, rule_names, dry_run):
+    return [fix_file(path, rule_names, dry_run) for path in paths]
+
+
+def clean_code_files(directory, rule_names=None, dry_run=False, workers=None, chunk_size=256):
+    """
+    用进程池并行修正目录下所有文章
+    :param directory: 文章目录
+    :param rule_names: 要应用的规则名，默认全部
+    :param dry_run: 为 True 时不写文件，结果中带 unified diff
+    :param workers: 进程数，为 1 时在当前进程中执行
+    :return: 每个文件的结果列表
+    """
+    rule_names = [name for name in RULES if rule_names is None or name in rule_names]
+    paths = list_posts(directory)
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return [result for chunk in chunks for result in _fix_many(chunk, rule_names, dry_run)]
+    with ProcessPoolExecutor(workers) as pool:
+        batches = pool.map(_fix_many, chunks, [rule_names] * len(chunks), [dry_run] * len(chunks))
+        return [result for results in batches for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="修正生成文章的格式")
+    parser.add_argument('directory', nargs='?', default='check/', help='文章目录')
+    parser.add_argument('--rules', help=f"逗号分隔的规则名，默认全部: {','.join(RULES)}")
+    parser.add_argument('--dry-run', action='store_true', help='只输出 diff，不修改文件')
+    parser.add_argument('--workers', type=int, help='进程数')
+    args = parser.parse_args()
+
+    rule_names = args.rules.split(',') if args.rules else None
+    unknown = set(rule_names or []) - set(RULES)
+    if unknown:
+        parser.error(f"未知的规则: {', '.join(sorted(unknown))}")
+
+    results = clean_code_files(args.directory, rule_names, args.dry_run, args.workers)
+    changed = errors = 0
+    for result in results:
+        if result['error']:
+            errors += 1
+            print(f"Error processing file {result['path']}: {result['error']}", file=sys.stderr)
+        elif result['changed']:
+            changed += 1
+            if args.dry_run:
+                sys.stdout.write(result['diff'])
+            else:
+                print(f"Processed file: {result['path']}")
+    action = "需要修改" if args.dry_run else "已修改"
+    print(f"检查 {len(results)} 个文件，{action} {changed} 个，出错 {errors} 个", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
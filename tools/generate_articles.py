@@ -3,15 +3,32 @@ import json
 from openai import OpenAI
 import argparse
 from dotenv import load_dotenv
+from llm_cache import ResponseCache, cache_key
+from llm_metrics import MetricsRecorder
+from retry_scheduler import RetryScheduler, CircuitBreaker, ContentError, StreamInterruptedError
+from stream_validator import StreamValidator
 
 # 调用 load_dotenv 方法，这会加载位于同一目录下的 .env 文件中的环境变量
 load_dotenv()
 
-# 配置OpenAI API密钥
+# 配置OpenAI API密钥，重试由 scheduler 统一处理，关闭客户端自带的重试
 client = OpenAI(
   api_key=os.getenv("OPENAI_API_KEY"),  # this is also the default, it can be omitted
+  max_retries=0,
 )
 
+# 可用模型列表，默认使用第一个
+models = ["gpt-4o-mini-2024-07-18", "gpt-4o-2024-05-13"]
+
+# 生成结果缓存，与 generate_articles_pro.py 共用同一目录
+response_cache = ResponseCache()
+
+# 每次请求的延迟、token 和费用指标，通过 --metrics-file 写出报告
+metrics = MetricsRecorder()
+
+# 失败重试、按 models 顺序降级和熔断
+scheduler = RetryScheduler(models, breaker=CircuitBreaker())
+
 def read_standard_library_modules_from_file():
     """从JSON文件中读取Python标准库模块名称列表"""
     with open('standard_library_modules.json', 'r', encoding='utf-8') as file:
@@ -26,40 +43,86 @@ def read_system_prompt_from_file():
 
     return system_prompt  # 返回系统提示词
 
-def generate_article(system_prompt, user_prompt):
+def stream_article(model, system_prompt, user_prompt):
     """
-    根据系统提示词和用户提示词生成文章内容
-    :param system_prompt: 系统提示词，用于设定生成内容的背景和风格
-    :param user_prompt: 用户提示词，用于指定文章主题
-    :return: 生成的文章内容
+    用指定模型发起一次流式请求，出错时抛出异常，由 scheduler 决定重试或降级
+    :return: (文章内容, 模型)
     """
+    timer = metrics.start(model, user_prompt.strip())
+    # 逐行校验输出格式，明显不可用时立即中止请求
+    validator = StreamValidator()
+    usage = None
+    response = None
     try:
         # 调用OpenAI API生成文本
-        models = ["gpt-4o-mini-2024-07-18", "gpt-4o-2024-05-13"]
-
         response = client.chat.completions.create(
-            model=models[0],
+            model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
-            stream=True  # 启用流式输出
+            stream=True,  # 启用流式输出
+            stream_options={"include_usage": True},  # 最后一个数据块返回 token 用量
         )
 
         article = ""
-        print(f"{user_prompt}:\n")
+        finish_reason = None
         for chunk in response:
+            if chunk.usage:
+                usage = chunk.usage
             if chunk.choices:
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
                 chunk_message = chunk.choices[0].delta.content
                 if chunk_message:
-                    print(chunk_message, end='', flush=True)  # 流式输出
-                    article += chunk_message
-
-        print("\n")  # 确保输出完整内容后换行
-        return article.strip()
+                    timer.first_token()
+                    text = validator.feed(chunk_message)
+                    print(text, end='', flush=True)  # 流式输出
+                    article += text
+
+        if finish_reason is None:
+            raise StreamInterruptedError(f"{model} 的流式输出中断")
+        if finish_reason == 'content_filter':
+            raise ContentError(f"{model} 拒绝生成该内容")
+        text = validator.finish()
+        print(f"{text}\n")  # 确保输出完整内容后换行
+        article = (article + text).strip()
+        if not article:
+            raise ContentError(f"{model} 返回了空内容")
+    except Exception as e:
+        timer.finish(usage, status="error", error=e)
+        if response is not None:
+            response.close()  # 中止请求，不再为剩余的输出付费
+        raise
+    timer.finish(usage)
+    if validator.repairs:
+        print(f"已修复格式: {'；'.join(validator.repairs)}")
+    if validator.warnings:
+        print(f"格式警告: {'；'.join(validator.warnings)}")
+    return article, model
+
+def generate_article(system_prompt, user_prompt, use_cache=True):
+    """
+    根据系统提示词和用户提示词生成文章内容
+    :param system_prompt: 系统提示词，用于设定生成内容的背景和风格
+    :param user_prompt: 用户提示词，用于指定文章主题
+    :param use_cache: 是否读取缓存，重新生成时传 False（结果仍会写入缓存）
+    :return: 生成的文章内容，重试和降级都失败时返回 None
+    """
+    if use_cache:
+        cached, cached_model = response_cache.lookup(models, system_prompt, user_prompt)
+        if cached:
+            print(f"{user_prompt}:\n\n（使用缓存）\n{cached}\n")
+            metrics.start(cached_model, user_prompt.strip()).finish(status="cached")
+            return cached
+    print(f"{user_prompt}:\n")
+    try:
+        article, model = scheduler.call(lambda model: stream_article(model, system_prompt, user_prompt))
     except Exception as e:
         print(f"生成文章时出错: {e}")
         return None
+    # 以实际生成内容的模型（可能是降级后的模型）作为缓存键
+    response_cache.put(cache_key(model, system_prompt, user_prompt), article, {"model": model})
+    return article
 
 def save_article_to_file(article, folder_path, file_name):
     """
@@ -82,7 +145,13 @@ def main():
     # 解析命令行参数
     parser = argparse.ArgumentParser(description="生成并保存文章")
     parser.add_argument('--auto-save', action='store_true', help="自动保存生成的文章")
+    parser.add_argument('--no-cache', action='store_true', help="不读取也不写入生成结果缓存")
+    parser.add_argument('--max-retries', type=int, default=3, help="每个模型在限流、超时、服务端错误时的最多重试次数")
+    parser.add_argument('--metrics-file', type=str, help="每次请求的延迟、token 和费用指标报告（.jsonl 或 .csv）")
     args = parser.parse_args()
+    response_cache.enabled = not args.no_cache
+    metrics.report_file = args.metrics_file
+    scheduler.max_retries = args.max_retries
 
     # 从文件中读取系统提示词
     system_prompt = read_system_prompt_from_file()
@@ -95,10 +164,12 @@ def main():
     folder_path = 'generated_articles'  # 指定保存文章的文件夹
 
     for user_prompt in user_prompts:
+        use_cache = True
         while True:
             file_name = f"{user_prompt}.md"  # 指定文件名称
-            # 生成文章
-            generated_article = generate_article(system_prompt, f"撰写文章：{user_prompt}")
+            # 生成文章，选择重新生成时跳过缓存
+            generated_article = generate_article(system_prompt, f"撰写文章：{user_prompt}", use_cache)
+            use_cache = False
             if generated_article:
                 if args.auto_save:
                     save_article_to_file(generated_article, folder_path, file_name)  # 自动保存到文件
@@ -113,5 +184,9 @@ def main():
                     elif confirmation == 'k':
                         break
 
+    response_cache.report()
+    metrics.report()
+    scheduler.report()
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,18 +1,42 @@
 import os
+import re
 import json
-import subprocess
-from openai import OpenAI
+import time
+import asyncio
+from openai import OpenAI, AsyncOpenAI
 import argparse
 from dotenv import load_dotenv
+from dataset_journal import DatasetJournal, is_pending
+from atomic_write import write_json_atomically
+from hexo_scaffold import HexoScaffolder
+from llm_cache import ResponseCache, cache_key
+from stream_writer import StreamingArticleWriter, CONTINUE_PROMPT, PARTIAL_DIR
+from llm_metrics import MetricsRecorder, estimate_tokens
+from retry_scheduler import RetryScheduler, CircuitBreaker, ContentError, StreamInterruptedError
+from stream_validator import StreamValidator
+from job_queue import JobQueue, Heartbeat, default_worker_id, DEFAULT_LEASE_SECONDS
 
 # 调用 load_dotenv 方法，这会加载位于同一目录下的 .env 文件中的环境变量
 load_dotenv()
 
-# 配置OpenAI API密钥
+# 配置OpenAI API密钥，重试由 scheduler 统一处理，关闭客户端自带的重试
 client = OpenAI(
   api_key=os.getenv("OPENAI_API_KEY"),  # this is also the default, it can be omitted
+  max_retries=0,
 )
 
+# 可用模型列表，默认使用第一个
+models = ["gpt-4o-mini-2024-07-18", "gpt-4o-2024-05-13"]
+
+# 生成结果缓存，与 generate_articles.py 共用同一目录
+response_cache = ResponseCache()
+
+# 每次请求的延迟、token 和费用指标，通过 --metrics-file 写出报告
+metrics = MetricsRecorder()
+
+# 失败重试、按 models 顺序降级和熔断
+scheduler = RetryScheduler(models, breaker=CircuitBreaker())
+
 def read_standard_library_modules_from_file():
     """从JSON文件中读取Python标准库模块名称列表"""
     with open('python_top_modules_en.json', 'r', encoding='utf-8') as file:
@@ -27,40 +51,140 @@ def read_system_prompt_from_file(prompt_file_path):
 
     return system_prompt  # 返回系统提示词
 
-def generate_article(system_prompt, user_prompt):
+def post_prompts(system_prompt, post):
     """
-    根据系统提示词和用户提示词生成文章内容
-    :param system_prompt: 系统提示词，用于设定生成内容的背景和风格
-    :param user_prompt: 用户提示词，用于指定文章主题
-    :return: 生成的文章内容
+    返回某篇文章的 (系统提示词, 用户提示词)
+    系统提示词保持逐字节不变，分类等每篇文章不同的内容都放在用户提示词里，
+    这样所有请求共享同一个长前缀，可以命中服务端的提示词缓存
+    """
+    catrgory = post['post_category']
+    return system_prompt, f"设定文章中的默认分类为{catrgory}\n\n撰写文章：{post['post_title']}"
+
+def prompt_label(user_prompt):
+    """用户提示词的最后一行（文章标题），用于日志和指标"""
+    return user_prompt.strip().splitlines()[-1]
+
+def build_messages(system_prompt, user_prompt, previous=""):
+    """
+    构建对话消息
+    :param previous: 上次中断时已生成的内容，非空时请求模型从断点继续
     """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    if previous:
+        messages += [
+            {"role": "assistant", "content": previous},
+            {"role": "user", "content": CONTINUE_PROMPT},
+        ]
+    return messages
+
+def stream_article(model, system_prompt, user_prompt, writer=None):
+    """
+    用指定模型发起一次流式请求，出错时抛出异常，由 scheduler 决定重试或降级
+    :return: (文章内容, 模型)
+    """
+    timer = metrics.start(model, prompt_label(user_prompt))
+    previous = writer.existing() if writer else ""
+    # 逐行校验输出格式，明显不可用时立即中止请求
+    validator = StreamValidator()
+    validator.prime(previous)
+    usage = None
+    response = None
     try:
         # 调用OpenAI API生成文本
-        models = ["gpt-4o-mini-2024-07-18", "gpt-4o-2024-05-13"]
-
         response = client.chat.completions.create(
-            model=models[0],
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            stream=True  # 启用流式输出
+            model=model,
+            messages=build_messages(system_prompt, user_prompt, previous),
+            stream=True,  # 启用流式输出
+            stream_options={"include_usage": True},  # 最后一个数据块返回 token 用量
         )
 
-        article = ""
-        print(f"{user_prompt}:\n")
+        parts = []
+        finish_reason = None
+        if writer:
+            writer.open(resume=bool(previous))
+        if previous:
+            print(f"（从中断处继续，已有 {len(previous)} 字）\n{previous}", end='')
         for chunk in response:
+            if chunk.usage:
+                usage = chunk.usage
             if chunk.choices:
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
                 chunk_message = chunk.choices[0].delta.content
                 if chunk_message:
-                    print(chunk_message, end='', flush=True)  # 流式输出
-                    article += chunk_message
+                    timer.first_token()
+                    text = validator.feed(chunk_message)
+                    if text:
+                        print(text, end='', flush=True)  # 流式输出
+                        if writer:
+                            writer.write(text)  # 直接写入磁盘
+                        else:
+                            parts.append(text)
 
-        print("\n")  # 确保输出完整内容后换行
-        return article.strip()
+        if finish_reason is None:
+            raise StreamInterruptedError(f"{model} 的流式输出中断")
+        if finish_reason == 'content_filter':
+            raise ContentError(f"{model} 拒绝生成该内容")
+        text = validator.finish()
+        print(f"{text}\n")  # 确保输出完整内容后换行
+        if writer:
+            writer.write(text)
+        else:
+            parts.append(text)
+        article = writer.finish() if writer else "".join(parts).strip()
+        if not article:
+            raise ContentError(f"{model} 返回了空内容")
+    except Exception as e:
+        timer.finish(usage, status="error", error=e)
+        if response is not None:
+            response.close()  # 中止请求，不再为剩余的输出付费
+        if writer:
+            if isinstance(e, ContentError):
+                writer.discard()  # 不可用的内容不能作为续写的起点
+            else:
+                writer.close()  # 保留已生成的部分，重试或下次运行时继续
+        raise
+    timer.finish(usage)
+    report_validation(validator, user_prompt)
+    return article, model
+
+def report_validation(validator, user_prompt):
+    """打印流式校验时做过的修复和警告"""
+    if validator.repairs:
+        print(f"已修复格式 ({prompt_label(user_prompt)}): {'；'.join(validator.repairs)}")
+    if validator.warnings:
+        print(f"格式警告 ({prompt_label(user_prompt)}): {'；'.join(validator.warnings)}")
+
+def generate_article(system_prompt, user_prompt, use_cache=True, writer=None):
+    """
+    根据系统提示词和用户提示词生成文章内容
+    :param system_prompt: 系统提示词，用于设定生成内容的背景和风格
+    :param user_prompt: 用户提示词，用于指定文章主题
+    :param use_cache: 是否读取缓存，重新生成时传 False（结果仍会写入缓存）
+    :param writer: StreamingArticleWriter，流式内容直接写入磁盘，中断后可从断点继续
+    :return: 生成的文章内容，重试和降级都失败时返回 None
+    """
+    if use_cache:
+        cached, cached_model = response_cache.lookup(models, system_prompt, user_prompt)
+        if cached:
+            print(f"{user_prompt}:\n\n（使用缓存）\n{cached}\n")
+            if writer:
+                writer.open()
+                writer.write(cached)
+                writer.finish()
+            metrics.start(cached_model, prompt_label(user_prompt)).finish(status="cached")
+            return cached
+    print(f"{user_prompt}:\n")
+    try:
+        article, model = scheduler.call(lambda model: stream_article(model, system_prompt, user_prompt, writer))
     except Exception as e:
         print(f"生成文章时出错: {e}")
         return None
+    # 以实际生成内容的模型（可能是降级后的模型）作为缓存键
+    response_cache.put(cache_key(model, system_prompt, user_prompt), article, {"model": model})
+    return article
 
 def save_article_to_file(article, full_path):
     """
@@ -90,41 +214,427 @@ def load_posts_datasets(file_path):
     with open(file_path, 'r') as f:
         return json.load(f)
 
-# 将数据保存回JSON文件
+# 将数据保存回JSON文件（原子替换，平时只追加进度日志，见 DatasetJournal）
 def save_posts_datasets(file_path, posts):
-    with open(file_path, 'w') as f:
-        json.dump(posts, f, indent=4)
+    write_json_atomically(file_path, posts)
 
 
 # 处理每个post
 def process_posts(system_prompt, data_sets, auto_save=False, language="zh"):
-    posts = load_posts_datasets(dataset_file)
+    journal = DatasetJournal(data_sets)
+    posts = journal.load()
+    try:
+        _process_posts(system_prompt, posts, journal, auto_save)
+    finally:
+        journal.compact(posts)
+
+
+def create_hexo_post(scaffolder, post):
+    """为本地Hexo创建新文章（进程内渲染脚手架，等同 hexo new post --path），文件已存在时跳过"""
+    if not os.path.exists(post['post_file']):
+        scaffolder.create(post['post_title'], post['filename'], 'post')
+
+
+def _process_posts(system_prompt, posts, journal, auto_save):
+    scaffolder = HexoScaffolder()
     for post in posts:
-        if not post['created']:
+        if is_pending(post):
             folder_path = post['post_file']
-            post_file_name = post['filename']
-            post_name = post['post_title']
-            catrgory = post['post_category']
-            # 生成文章
-            generated_article = generate_article(f"设定文章中的默认分类为{catrgory} ， {system_prompt}", f"\n\n撰写文章：{post_name}")
+            post_system_prompt, post_user_prompt = post_prompts(system_prompt, post)
+            writer = StreamingArticleWriter(folder_path)
+            use_cache = True
+            while True:
+                # 生成文章，选择重新生成时跳过缓存
+                generated_article = generate_article(post_system_prompt, post_user_prompt, use_cache, writer)
+                # 为本地Hexo创建新文章
+                create_hexo_post(scaffolder, post)
+                confirmation = None
+                # 生产内容
+                if generated_article:
+                    if auto_save:
+                        writer.commit()  # 自动保存到文件
+                        journal.mark_created(post)
+                    else:
+                        # 询问用户是否确认保存
+                        confirmation = input("\n\n是否确认保存该内容 (save)，重新生成 (regenerate)，或者跳过 (skip)? (s/r/k): ").strip().lower()
+                        if confirmation == 's':
+                            writer.commit()  # 保存到文件
+                            journal.mark_created(post)
+                        else:
+                            writer.discard()
+                if confirmation != 'r':
+                    break
+                use_cache = False
+            if confirmation == 'k':
+                break
+
+
+class RateLimiter:
+    """
+    按每分钟请求数 (RPM) 和每分钟 token 数 (TPM) 限流的令牌桶
+    :param rpm: 每分钟最多请求数，0 表示不限制
+    :param tpm: 每分钟最多 token 数，0 表示不限制
+    """
+
+    def __init__(self, rpm=0, tpm=0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.request_tokens = float(rpm)
+        self.token_tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        if self.rpm:
+            self.request_tokens = min(self.rpm, self.request_tokens + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.token_tokens = min(self.tpm, self.token_tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens):
+        """等待直到可以发出一个预计消耗 tokens 个 token 的请求"""
+        # 单个请求的预估不能超过桶容量，否则永远等不到
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+        async with self.lock:
+            while True:
+                self._refill()
+                wait = 0.0
+                if self.rpm and self.request_tokens < 1:
+                    wait = max(wait, (1 - self.request_tokens) * 60 / self.rpm)
+                if self.tpm and self.token_tokens < tokens:
+                    wait = max(wait, (tokens - self.token_tokens) * 60 / self.tpm)
+                if wait <= 0:
+                    if self.rpm:
+                        self.request_tokens -= 1
+                    if self.tpm:
+                        self.token_tokens -= tokens
+                    return
+                await asyncio.sleep(wait)
+
+    def settle(self, estimated, actual):
+        """请求结束后用实际消耗的 token 数修正预估值"""
+        if self.tpm and actual:
+            self._refill()
+            self.token_tokens = min(self.tpm, self.token_tokens + estimated - actual)
+
+
+async def generate_article_async(async_client, system_prompt, user_prompt, limiter, completion_tokens, writer):
+    """
+    generate_article 的异步版本，不逐字打印输出，流式内容直接写入 writer
+    :return: (文章内容, 实际消耗的 token 数)，重试和降级都失败时文章内容为 None
+    """
+    cached, cached_model = response_cache.lookup(models, system_prompt, user_prompt)
+    if cached:
+        writer.open()
+        writer.write(cached)
+        writer.finish()
+        metrics.start(cached_model, prompt_label(user_prompt)).finish(status="cached")
+        return cached, 0
+    estimated = estimate_tokens(system_prompt + user_prompt) + completion_tokens
+    total_used = 0
+
+    async def attempt(model):
+        nonlocal total_used
+        previous = writer.existing()
+        await limiter.acquire(estimated)
+        # 从限流放行后开始计时，排队等待的时间不计入延迟
+        timer = metrics.start(model, prompt_label(user_prompt))
+        validator = StreamValidator()
+        validator.prime(previous)
+        used = 0
+        usage = None
+        response = None
+        try:
+            response = await async_client.chat.completions.create(
+                model=model,
+                messages=build_messages(system_prompt, user_prompt, previous),
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            writer.open(resume=bool(previous))
+            finish_reason = None
+            async for chunk in response:
+                if chunk.choices:
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    chunk_message = chunk.choices[0].delta.content
+                    if chunk_message:
+                        timer.first_token()
+                        writer.write(validator.feed(chunk_message))
+                if chunk.usage:
+                    usage = chunk.usage
+                    used = chunk.usage.total_tokens
+            if finish_reason is None:
+                raise StreamInterruptedError(f"{model} 的流式输出中断")
+            if finish_reason == 'content_filter':
+                raise ContentError(f"{model} 拒绝生成该内容")
+            writer.write(validator.finish())
+            article = writer.finish()
+            if not article:
+                raise ContentError(f"{model} 返回了空内容")
+        except Exception as e:
+            timer.finish(usage, status="error", error=e)
+            if response is not None:
+                await response.close()  # 中止请求，不再为剩余的输出付费
+            if isinstance(e, ContentError):
+                writer.discard()  # 不可用的内容不能作为续写的起点
+            else:
+                writer.close()  # 保留已生成的部分，重试或下次运行时继续
+            raise
+        finally:
+            limiter.settle(estimated, used)
+            total_used += used
+        timer.finish(usage)
+        report_validation(validator, user_prompt)
+        return article, model
+
+    try:
+        article, model = await scheduler.call_async(attempt)
+    except Exception as e:
+        print(f"生成文章时出错 ({prompt_label(user_prompt)}): {e}")
+        return None, total_used
+    response_cache.put(cache_key(model, system_prompt, user_prompt), article, {"model": model})
+    return article, total_used
+
+
+async def process_posts_concurrently(system_prompt, data_sets, concurrency=4, rpm=0, tpm=0,
+                                     completion_tokens=3000):
+    """
+    并发生成数据集中所有未创建的文章，每篇完成后立即保存
+    :param system_prompt: 系统提示词
+    :param data_sets: 数据集 JSON 文件路径
+    :param concurrency: 同时进行的请求数
+    :param rpm: 每分钟请求数上限
+    :param tpm: 每分钟 token 数上限
+    :param completion_tokens: 用于限流预估的单篇输出 token 数
+    """
+    journal = DatasetJournal(data_sets)
+    posts = journal.load()
+    pending = [post for post in posts if is_pending(post)]
+    queue = asyncio.Queue()
+    for post in pending:
+        queue.put_nowait(post)
+
+    async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    limiter = RateLimiter(rpm, tpm)
+    scaffolder = HexoScaffolder()
+    save_lock = asyncio.Lock()
+    stats = {"done": 0, "failed": 0, "tokens": 0}
+    started = time.monotonic()
+
+    async def worker():
+        while True:
+            try:
+                post = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            writer = StreamingArticleWriter(post['post_file'])
+            post_system_prompt, post_user_prompt = post_prompts(system_prompt, post)
+            generated_article, used = await generate_article_async(
+                async_client, post_system_prompt, post_user_prompt, limiter, completion_tokens, writer)
+            stats["tokens"] += used
+            if not generated_article:
+                stats["failed"] += 1
+                continue
+            async with save_lock:
+                # 为本地Hexo创建新文章
+                create_hexo_post(scaffolder, post)
+                writer.commit()
+                journal.mark_created(post)
+                stats["done"] += 1
+                print(f"[{stats['done']}/{len(pending)}] {post['post_title']}")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        await async_client.close()
+        journal.compact(posts)
+
+    elapsed = time.monotonic() - started
+    print(f"完成 {stats['done']} 篇，失败 {stats['failed']} 篇，用时 {elapsed:.1f}s，"
+          f"吞吐量 {stats['done'] * 60 / max(elapsed, 1e-9):.1f} 篇/分钟，消耗 {stats['tokens']} tokens")
+    return stats
+
+
+def build_batch_file(system_prompt, posts, batch_file):
+    """
+    把所有未创建的文章写成一个 Batch API 请求文件（JSONL），custom_id 为文章文件名
+    :return: 写入批任务的文章数
+    """
+    count = 0
+    with open(batch_file, 'w', encoding='utf-8') as f:
+        for post in posts:
+            if not is_pending(post):
+                continue
+            post_system_prompt, post_user_prompt = post_prompts(system_prompt, post)
+            request = {
+                "custom_id": post['filename'],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": models[0], "messages": build_messages(post_system_prompt, post_user_prompt)},
+            }
+            f.write(json.dumps(request, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def wait_for_batch(batch_id, poll_interval):
+    """轮询批任务直到结束"""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        progress = f"{counts.completed}/{counts.total}" if counts else "-"
+        print(f"批任务 {batch_id} 状态: {batch.status}（{progress}）")
+        if batch.status in ("completed", "failed", "expired", "cancelled"):
+            return batch
+        time.sleep(poll_interval)
+
+
+def save_generated_post(scaffolder, journal, post, article):
+    """保存一篇非流式生成的文章并记录进度"""
+    writer = StreamingArticleWriter(post['post_file'])
+    writer.open()
+    writer.write(article)
+    writer.finish()
+    create_hexo_post(scaffolder, post)
+    writer.commit()
+    journal.mark_created(post)
+
+
+def process_posts_batch(system_prompt, data_sets, poll_interval=30):
+    """
+    Batch API 模式：把数据集中所有未创建的文章作为一个批任务提交，轮询完成后一次性写出文章和数据集状态
+    批任务 id 保存在 <dataset>.batch.json，中途退出后重新运行会继续等待同一个批任务
+    :param system_prompt: 系统提示词
+    :param data_sets: 数据集 JSON 文件路径
+    :param poll_interval: 轮询间隔（秒）
+    """
+    journal = DatasetJournal(data_sets)
+    posts = journal.load()
+    state_file = f"{data_sets}.batch.json"
+    batch_file = f"{data_sets}.batch.jsonl"
+    scaffolder = HexoScaffolder()
+    stats = {"done": 0, "failed": 0}
+    try:
+        # 缓存中已有的文章直接写出
+        for post in posts:
+            if is_pending(post):
+                post_system_prompt, post_user_prompt = post_prompts(system_prompt, post)
+                cached, _ = response_cache.lookup(models, post_system_prompt, post_user_prompt)
+                if cached:
+                    save_generated_post(scaffolder, journal, post, cached)
+                    stats["done"] += 1
+
+        if os.path.exists(state_file):
+            with open(state_file, 'r') as f:
+                batch_id = json.load(f)['batch_id']
+            print(f"继续等待批任务 {batch_id}")
+        else:
+            count = build_batch_file(system_prompt, posts, batch_file)
+            if not count:
+                print("没有需要生成的文章")
+                return stats
+            with open(batch_file, 'rb') as f:
+                input_file = client.files.create(file=f, purpose="batch")
+            batch = client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions",
+                                          completion_window="24h")
+            batch_id = batch.id
+            write_json_atomically(state_file, {"batch_id": batch_id, "input_file_id": input_file.id})
+            print(f"已提交批任务 {batch_id}，共 {count} 篇文章")
+
+        batch = wait_for_batch(batch_id, poll_interval)
+        if batch.status != "completed" or not batch.output_file_id:
+            print(f"批任务未完成: {batch.status}")
+            os.remove(state_file)
+            return stats
+
+        # 把结果分发到文章文件和数据集状态
+        by_filename = {post['filename']: post for post in posts}
+        output = client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            post = by_filename.get(result.get('custom_id'))
+            response = result.get('response') or {}
+            if not post or response.get('status_code') != 200:
+                stats["failed"] += 1
+                metrics.start(models[0], result.get('custom_id')).finish(
+                    status="error", error=result.get('error') or response.get('status_code'), batch=True)
+                print(f"批任务中的请求失败: {result.get('custom_id')} {result.get('error')}")
+                continue
+            if not is_pending(post):
+                continue
+            article = response['body']['choices'][0]['message']['content'].strip()
+            post_system_prompt, post_user_prompt = post_prompts(system_prompt, post)
+            metrics.start(models[0], prompt_label(post_user_prompt)).finish(response['body'].get('usage'), batch=True)
+            response_cache.put(cache_key(models[0], post_system_prompt, post_user_prompt), article,
+                               {"model": models[0], "batch_id": batch_id})
+            save_generated_post(scaffolder, journal, post, article)
+            stats["done"] += 1
+
+        os.remove(state_file)
+        if os.path.exists(batch_file):
+            os.remove(batch_file)
+    finally:
+        journal.compact(posts)
+    print(f"批处理完成 {stats['done']} 篇，失败 {stats['failed']} 篇")
+    return stats
+
+
+def process_posts_from_queue(system_prompt, queue_file, worker=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    队列模式：从 SQLite 任务队列（见 job_queue.py）中逐篇租用文章并生成，可以同时运行多个 worker
+    生成期间后台线程持续续租；租约丢失（例如进程卡住超过租约时长）时放弃结果，避免与接手的 worker 重复保存
+    生成中的内容写在每个 worker 自己的临时目录中；写入文章文件前再续租一次确认仍持有租约，
+    写入后才标记完成，进程在两者之间崩溃时任务会在租约过期后被重新生成（覆盖同一个文章文件）
+    :param system_prompt: 系统提示词
+    :param queue_file: 队列数据库文件
+    :param worker: worker id，默认为 主机名-进程号
+    :param lease_seconds: 租约时长（秒）
+    """
+    worker = worker or default_worker_id()
+    job_queue = JobQueue(queue_file, lease_seconds)
+    # 租约丢失的 worker 可能仍在写入，不能和接手的 worker 共用临时文件；固定 --worker-id 时重启后仍可断点续写
+    partial_dir = os.path.join(PARTIAL_DIR, re.sub(r'[^\w.-]', '_', worker))
+    scaffolder = HexoScaffolder()
+    stats = {"done": 0, "failed": 0, "lost": 0}
+    started = time.monotonic()
+    try:
+        while True:
+            post = job_queue.lease(worker)
+            if post is None:
+                break
+            writer = StreamingArticleWriter(post['post_file'], partial_dir)
+            post_system_prompt, post_user_prompt = post_prompts(system_prompt, post)
+            with Heartbeat(queue_file, post, worker, lease_seconds) as heartbeat:
+                generated_article = generate_article(post_system_prompt, post_user_prompt, True, writer)
+            if not generated_article:
+                job_queue.release(post, worker)
+                stats["failed"] += 1
+                continue
+            # 最后一次续租之后租约仍可能过期，写文章文件前再续租一次确认
+            if heartbeat.lost or not job_queue.heartbeat(post, worker):
+                writer.discard()
+                stats["lost"] += 1
+                print(f"租约已丢失，放弃本次结果: {post['post_title']}")
+                continue
             # 为本地Hexo创建新文章
-            command = f"hexo new post --path \"{post_file_name}\" \"{post_name}\" "
-            subprocess.run(command, shell=True)
-            # 生产内容
-            if generated_article:
-                if auto_save:
-                    save_article_to_file(generated_article, folder_path)  # 自动保存到文件
-                    post['created'] = True
-                    save_posts_datasets(data_sets, posts)
-                else:
-                    # 询问用户是否确认保存
-                    confirmation = input("\n\n是否确认保存该内容 (save)，重新生成 (regenerate)，或者跳过 (skip)? (s/r/k): ").strip().lower()
-                    if confirmation == 's':
-                        save_article_to_file(generated_article, folder_path)  # 保存到文件
-                        post['created'] = True
-                        save_posts_datasets(data_sets, posts)
-                    elif confirmation == 'k':
-                        break
+            create_hexo_post(scaffolder, post)
+            writer.commit()
+            if job_queue.complete(post, worker):
+                stats["done"] += 1
+            else:
+                stats["lost"] += 1
+                print(f"租约在保存后丢失，文章可能被其他 worker 重新生成并覆盖: {post['post_title']}")
+    finally:
+        job_queue.close()
+
+    elapsed = time.monotonic() - started
+    print(f"[{worker}] 完成 {stats['done']} 篇，失败 {stats['failed']} 篇，租约丢失 {stats['lost']} 篇，"
+          f"用时 {elapsed:.1f}s，吞吐量 {stats['done'] * 60 / max(elapsed, 1e-9):.1f} 篇/分钟")
+    return stats
 
 
 if __name__ == '__main__':
@@ -132,12 +642,31 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Process some command line arguments.")
 
     # 添加 --prompt-file 参数
-    parser.add_argument('--prompt-file', type=str, required=True, help='The path to the prompt file.')
+    parser.add_argument('--prompt-file', type=str, help='The path to the prompt file.')
 
     # 解析命令行参数
     parser.add_argument('--auto-save', action='store_true', help="自动保存生成的文章")
 
-    parser.add_argument('--dataset-file', type=str, required=True, help='保存文章的JSON文件路径.')
+    parser.add_argument('--dataset-file', type=str, help='保存文章的JSON文件路径.')
+
+    parser.add_argument('--queue', type=str, help='使用 SQLite 任务队列（job_queue.py 导入）代替数据集文件，可多进程同时运行')
+    parser.add_argument('--worker-id', type=str, help='队列模式下的 worker id，默认为 主机名-进程号')
+    parser.add_argument('--lease-seconds', type=int, default=DEFAULT_LEASE_SECONDS, help='队列模式下的租约时长（秒）')
+
+    parser.add_argument('--compact', action='store_true', help='只把进度日志合并回数据集文件后退出')
+
+    parser.add_argument('--no-cache', action='store_true', help='不读取也不写入生成结果缓存')
+
+    parser.add_argument('--concurrency', type=int, default=0, help='并发生成的请求数，大于 0 时启用并发模式（自动保存）')
+    parser.add_argument('--rpm', type=int, default=0, help='并发模式下每分钟请求数上限，0 为不限制')
+    parser.add_argument('--tpm', type=int, default=0, help='并发模式下每分钟 token 数上限，0 为不限制')
+
+    parser.add_argument('--batch', action='store_true', help='使用 Batch API 一次性提交所有未创建的文章（自动保存）')
+    parser.add_argument('--poll-interval', type=float, default=30, help='Batch 模式下的轮询间隔（秒）')
+
+    parser.add_argument('--max-retries', type=int, default=3, help='每个模型在限流、超时、服务端错误时的最多重试次数')
+
+    parser.add_argument('--metrics-file', type=str, help='每次请求的延迟、token 和费用指标报告（.jsonl 或 .csv）')
 
     # 解析命令行参数
     args = parser.parse_args()
@@ -147,7 +676,31 @@ if __name__ == '__main__':
     auto_save = args.auto_save
     dataset_file = args.dataset_file
 
+    if not dataset_file and not args.queue:
+        parser.error('one of the arguments --dataset-file --queue is required')
+    if args.compact and not dataset_file:
+        parser.error('argument --compact requires --dataset-file')
+    if args.compact:
+        DatasetJournal(dataset_file).compact()
+        raise SystemExit(0)
+    if not prompt_file:
+        parser.error('the following arguments are required: --prompt-file')
+
     system_prompt = read_system_prompt_from_file(prompt_file)  # 替换为你的系统提示
 
-    process_posts(system_prompt, dataset_file, auto_save)
+    response_cache.enabled = not args.no_cache
+    metrics.report_file = args.metrics_file
+    scheduler.max_retries = args.max_retries
+
+    if args.queue:
+        process_posts_from_queue(system_prompt, args.queue, args.worker_id, args.lease_seconds)
+    elif args.batch:
+        process_posts_batch(system_prompt, dataset_file, args.poll_interval)
+    elif args.concurrency > 0:
+        asyncio.run(process_posts_concurrently(system_prompt, dataset_file, args.concurrency, args.rpm, args.tpm))
+    else:
+        process_posts(system_prompt, dataset_file, auto_save)
+    response_cache.report()
+    metrics.report()
+    scheduler.report()
     # main()
\ No newline at end of file
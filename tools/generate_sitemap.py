@@ -0,0 +1,166 @@
+"""
+生成分片的 sitemap：按链接类型把所有链接分到多个 gzip 压缩的分片中，再写出指向各分片的 sitemap 索引
+每个分片远小于协议限制（50,000 个链接 / 50MB），链接按哈希分配到分片，新增或修改文章只会改变少数分片；
+内容没有变化的分片不会重写（gzip 头中不写时间戳，相同内容的分片字节完全一致）
+链接和 lastmod 来自 build_manifest.py 生成的构建清单，在 hexo generate 之后、deploy 之前运行：
+    python tools/build_manifest.py --urls-file public/baidu_urls.txt
+    python tools/generate_sitemap.py
+"""
+import os
+import sys
+import json
+import gzip
+import hashlib
+import argparse
+from urllib.parse import quote, unquote
+from xml.sax.saxutils import escape
+
+from build_manifest import BuildManifest, DEFAULT_MANIFEST_FILE, POST, TAG, CATEGORY, HOME
+from corpus_index import CorpusIndex
+from atomic_write import write_bytes_atomically, write_json_atomically
+
+# 每个分片的目标链接数，分片数按 2 的幂增长，数量翻倍时才会重新分配
+SHARD_SIZE = 10000
+# 协议限制
+MAX_URLS_PER_SITEMAP = 50000
+SHARD_DIR = 'sitemaps'
+STATE_FILE = 'shards.json'
+
+# 与 sitemap_template.xml 一致
+SITEMAP_FIELDS = {
+    POST: ('posts', 'monthly', '0.6'),
+    HOME: ('posts', 'daily', '1.0'),
+    TAG: ('tags', 'weekly', '0.2'),
+    CATEGORY: ('categories', 'weekly', '0.2'),
+}
+
+URLSET_HEAD = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_TAIL = '</urlset>\n'
+INDEX_HEAD = '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_TAIL = '</sitemapindex>\n'
+
+
+def uriencode(url):
+    """与 hexo 的 uriencode 过滤器一致：先解码再按 encodeURI 的规则编码，避免重复编码"""
+    return quote(unquote(url), safe=";,/?:@&=+$-_.!~*'()#")
+
+
+def shard_count(total, shard_size=SHARD_SIZE):
+    count = 1
+    while count * shard_size < total:
+        count *= 2
+    return count
+
+
+def shard_of(url, count):
+    return int(hashlib.sha1(url.encode('utf-8')).hexdigest()[:8], 16) % count
+
+
+def assign_shards(entries, shard_size=SHARD_SIZE):
+    """
+    把链接分配到分片
+    :param entries: 构建清单 {url: {'kind', 'lastmod', ...}}
+    :return: {分片文件名: [(url, entry), ...]}，分片内按链接排序
+    """
+    groups = {}
+    for url, entry in entries.items():
+        groups.setdefault(SITEMAP_FIELDS[entry['kind']][0], []).append((url, entry))
+    shards = {}
+    for group, items in groups.items():
+        count = shard_count(len(items), shard_size)
+        for url, entry in sorted(items):
+            shards.setdefault(f"{group}-{shard_of(url, count):03d}.xml.gz", []).append((url, entry))
+    return shards
+
+
+def render_shard(items):
+    lines = [URLSET_HEAD]
+    for url, entry in items:
+        _, changefreq, priority = SITEMAP_FIELDS[entry['kind']]
+        lines.append(f"  <url>\n    <loc>{escape(uriencode(url))}</loc>\n    <lastmod>{entry['lastmod']}</lastmod>\n"
+                     f"    <changefreq>{changefreq}</changefreq>\n    <priority>{priority}</priority>\n  </url>\n")
+    lines.append(URLSET_TAIL)
+    return ''.join(lines).encode('utf-8')
+
+
+def render_index(shards, base_url):
+    lines = [INDEX_HEAD]
+    for name, (lastmod, _) in sorted(shards.items()):
+        lines.append(f"  <sitemap>\n    <loc>{escape(uriencode(base_url + name))}</loc>\n"
+                     f"    <lastmod>{lastmod}</lastmod>\n  </sitemap>\n")
+    lines.append(INDEX_TAIL)
+    return ''.join(lines).encode('utf-8')
+
+
+def generate_sitemap(entries, public_dir, base_url, index_name='sitemap.xml', shard_size=SHARD_SIZE):
+    """
+    写出 sitemap 分片和索引，只重写内容变化的分片
+    :param entries: 构建清单 {url: entry}
+    :param public_dir: 站点生成目录
+    :param base_url: 站点根链接，如 https://gitceo.com/
+    :param index_name: 索引文件名（相对 public_dir）
+    :return: 统计 dict：shards / written / removed / urls
+    """
+    if shard_size > MAX_URLS_PER_SITEMAP:
+        raise ValueError(f"shard_size 不能超过 {MAX_URLS_PER_SITEMAP}")
+    shard_dir = os.path.join(public_dir, SHARD_DIR)
+    os.makedirs(shard_dir, exist_ok=True)
+    state_path = os.path.join(shard_dir, STATE_FILE)
+    previous = {}
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+
+    state = {}
+    written = 0
+    for name, items in assign_shards(entries, shard_size).items():
+        data = render_shard(items)
+        digest = hashlib.sha256(data).hexdigest()
+        lastmod = max(entry['lastmod'] for _, entry in items)
+        path = os.path.join(shard_dir, name)
+        state[name] = (lastmod, digest)
+        if previous.get(name, [None, None])[1] == digest and os.path.exists(path):
+            continue
+        write_bytes_atomically(path, gzip.compress(data, mtime=0))
+        written += 1
+
+    removed = 0
+    for name in previous:
+        if name not in state and os.path.exists(os.path.join(shard_dir, name)):
+            os.remove(os.path.join(shard_dir, name))
+            removed += 1
+
+    index = render_index(state, f"{base_url}{SHARD_DIR}/")
+    index_path = os.path.join(public_dir, index_name)
+    current = None
+    if os.path.exists(index_path):
+        with open(index_path, 'rb') as f:
+            current = f.read()
+    if current != index:
+        write_bytes_atomically(index_path, index)
+    write_json_atomically(state_path, state)
+    return {'shards': len(state), 'written': written, 'removed': removed, 'urls': len(entries)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="生成分片的 sitemap 和 sitemap 索引")
+    parser.add_argument('--root', default='.', help='Hexo 站点根目录')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST_FILE, help='构建清单文件')
+    parser.add_argument('--public-dir', default='public', help='站点生成目录')
+    parser.add_argument('--index', default='sitemap.xml', help='sitemap 索引文件名，默认覆盖插件生成的 sitemap.xml')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='每个分片的目标链接数')
+    args = parser.parse_args()
+
+    manifest = BuildManifest(args.manifest)
+    with CorpusIndex(args.root) as corpus:
+        config = corpus.config
+        entries = manifest.entries
+        if not entries:
+            # 还没有构建清单时直接从语料索引计算（不保存清单）
+            corpus.refresh()
+            entries = manifest.build(corpus)
+    base_url = f"{config['url'].rstrip('/')}{config['root']}"
+    stats = generate_sitemap(entries, os.path.join(args.root, args.public_dir), base_url, args.index,
+                             args.shard_size)
+    print(f"{stats['urls']} 个链接，{stats['shards']} 个分片，重写 {stats['written']} 个，删除 {stats['removed']} 个",
+          file=sys.stderr)
@@ -1,65 +1,368 @@
+import argparse
 import csv
-import geoip2.database
 import ipaddress
+import os
+import re
+import time
+from contextlib import contextmanager
+
+# geoip2 is only needed for the mmdb mode
+try:
+    import geoip2.database
+    import geoip2.errors
+    from maxminddb import MODE_MMAP
+except ImportError:
+    geoip2 = None
+
+
+# Default paths of the GeoLite2 Country files (CSV edition and binary edition)
+IPV4_FILE = 'GeoLite2-Country-Blocks-IPv4.csv'
+IPV6_FILE = 'GeoLite2-Country-Blocks-IPv6.csv'
+LOCATIONS_FILE = 'GeoLite2-Country-Locations-en.csv'
+GEOIP_DB_PATH = 'GeoLite2-Country.mmdb'
+OUTPUT_FILE = 'iptables_rules.sh'
+
+
+@contextmanager
+def phase(name, timings):
+    """Measure the wall time of one phase and record it in `timings`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append((name, time.perf_counter() - start))
+
+
+def print_timings(timings):
+    total = sum(seconds for _, seconds in timings)
+    for name, seconds in timings:
+        print(f"  {name:<28} {seconds:8.3f}s")
+    print(f"  {'total':<28} {total:8.3f}s")
+
+
+def parse_countries(value):
+    """Turn 'CN,HK' style arguments into a set of upper-case ISO codes."""
+    return {code.strip().upper() for code in value.split(',') if code.strip()}
+
+
+# Function to map ISO country codes to GeoLite2 geoname ids using the locations CSV
+def read_country_geoname_ids(locations_file, countries):
+    geoname_ids = set()
+    found = set()
+    with open(locations_file, 'r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            if row['country_iso_code'] in countries:
+                geoname_ids.add(row['geoname_id'])
+                found.add(row['country_iso_code'])
+    missing = countries - found
+    if missing:
+        raise ValueError(f"No geoname id found in {locations_file} for {', '.join(sorted(missing))}")
+    return geoname_ids
 
 
 # Function to read network segments from a CSV file and filter based on conditions
-def read_network_segments(file_path):
+def read_network_segments(file_path, geoname_ids):
     network_segments = []
     with open(file_path, 'r') as file:
         reader = csv.reader(file)
         next(reader)  # Skip the header row
         for row in reader:
-            # Check if the value in the second or third column is 1814991
-            if len(row) > 2 and (row[1] == '1814991' or row[2] == '1814991'):
+            # A block belongs to the target countries if its geoname_id (second column)
+            # or registered_country_geoname_id (third column) matches
+            if len(row) > 2 and (row[1] in geoname_ids or row[2] in geoname_ids):
                 network_segments.append(row[0])  # The network column
     return network_segments
 
 
-# Function to check if an IP range belongs to China
-def is_chinese_ip(ip_range, reader):
+# Function to read every network segment of a CSV file, whatever its country
+def read_all_network_segments(file_path):
+    with open(file_path, 'r') as file:
+        reader = csv.reader(file)
+        next(reader)  # Skip the header row
+        return [row[0] for row in reader if row]
+
+
+# Function to check if an IP range belongs to one of the target countries.
+# GeoLite2 blocks are the leaves of the database tree, so a single lookup
+# against the network address classifies the whole block.
+def is_country_network(ip_range, reader, countries):
     try:
         ip_net = ipaddress.ip_network(ip_range, strict=False)
-        for ip in ip_net:
+        response = reader.country(ip_net.network_address)
+    except (ValueError, geoip2.errors.AddressNotFoundError):
+        return False
+    return (response.country.iso_code in countries
+            or response.registered_country.iso_code in countries)
+
+
+def classify_csv(ipv4_file, ipv6_file, countries, locations_file, timings):
+    """Decide every block from the geoname id columns of the CSV edition."""
+    with phase('load locations', timings):
+        geoname_ids = read_country_geoname_ids(locations_file, countries)
+    with phase('classify IPv4 blocks', timings):
+        ipv4_networks = read_network_segments(ipv4_file, geoname_ids)
+    with phase('classify IPv6 blocks', timings):
+        ipv6_networks = read_network_segments(ipv6_file, geoname_ids)
+    return ipv4_networks, ipv6_networks
+
+
+def classify_mmdb(ipv4_file, ipv6_file, countries, geoip_db_path, timings):
+    """Decide every block with one lookup in the memory-mapped mmdb."""
+    if geoip2 is None:
+        raise RuntimeError("mmdb mode requires the geoip2 package: pip install geoip2")
+
+    with phase('open mmdb', timings):
+        reader = geoip2.database.Reader(geoip_db_path, mode=MODE_MMAP)
+    with reader:
+        with phase('read IPv4 blocks', timings):
+            ipv4_candidates = read_all_network_segments(ipv4_file)
+        with phase('classify IPv4 blocks', timings):
+            ipv4_networks = [n for n in ipv4_candidates if is_country_network(n, reader, countries)]
+        with phase('read IPv6 blocks', timings):
+            ipv6_candidates = read_all_network_segments(ipv6_file)
+        with phase('classify IPv6 blocks', timings):
+            ipv6_networks = [n for n in ipv6_candidates if is_country_network(n, reader, countries)]
+    return ipv4_networks, ipv6_networks
+
+
+def aggregate_networks(networks):
+    """Merge adjacent and overlapping networks into the minimal CIDR set."""
+    parsed = [ipaddress.ip_network(network, strict=False) for network in networks]
+    return [str(network) for network in ipaddress.collapse_addresses(parsed)]
+
+
+# One DROP rule per CIDR; no named set is involved.
+def write_iptables_rules(output_file, ipv4_networks, ipv6_networks):
+    with open(output_file, 'w') as output:
+        for network in ipv4_networks:
+            output.write(f"iptables -A INPUT -s {network} -j DROP\n\n")
+        for network in ipv6_networks:
+            output.write(f"ip6tables -A INPUT -s {network} -j DROP\n\n")
+
+
+# Builds an `ipset restore` file. The sets are filled under a temporary name and
+# swapped in, so the live sets are replaced atomically. Match them once with:
+#   iptables -I INPUT -m set --match-set <set_name>-v4 src -j DROP
+#   ip6tables -I INPUT -m set --match-set <set_name>-v6 src -j DROP
+def write_ipset_rules(output_file, ipv4_networks, ipv6_networks, set_name='geoblock'):
+    with open(output_file, 'w') as output:
+        output.write(f"# ipset restore -exist < {output_file}\n")
+        output.write(f"# iptables -I INPUT -m set --match-set {set_name}-v4 src -j DROP\n")
+        output.write(f"# ip6tables -I INPUT -m set --match-set {set_name}-v6 src -j DROP\n")
+        for suffix, family, networks in (('v4', 'inet', ipv4_networks), ('v6', 'inet6', ipv6_networks)):
+            live = f"{set_name}-{suffix}"
+            staging = f"{live}-new"
+            options = f"hash:net family {family} hashsize 4096 maxelem {max(65536, len(networks) * 2)}"
+            output.write(f"create {live} {options} -exist\n")
+            output.write(f"create {staging} {options} -exist\n")
+            output.write(f"flush {staging}\n")
+            for network in networks:
+                output.write(f"add {staging} {network}\n")
+            output.write(f"swap {staging} {live}\n")
+            output.write(f"destroy {staging}\n")
+
+
+# Builds an nftables file with one interval set per family and a single match rule
+# per set. `nft -f` applies the whole file as one transaction.
+def write_nft_rules(output_file, ipv4_networks, ipv6_networks, set_name='geoblock'):
+    lines = [
+        "#!/usr/sbin/nft -f",
+        f"# nft -f {output_file}",
+        # Declaring the table before deleting it keeps the first run from failing
+        f"table inet {set_name} {{ }}",
+        f"delete table inet {set_name}",
+        f"table inet {set_name} {{",
+    ]
+    for suffix, addr_type, networks in (('v4', 'ipv4_addr', ipv4_networks), ('v6', 'ipv6_addr', ipv6_networks)):
+        lines.append(f"    set blocked_{suffix} {{")
+        lines.append(f"        type {addr_type}")
+        lines.append("        flags interval")
+        if networks:
+            lines.append("        elements = {")
+            lines.append(',\n'.join(f"            {network}" for network in networks))
+            lines.append("        }")
+        lines.append("    }")
+    lines += [
+        "    chain input {",
+        "        type filter hook input priority filter - 10; policy accept;",
+        "        ip saddr @blocked_v4 drop",
+        "        ip6 saddr @blocked_v6 drop",
+        "    }",
+        "}",
+    ]
+    with open(output_file, 'w') as output:
+        output.write('\n'.join(lines) + '\n')
+
+
+RULE_WRITERS = {
+    'iptables': write_iptables_rules,
+    'ipset': write_ipset_rules,
+    'nft': write_nft_rules,
+}
+
+
+# Patterns used to read the CIDRs back from a previously generated rules file
+IPTABLES_RULE_PATTERN = re.compile(r'^ip6?tables\s+-[AI]\s+INPUT\s+-s\s+(\S+)\s+-j\s+DROP')
+IPSET_ADD_PATTERN = re.compile(r'^add\s+\S+\s+(\S+)')
+NFT_ELEMENT_PATTERN = re.compile(r'^\s*([0-9A-Fa-f:.]+(?:/\d+)?)\s*,?\s*$')
+
+
+def read_rules_file(file_path):
+    """Parse an iptables, ipset or nftables file written by this script into (ipv4, ipv6) CIDR sets."""
+    ipv4_networks, ipv6_networks = set(), set()
+    in_elements = False
+    with open(file_path, 'r') as file:
+        for line in file:
+            match = IPTABLES_RULE_PATTERN.match(line) or IPSET_ADD_PATTERN.match(line)
+            if 'elements = {' in line:
+                in_elements = True
+                continue
+            if in_elements:
+                if line.strip() == '}':
+                    in_elements = False
+                    continue
+                match = NFT_ELEMENT_PATTERN.match(line)
+            if not match:
+                continue
             try:
-                response = reader.country(ip)
-                if response and response.country.iso_code == 'CN':
-                    return True
-            except geoip2.errors.AddressNotFoundError:
+                network = ipaddress.ip_network(match.group(1), strict=False)
+            except ValueError:
                 continue
-    except ValueError:
-        pass
-    return False
+            (ipv4_networks if network.version == 4 else ipv6_networks).add(str(network))
+    return ipv4_networks, ipv6_networks
+
+
+def diff_networks(previous, current):
+    """Return (added, removed) CIDRs, sorted by address."""
+    key = lambda network: ipaddress.ip_network(network)
+    return sorted(set(current) - previous, key=key), sorted(previous - set(current), key=key)
+
+
+# Builds the delta script for each output format. Removed entries go first for
+# nftables (overlapping interval elements are rejected), last for the others so
+# that no address is left unblocked while the script runs.
+def write_iptables_delta(output_file, delta):
+    with open(output_file, 'w') as output:
+        for command, suffix in (('iptables', 'v4'), ('ip6tables', 'v6')):
+            added, removed = delta[suffix]
+            for network in added:
+                output.write(f"{command} -A INPUT -s {network} -j DROP\n")
+            for network in removed:
+                output.write(f"{command} -D INPUT -s {network} -j DROP\n")
+
+
+def write_ipset_delta(output_file, delta, set_name='geoblock'):
+    with open(output_file, 'w') as output:
+        output.write(f"# ipset restore -exist < {output_file}\n")
+        for suffix in ('v4', 'v6'):
+            added, removed = delta[suffix]
+            for network in added:
+                output.write(f"add {set_name}-{suffix} {network}\n")
+            for network in removed:
+                output.write(f"del {set_name}-{suffix} {network}\n")
+
+
+def write_nft_delta(output_file, delta, set_name='geoblock'):
+    lines = ["#!/usr/sbin/nft -f", f"# nft -f {output_file}"]
+    for suffix in ('v4', 'v6'):
+        _, removed = delta[suffix]
+        if removed:
+            lines.append(f"delete element inet {set_name} blocked_{suffix} {{ {', '.join(removed)} }}")
+    for suffix in ('v4', 'v6'):
+        added, _ = delta[suffix]
+        if added:
+            lines.append(f"add element inet {set_name} blocked_{suffix} {{ {', '.join(added)} }}")
+    with open(output_file, 'w') as output:
+        output.write('\n'.join(lines) + '\n')
+
+
+DELTA_WRITERS = {
+    'iptables': write_iptables_delta,
+    'ipset': write_ipset_delta,
+    'nft': write_nft_delta,
+}
 
 
 # Main function
-def generate_iptables_rules(ipv4_file, ipv6_file, geoip_db_path, output_file):
-    with geoip2.database.Reader(geoip_db_path) as reader:
-        # Read network segments from files
-        ipv4_networks = read_network_segments(ipv4_file)
-        ipv6_networks = read_network_segments(ipv6_file)
-
-        with open(output_file, 'w') as output:
-            # Check IPv4 networks
-            for network in ipv4_networks:
-                if is_chinese_ip(network, reader):
-                    print(f"New IP Range：{network}")
-                    output.write(f"iptables -A INPUT -s {network} -j DROP\n\n")
-
-            # Check IPv6 networks
-            for network in ipv6_networks:
-                if is_chinese_ip(network, reader):
-                    print(f"New IP Range：{network}")
-                    output.write(f"ip6tables -A INPUT -s {network} -j DROP\n\n")
-
-
-# Paths to your files
-ipv4_file = 'GeoLite2-Country-Blocks-IPv4.csv'
-ipv6_file = 'GeoLite2-Country-Blocks-IPv6.csv'
-geoip_db_path = 'GeoLite2-Country.mmdb'
-output_file = 'iptables_rules.sh'
-
-# Generate iptables rules
-generate_iptables_rules(ipv4_file, ipv6_file, geoip_db_path, output_file)
-
-print(f'iptables rules have been written to {output_file}')
+def generate_iptables_rules(ipv4_file, ipv6_file, output_file, countries=('CN',), mode='csv',
+                            locations_file=LOCATIONS_FILE, geoip_db_path=GEOIP_DB_PATH,
+                            output_format='iptables', aggregate=True, set_name='geoblock',
+                            diff_from=None, diff_output=None):
+    countries = {code.upper() for code in countries}
+    timings = []
+    # plain iptables rules are not grouped into a named set
+    set_options = {} if output_format == 'iptables' else {'set_name': set_name}
+
+    if mode == 'mmdb':
+        ipv4_networks, ipv6_networks = classify_mmdb(ipv4_file, ipv6_file, countries, geoip_db_path, timings)
+    else:
+        ipv4_networks, ipv6_networks = classify_csv(ipv4_file, ipv6_file, countries, locations_file, timings)
+    before_rules = len(ipv4_networks) + len(ipv6_networks)
+
+    print(f"Matched {len(ipv4_networks)} IPv4 and {len(ipv6_networks)} IPv6 networks "
+          f"for {', '.join(sorted(countries))} ({mode} mode)")
+
+    if aggregate:
+        with phase('aggregate CIDRs', timings):
+            ipv4_networks = aggregate_networks(ipv4_networks)
+            ipv6_networks = aggregate_networks(ipv6_networks)
+        print(f"Aggregated {before_rules} networks into {len(ipv4_networks) + len(ipv6_networks)} CIDRs "
+              f"({len(ipv4_networks)} IPv4, {len(ipv6_networks)} IPv6)")
+
+    if diff_from:
+        with phase('diff against previous rules', timings):
+            previous_ipv4, previous_ipv6 = read_rules_file(diff_from)
+            delta = {
+                'v4': diff_networks(previous_ipv4, ipv4_networks),
+                'v6': diff_networks(previous_ipv6, ipv6_networks),
+            }
+            diff_output = diff_output or f"{output_file}.delta"
+            DELTA_WRITERS[output_format](diff_output, delta, **set_options)
+        added = len(delta['v4'][0]) + len(delta['v6'][0])
+        removed = len(delta['v4'][1]) + len(delta['v6'][1])
+        unchanged = len(ipv4_networks) + len(ipv6_networks) - added
+        print(f"Delta against {diff_from}: +{added} added, -{removed} removed, {unchanged} unchanged "
+              f"(written to {diff_output})")
+
+    with phase('write rules', timings):
+        RULE_WRITERS[output_format](output_file, ipv4_networks, ipv6_networks, **set_options)
+
+    rule_count = 2 if output_format != 'iptables' else len(ipv4_networks) + len(ipv6_networks)
+    print(f"Firewall rules: {before_rules} per-block rules before, {rule_count} {output_format} rules after")
+    print_timings(timings)
+    return ipv4_networks, ipv6_networks
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate firewall rules for the networks of given countries.")
+    parser.add_argument('--country', type=parse_countries, default={'CN'},
+                        help="ISO country code(s), comma separated (default: CN)")
+    parser.add_argument('--mode', choices=['csv', 'mmdb'], default='csv',
+                        help="classify blocks from the CSV geoname ids or with one mmdb lookup per block")
+    parser.add_argument('--ipv4-file', default=IPV4_FILE)
+    parser.add_argument('--ipv6-file', default=IPV6_FILE)
+    parser.add_argument('--locations-file', default=LOCATIONS_FILE)
+    parser.add_argument('--geoip-db', default=GEOIP_DB_PATH)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--format', choices=sorted(RULE_WRITERS), default='iptables',
+                        help="one DROP rule per CIDR, an `ipset restore` file or an nftables interval-set file")
+    parser.add_argument('--no-aggregate', action='store_true',
+                        help="keep the GeoLite2 blocks as they are instead of merging them")
+    parser.add_argument('--set-name', default='geoblock', help="name of the ipset sets / nftables table")
+    parser.add_argument('--diff', nargs='?', const='', default=None, metavar='PREVIOUS',
+                        help="also write an add/del script against a previous rules file (default: --output)")
+    parser.add_argument('--diff-output', default=None, help="path of the add/del script (default: <output>.delta)")
+    args = parser.parse_args()
+
+    diff_from = None
+    if args.diff is not None:
+        diff_from = args.diff or args.output
+        if not os.path.exists(diff_from):
+            parser.error(f"previous rules file {diff_from} does not exist")
+
+    generate_iptables_rules(args.ipv4_file, args.ipv6_file, args.output, args.country, args.mode,
+                            args.locations_file, args.geoip_db, args.format,
+                            not args.no_aggregate, args.set_name, diff_from, args.diff_output)
+
+    print(f'{args.format} rules have been written to {args.output}')
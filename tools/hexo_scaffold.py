@@ -0,0 +1,314 @@
+"""
+不启动 Node 的 Hexo 文章脚手架，行为与 `hexo new` 保持一致：
+- 用 scaffolds/<layout>.md 渲染 front matter（字段顺序、YAML 引号与折叠规则同 js-yaml）
+- 文件名按 _config.yml 中的 new_post_name 与 filename_case 生成，已存在时追加 -1、-2 ...
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+import unicodedata
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# hexo-util slugize 使用的字符规则
+CONTROL_CHARS = re.compile(r'[\u0000-\u001f]')
+SPECIAL_CHARS = re.compile(r'[\s~`!@#$%^&*()\-_+=\[\]{}|\\;:"\'<>,.?/]+')
+# 会被 YAML 解析成非字符串的标量（布尔、null、数字）
+AMBIGUOUS_SCALAR = re.compile(
+    r'^(?:true|false|null|~|[-+]?(?:\d[\d_]*(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?'
+    r'|0x[0-9a-fA-F_]+|0o[0-7_]+|[-+]?\.(?:inf|Inf|INF)|\.(?:nan|NaN|NAN))$', re.IGNORECASE)
+YAML_DATE = re.compile(r'^\d{4}-\d\d?-\d\d?(?:[Tt ]|$)')
+# hexo-util escapeDiacritic 中无法用 Unicode 分解得到的字母
+DIACRITIC_LETTERS = {
+    'Æ': 'AE', 'æ': 'ae', 'Œ': 'OE', 'œ': 'oe', 'Ø': 'O', 'ø': 'o', 'Đ': 'D', 'đ': 'd', 'Ð': 'D', 'ð': 'd',
+    'Ħ': 'H', 'ħ': 'h', 'Ł': 'L', 'ł': 'l', 'Ŀ': 'L', 'ŀ': 'l', 'Ŧ': 'T', 'ŧ': 't', 'ß': 's', 'ı': 'i',
+}
+TEMPLATE_VAR = re.compile(r'^\{\{\s*(\w+)\s*\}\}$')
+LINE_WIDTH = 80
+INDENT = 2
+
+
+def load_hexo_config(config_file='_config.yml'):
+    """读取 _config.yml 中脚手架和固定链接需要的顶层配置"""
+    config = {
+        'url': 'http://example.com',
+        'root': '/',
+        'permalink': ':year/:month/:day/:title/',
+        'source_dir': 'source',
+        'new_post_name': ':title.md',
+        'default_layout': 'post',
+        'filename_case': 0,
+        'tag_dir': 'tags',
+        'category_dir': 'categories',
+        'timezone': '',
+    }
+    with open(config_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = re.match(r'^(\w+):\s*([^#\n]*?)\s*(?:#.*)?$', line)
+            if match and match.group(1) in config and match.group(2):
+                value = match.group(2).strip('\'"')
+                config[match.group(1)] = int(value) if match.group(1) == 'filename_case' else value
+    return config
+
+
+def escape_diacritic(char):
+    """
+    与 hexo-util 的 escapeDiacritic 一致：带变音符号的字母、全角字母等替换为对应的 ASCII 字母，
+    其他字符（中文、全角标点、数字等）保持不变
+    """
+    if char.isascii():
+        return char
+    if char in DIACRITIC_LETTERS:
+        return DIACRITIC_LETTERS[char]
+    base = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+    return base if base.isascii() and base.isalpha() else char
+
+
+def slugize(title, transform=0):
+    """与 hexo-util 的 slugize 一致：去掉变音符号，特殊字符替换为 -"""
+    text = ''.join(map(escape_diacritic, title))
+    text = CONTROL_CHARS.sub('-', text)
+    text = SPECIAL_CHARS.sub('-', text)
+    text = re.sub(r'-{2,}', '-', text).strip('-')
+    if transform == 1:
+        return text.lower()
+    if transform == 2:
+        return text.upper()
+    return text
+
+
+def current_time(timezone=''):
+    """与 hexo 一致：按 _config.yml 的 timezone 取当前时间（精确到秒），未配置或无效时使用本机时区"""
+    if timezone:
+        try:
+            return datetime.now(ZoneInfo(timezone)).replace(microsecond=0)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return datetime.now().replace(microsecond=0)
+
+
+def _needs_prepare_quotes(value):
+    """hexo prepareFrontMatter：包含这些字符的字符串会先加双引号再交给 YAML 解析"""
+    return (':' in value or value.startswith('#') or value.startswith('!!')
+            or any(c in value for c in '{}[]\'"'))
+
+
+def _is_plain_safe(value):
+    """近似 js-yaml 的 plain scalar 判断"""
+    if not value or value != value.strip():
+        return False
+    if value[0] in '-?:,[]{}#&*!|>\'"%@`' or value.endswith(':'):
+        return False
+    if ': ' in value or ' #' in value:
+        return False
+    return not (AMBIGUOUS_SCALAR.match(value) or YAML_DATE.match(value))
+
+
+def _fold_line(line, width):
+    """js-yaml foldLine：在空格处折行，使每行不超过 width"""
+    if not line or line[0] == ' ':
+        return line
+    start = curr = 0
+    result = ''
+    for match in re.finditer(r' [^ ]', line):
+        nxt = match.start()
+        if nxt - start > width:
+            end = curr if curr > start else nxt
+            result += '\n' + line[start:end]
+            start = end + 1
+        curr = nxt
+    result += '\n'
+    if len(line) - start > width and curr > start:
+        result += line[start:curr] + '\n' + line[curr + 1:]
+    else:
+        result += line[start:]
+    return result[1:]
+
+
+def dump_yaml_string(value):
+    """按 js-yaml dump 的规则输出顶层映射中的字符串值（含冒号后的空格或换行）"""
+    if any(not c.isprintable() for c in value):
+        escaped = value.replace('\\', '\\\\').replace('"', '\\"')
+        return f' "{escaped}"'
+    width = max(min(LINE_WIDTH, 40), LINE_WIDTH - INDENT)
+    if len(value) > width:
+        folded = _fold_line(value, width).replace('\n', '\n' + ' ' * INDENT)
+        return f" >-\n{' ' * INDENT}{folded}"
+    if _is_plain_safe(value):
+        return f" {value}"
+    return " '" + value.replace("'", "''") + "'"
+
+
+def format_value(value):
+    """把渲染后的模板值转换为 hexo 重新序列化后的 YAML 文本"""
+    if not _needs_prepare_quotes(value) and AMBIGUOUS_SCALAR.match(value):
+        # 数字、布尔值等会被解析成非字符串，原样输出
+        return f" {value}"
+    return dump_yaml_string(value)
+
+
+def render_scaffold(scaffold, data):
+    """
+    渲染脚手架
+    :param scaffold: 脚手架文件内容
+    :param data: 模板变量，date 为 datetime
+    :return: 文章文件内容
+    """
+    match = re.match(r'^(-{3,})\n(.*?)\n?\1\n?(.*)$', scaffold, re.S)
+    if not match:
+        raise ValueError("Scaffold has no front matter")
+    separator, front_matter, content = match.group(1), match.group(2), match.group(3)
+
+    plain_lines, date_lines, null_lines = [], [], []
+    for line in front_matter.split('\n'):
+        key_match = re.match(r'^([^\s:#][^:]*):(.*)$', line)
+        if not key_match:
+            # 列表项等多行值跟随上一个字段原样输出
+            if plain_lines:
+                plain_lines.append(line)
+            continue
+        key, raw = key_match.group(1), key_match.group(2).strip()
+        var = TEMPLATE_VAR.match(raw)
+        value = data.get(var.group(1)) if var else raw
+        if value is None or value == '':
+            null_lines.append(f"{key}:")
+        elif isinstance(value, datetime):
+            date_lines.append(f"{key}: {value.strftime('%Y-%m-%d %H:%M:%S')}")
+        elif var:
+            plain_lines.append(f"{key}:{format_value(str(value))}")
+        else:
+            plain_lines.append(line)
+
+    lines = plain_lines + date_lines + null_lines
+    return f"{separator}\n" + ''.join(f"{line}\n" for line in lines) + f"{separator}\n{content}"
+
+
+class HexoScaffolder:
+    """
+    在当前进程内批量创建 Hexo 文章，配置和脚手架只读取一次
+    :param root: Hexo 站点根目录
+    """
+
+    def __init__(self, root='.'):
+        self.root = root
+        self.config = load_hexo_config(os.path.join(root, '_config.yml'))
+        self.source_dir = os.path.join(root, self.config['source_dir'])
+        self._scaffolds = {}
+
+    def scaffold(self, layout):
+        if layout not in self._scaffolds:
+            with open(os.path.join(self.root, 'scaffolds', f"{layout}.md"), 'r', encoding='utf-8') as f:
+                self._scaffolds[layout] = f.read()
+        return self._scaffolds[layout]
+
+    def post_path(self, slug, date, path=None, layout='post'):
+        """对应 hexo 的 new_post_path 过滤器（不处理重名）"""
+        if path:
+            base = {'page': self.source_dir, 'draft': os.path.join(self.source_dir, '_drafts')}.get(
+                layout, os.path.join(self.source_dir, '_posts'))
+            target = os.path.join(base, path)
+        elif layout == 'page':
+            target = os.path.join(self.source_dir, slug, 'index')
+        elif layout == 'draft':
+            target = os.path.join(self.source_dir, '_drafts', slug)
+        else:
+            name = self.config['new_post_name']
+            for key, value in (('title', slug), ('year', date.strftime('%Y')), ('month', date.strftime('%m')),
+                               ('i_month', str(date.month)), ('day', date.strftime('%d')),
+                               ('i_day', str(date.day))):
+                name = name.replace(f":{key}", value)
+            target = os.path.join(self.source_dir, '_posts', name)
+        if not os.path.splitext(target)[1]:
+            target += os.path.splitext(self.config['new_post_name'])[1] or '.md'
+        return target
+
+    def create(self, title, path=None, layout=None, date=None, replace=False):
+        """
+        创建一篇文章，等同 `hexo new <layout> [--path <path>] "<title>"`
+        :return: 写入的文件路径
+        """
+        layout = (layout or self.config['default_layout']).lower()
+        date = date or current_time(self.config['timezone'])
+        slug = slugize(title, self.config['filename_case'])
+        target = self.post_path(slug, date, path, layout)
+        if not replace and os.path.exists(target):
+            stem, ext = os.path.splitext(target)
+            i = 1
+            while os.path.exists(f"{stem}-{i}{ext}"):
+                i += 1
+            target = f"{stem}-{i}{ext}"
+
+        content = render_scaffold(self.scaffold(layout), {'title': title, 'date': date, 'layout': layout})
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return target
+
+    def create_many(self, entries, layout=None, replace=False):
+        """
+        批量创建文章
+        :param entries: 标题字符串或 (标题, path) 元组的列表
+        :return: 写入的文件路径列表
+        """
+        date = current_time(self.config['timezone'])
+        paths = []
+        for entry in entries:
+            title, path = (entry, None) if isinstance(entry, str) else entry
+            paths.append(self.create(title, path, layout, date, replace))
+        return paths
+
+
+def check_parity(titles, root='.'):
+    """用真实的 `hexo new` 创建文章并与本脚手架的输出逐字节比较，完成后删除生成的文件"""
+    scaffolder = HexoScaffolder(root)
+    mismatches = 0
+    for title in titles:
+        result = subprocess.run(['hexo', 'new', 'post', title], cwd=root, capture_output=True, text=True)
+        output = re.sub(r'\x1b\[[0-9;]*m', '', result.stdout)
+        created = re.search(r'Created: (.+)$', output, re.M)
+        if not created:
+            print(f"hexo new failed for {title!r}: {output}{result.stderr}")
+            mismatches += 1
+            continue
+        hexo_path = os.path.join(root, os.path.expanduser(created.group(1).strip()))
+        with open(hexo_path, 'r', encoding='utf-8') as f:
+            expected = f.read()
+        os.remove(hexo_path)
+
+        date = datetime.strptime(re.search(r'^date: (.+)$', expected, re.M).group(1), '%Y-%m-%d %H:%M:%S')
+        ours = scaffolder.post_path(slugize(title, scaffolder.config['filename_case']), date)
+        actual = render_scaffold(scaffolder.scaffold('post'), {'title': title, 'date': date})
+        if os.path.abspath(ours) != os.path.abspath(hexo_path) or actual != expected:
+            mismatches += 1
+            print(f"MISMATCH {title!r}\n  hexo: {hexo_path}\n{expected}\n  ours: {ours}\n{actual}")
+        else:
+            print(f"OK {title!r} -> {ours}")
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="不依赖 Node 的 hexo new")
+    parser.add_argument('titles', nargs='*', help='文章标题')
+    parser.add_argument('--path', help='文章路径（仅单个标题时有效）')
+    parser.add_argument('--layout', default=None)
+    parser.add_argument('--replace', action='store_true', help='覆盖已存在的文件')
+    parser.add_argument('--titles-file', help='每行一个标题的文件，批量创建')
+    parser.add_argument('--check-parity', action='store_true', help='与真实的 hexo new 输出进行比对')
+    args = parser.parse_args()
+
+    titles = list(args.titles)
+    if args.titles_file:
+        with open(args.titles_file, 'r', encoding='utf-8') as f:
+            titles += [line.strip() for line in f if line.strip()]
+
+    if args.check_parity:
+        sys.exit(1 if check_parity(titles) else 0)
+
+    scaffolder = HexoScaffolder()
+    if args.path and len(titles) == 1:
+        print(f"Created: {scaffolder.create(titles[0], args.path, args.layout, replace=args.replace)}")
+    else:
+        for created_path in scaffolder.create_many(titles, args.layout, args.replace):
+            print(f"Created: {created_path}")
@@ -0,0 +1,262 @@
+import argparse
+import csv
+import functools
+import ipaddress
+import mmap
+import socket
+import struct
+import sys
+import time
+
+import numpy as np
+
+from geoip import IPV4_FILE, IPV6_FILE, LOCATIONS_FILE
+
+
+# Binary layout of the index file (little endian, every array 8-byte aligned):
+#   header   magic, version, number of country codes, IPv4 ranges, IPv6 ranges
+#   codes    2-byte ISO codes, index 0 is '--' (unknown)
+#   IPv4     start u32[n4], end u32[n4], code u16[n4]
+#   IPv6     start_hi u64[n6], start_lo u64[n6], end_hi u64[n6], end_lo u64[n6], code u16[n6]
+INDEX_FILE = 'GeoLite2-Country.idx'
+MAGIC = b'GCIPIDX1'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQ')
+UNKNOWN = '--'
+CHUNK_SIZE = 65536
+# Strict dotted-quad parser: unlike inet_aton it rejects shorthand such as "200", "1.2" or "0x7f.1"
+inet_pton4 = functools.partial(socket.inet_pton, socket.AF_INET)
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+def read_country_codes(locations_file):
+    """Map every geoname id of the locations CSV to its ISO country code."""
+    codes = {}
+    with open(locations_file, 'r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            # Continents (EU, AP...) have no country code
+            codes[row['geoname_id']] = row['country_iso_code'] or row['continent_code']
+    return codes
+
+
+def read_ranges(file_path, country_codes, code_ids):
+    """Read a GeoLite2 blocks CSV into sorted (start, end, code id) rows."""
+    ranges = []
+    with open(file_path, 'r') as file:
+        reader = csv.reader(file)
+        next(reader)  # Skip the header row
+        for row in reader:
+            geoname_id = row[1] or row[2]
+            code = country_codes.get(geoname_id)
+            if not code:
+                continue
+            network = ipaddress.ip_network(row[0], strict=False)
+            code_id = code_ids.setdefault(code, len(code_ids))
+            ranges.append((int(network.network_address), int(network.broadcast_address), code_id))
+    ranges.sort()
+    return ranges
+
+
+def build_index(ipv4_file, ipv6_file, locations_file, index_file):
+    country_codes = read_country_codes(locations_file)
+    code_ids = {UNKNOWN: 0}
+    ipv4_ranges = read_ranges(ipv4_file, country_codes, code_ids)
+    ipv6_ranges = read_ranges(ipv6_file, country_codes, code_ids)
+
+    codes = sorted(code_ids, key=code_ids.get)
+    mask = (1 << 64) - 1
+    arrays = [
+        np.frombuffer(''.join(code.ljust(2)[:2] for code in codes).encode('ascii'), dtype=np.uint8),
+        np.array([r[0] for r in ipv4_ranges], dtype='<u4'),
+        np.array([r[1] for r in ipv4_ranges], dtype='<u4'),
+        np.array([r[2] for r in ipv4_ranges], dtype='<u2'),
+        np.array([r[0] >> 64 for r in ipv6_ranges], dtype='<u8'),
+        np.array([r[0] & mask for r in ipv6_ranges], dtype='<u8'),
+        np.array([r[1] >> 64 for r in ipv6_ranges], dtype='<u8'),
+        np.array([r[1] & mask for r in ipv6_ranges], dtype='<u8'),
+        np.array([r[2] for r in ipv6_ranges], dtype='<u2'),
+    ]
+
+    with open(index_file, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, VERSION, len(codes), len(ipv4_ranges), len(ipv6_ranges)))
+        for array in arrays:
+            output.write(b'\0' * (_aligned(output.tell()) - output.tell()))
+            output.write(array.tobytes())
+    return len(ipv4_ranges), len(ipv6_ranges)
+
+
+class IPIndex:
+    """Country lookup over the sorted range arrays of a memory-mapped index file."""
+
+    def __init__(self, index_file=INDEX_FILE):
+        with open(index_file, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_codes, n4, n6 = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{index_file} is not an IP index file (version {VERSION})")
+
+        offset = HEADER.size
+
+        def take(dtype, count):
+            nonlocal offset
+            offset = _aligned(offset)
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            return array
+
+        raw_codes = take(np.uint8, n_codes * 2).tobytes().decode('ascii')
+        self.codes = np.array([raw_codes[i:i + 2].strip() for i in range(0, len(raw_codes), 2)], dtype=object)
+        self.v4_start, self.v4_end, self.v4_code = take('<u4', n4), take('<u4', n4), take('<u2', n4)
+        self.v6_start_hi, self.v6_start_lo = take('<u8', n6), take('<u8', n6)
+        self.v6_end_hi, self.v6_end_lo = take('<u8', n6), take('<u8', n6)
+        self.v6_code = take('<u2', n6)
+
+    def __len__(self):
+        return len(self.v4_start) + len(self.v6_start_hi)
+
+    def lookup_ipv4(self, addresses):
+        """Return the code ids of an array of IPv4 addresses given as unsigned 32-bit integers."""
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        idx = np.searchsorted(self.v4_start, addresses, side='right') - 1
+        found = idx >= 0
+        idx = np.maximum(idx, 0)
+        found &= addresses <= self.v4_end[idx]
+        return np.where(found, self.v4_code[idx], 0)
+
+    def lookup_ipv6(self, high, low):
+        """Return the code ids of IPv6 addresses given as high/low 64-bit halves."""
+        high = np.asarray(high, dtype=np.uint64)
+        low = np.asarray(low, dtype=np.uint64)
+        # Last range whose start high half is <= the address, then step back over
+        # ranges sharing that high half but starting after the address (prefixes > /64)
+        idx = np.searchsorted(self.v6_start_hi, high, side='right') - 1
+        while True:
+            safe = np.maximum(idx, 0)
+            back = (idx >= 0) & (self.v6_start_hi[safe] == high) & (self.v6_start_lo[safe] > low)
+            if not back.any():
+                break
+            idx[back] -= 1
+        found = idx >= 0
+        idx = np.maximum(idx, 0)
+        end_hi, end_lo = self.v6_end_hi[idx], self.v6_end_lo[idx]
+        found &= (high < end_hi) | ((high == end_hi) & (low <= end_lo))
+        return np.where(found, self.v6_code[idx], 0)
+
+    def lookup(self, ips):
+        """Return the ISO country codes of a batch of IP address strings ('--' when unknown)."""
+        ips = list(ips)
+        try:
+            # Fast path: a batch made only of IPv4 addresses is converted in one go
+            addresses = np.frombuffer(b''.join(map(inet_pton4, ips)), dtype='>u4')
+            return self.codes[self.lookup_ipv4(addresses)]
+        except (OSError, TypeError):
+            pass
+
+        result = np.zeros(len(ips), dtype=np.uint16)
+        v4_pos, v4_raw, v6_pos, v6_raw = [], [], [], []
+        inet_pton, AF_INET6 = socket.inet_pton, socket.AF_INET6
+        for pos, ip in enumerate(ips):
+            try:
+                if ':' in ip:
+                    v6_raw.append(inet_pton(AF_INET6, ip))
+                    v6_pos.append(pos)
+                else:
+                    v4_raw.append(inet_pton4(ip))
+                    v4_pos.append(pos)
+            except (OSError, TypeError):
+                continue
+        if v4_raw:
+            addresses = np.frombuffer(b''.join(v4_raw), dtype='>u4')
+            result[v4_pos] = self.lookup_ipv4(addresses)
+        if v6_raw:
+            halves = np.frombuffer(b''.join(v6_raw), dtype='>u8').reshape(-1, 2)
+            result[v6_pos] = self.lookup_ipv6(halves[:, 0], halves[:, 1])
+        return self.codes[result]
+
+
+def tag_log(index, log_file, output, field, separator):
+    """Stream a log file and append the country of the client address of each line."""
+    tagged = 0
+    start = time.perf_counter()
+    with open(log_file, 'r', encoding='utf-8', errors='replace') as file:
+        while True:
+            lines = [line.rstrip('\n') for line in _take_lines(file, CHUNK_SIZE)]
+            if not lines:
+                break
+            ips = []
+            for line in lines:
+                fields = line.split(None, field + 1)
+                ips.append(fields[field] if len(fields) > field else '')
+            countries = index.lookup(ips)
+            output.writelines(f"{line}{separator}{country}\n" for line, country in zip(lines, countries))
+            tagged += len(lines)
+    elapsed = time.perf_counter() - start
+    print(f"Tagged {tagged} lines in {elapsed:.2f}s ({tagged / max(elapsed, 1e-9):,.0f} lines/s)", file=sys.stderr)
+
+
+def _take_lines(file, count):
+    lines = []
+    for line in file:
+        lines.append(line)
+        if len(lines) == count:
+            break
+    return lines
+
+
+def benchmark(index, count):
+    """Measure batch lookup speed with random IPv4 addresses."""
+    rng = np.random.default_rng(0)
+    addresses = rng.integers(0, 2 ** 32, size=count, dtype=np.uint32)
+    ips = [socket.inet_ntoa(int(address).to_bytes(4, 'big')) for address in addresses]
+
+    start = time.perf_counter()
+    index.lookup_ipv4(addresses)
+    integer_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.lookup(ips)
+    string_time = time.perf_counter() - start
+
+    print(f"{count} integer lookups: {count / integer_time:,.0f} lookups/s")
+    print(f"{count} string lookups:  {count / string_time:,.0f} lookups/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Country lookup index built from the GeoLite2 Country CSVs.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="build the index file from the CSVs")
+    build_parser.add_argument('--ipv4-file', default=IPV4_FILE)
+    build_parser.add_argument('--ipv6-file', default=IPV6_FILE)
+    build_parser.add_argument('--locations-file', default=LOCATIONS_FILE)
+
+    tag_parser = subparsers.add_parser('tag', help="append a country column to every line of a log file")
+    tag_parser.add_argument('log_file')
+    tag_parser.add_argument('--field', type=int, default=0, help="whitespace-separated field holding the client IP")
+    tag_parser.add_argument('--separator', default=' ')
+
+    lookup_parser = subparsers.add_parser('lookup', help="print the country of each address")
+    lookup_parser.add_argument('ips', nargs='+')
+
+    bench_parser = subparsers.add_parser('bench', help="measure lookups per second")
+    bench_parser.add_argument('--count', type=int, default=1_000_000)
+
+    for sub in (build_parser, tag_parser, lookup_parser, bench_parser):
+        sub.add_argument('--index-file', default=INDEX_FILE)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        n4, n6 = build_index(args.ipv4_file, args.ipv6_file, args.locations_file, args.index_file)
+        print(f"Indexed {n4} IPv4 and {n6} IPv6 ranges into {args.index_file} "
+              f"in {time.perf_counter() - start:.2f}s")
+    elif args.command == 'tag':
+        tag_log(IPIndex(args.index_file), args.log_file, sys.stdout, args.field, args.separator)
+    elif args.command == 'lookup':
+        for ip, country in zip(args.ips, IPIndex(args.index_file).lookup(args.ips)):
+            print(f"{ip} {country}")
+    else:
+        benchmark(IPIndex(args.index_file), args.count)
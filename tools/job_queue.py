@@ -0,0 +1,268 @@
+"""
+基于 SQLite 的文章生成任务队列，供多个进程（或共享同一数据库文件的多台机器）同时生成文章
+每个 worker 原子地租用一篇文章，生成期间定期续租，完成后标记为 done；租约过期的任务会被其他 worker 重新领取
+用法：
+    python tools/job_queue.py import tools/titles/*.json
+    python tools/generate_articles_pro.py --prompt-file ... --queue generation_queue.db   # 每个 worker 各运行一个
+    python tools/job_queue.py export
+注意：SQLite 依赖文件锁，跨机器共享时数据库文件所在的文件系统必须正确支持锁
+默认使用 SQLite 的回滚日志（rollback journal），可以放在网络文件系统上供多台机器共享；
+WAL 模式依赖同一台机器上的共享内存，只在所有 worker 都在同一台机器上时才能启用：
+    python tools/job_queue.py --journal-mode wal import tools/titles/*.json
+日志模式保存在数据库文件中，之后打开它的 worker 都使用同一模式
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+from dataset_journal import is_pending
+from atomic_write import write_json_atomically
+
+DEFAULT_QUEUE_FILE = os.getenv("GENERATION_QUEUE", "generation_queue.db")
+DEFAULT_LEASE_SECONDS = 300
+# 同一篇文章最多尝试的次数，用完后标记为 failed 不再被领取（可用 retry 命令重新放回待生成）
+MAX_ATTEMPTS = 3
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    dataset TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    post TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    PRIMARY KEY (dataset, filename)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """
+    文章生成任务队列
+    :param queue_file: SQLite 数据库文件路径
+    :param lease_seconds: 租约时长，worker 超过这个时间没有续租，任务会被重新领取
+    :param max_attempts: 同一任务最多被租用的次数
+    :param journal_mode: 设置数据库文件的日志模式（delete 或 wal），为 None 时沿用文件中已有的模式
+    """
+
+    def __init__(self, queue_file=DEFAULT_QUEUE_FILE, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 journal_mode=None):
+        self.queue_file = queue_file
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # 自己管理事务，租用时用 BEGIN IMMEDIATE 取得写锁
+        self.conn = sqlite3.connect(queue_file, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        if journal_mode:
+            self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        # 回滚日志保持默认的 synchronous=FULL；WAL 模式下 NORMAL 已经不会在崩溃后损坏数据库
+        if self.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def import_dataset(self, dataset_file):
+        """
+        导入一个数据集 JSON 文件，已存在的任务保持原状态，已创建或被标记为重复的文章直接标记为 done
+        :return: 新增的任务数
+        """
+        with open(dataset_file, 'r') as f:
+            posts = json.load(f)
+        now = time.time()
+        rows = [(dataset_file, post['filename'], position, json.dumps(post, ensure_ascii=False),
+                 PENDING if is_pending(post) else DONE, now)
+                for position, post in enumerate(posts)]
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (dataset, filename, position, post, status, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            return self.conn.total_changes - before
+
+    def export_dataset(self, dataset_file, output_file=None):
+        """按导入时的顺序把任务状态写回数据集 JSON 格式，done 的文章 created 为 true"""
+        rows = self.conn.execute(
+            "SELECT post, status FROM jobs WHERE dataset = ? ORDER BY position", (dataset_file,)).fetchall()
+        posts = []
+        for row in rows:
+            post = json.loads(row['post'])
+            post['created'] = row['status'] == DONE and not post.get('duplicate_of')
+            posts.append(post)
+        write_json_atomically(output_file or dataset_file, posts)
+        return len(posts)
+
+    def datasets(self):
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT dataset FROM jobs ORDER BY dataset")]
+
+    def _expire(self, now):
+        """租约已过期的任务放回待生成状态，尝试次数已用完的标记为 failed，返回数量（需在事务中调用）"""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, "
+            "lease_expires = NULL, updated = ? WHERE status = ? AND lease_expires < ?",
+            (self.max_attempts, FAILED, PENDING, now, LEASED, now))
+        return cursor.rowcount
+
+    def lease(self, worker, dataset=None):
+        """
+        原子地租用一个待生成的任务，先回收租约已过期的任务
+        :return: 文章 dict（附带 _dataset 字段），没有可领取的任务时返回 None
+        """
+        now = time.time()
+        where = "status = ? AND attempts < ?"
+        params = [PENDING, self.max_attempts]
+        if dataset:
+            where += " AND dataset = ?"
+            params.append(dataset)
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._expire(now)
+            row = self.conn.execute(
+                f"SELECT dataset, filename, post FROM jobs WHERE {where} ORDER BY dataset, position LIMIT 1",
+                params).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? "
+                "WHERE dataset = ? AND filename = ?",
+                (LEASED, worker, now + self.lease_seconds, now, row['dataset'], row['filename']))
+        post = json.loads(row['post'])
+        post['_dataset'] = row['dataset']
+        return post
+
+    def _update_leased(self, sql, params, post, worker):
+        """只在 worker 仍持有租约时更新，返回是否成功"""
+        with self.conn:
+            cursor = self.conn.execute(
+                f"{sql} WHERE dataset = ? AND filename = ? AND status = ? AND worker = ?",
+                (*params, post['_dataset'], post['filename'], LEASED, worker))
+        return cursor.rowcount == 1
+
+    def heartbeat(self, post, worker):
+        """续租，租约已被他人领取时返回 False"""
+        now = time.time()
+        return self._update_leased("UPDATE jobs SET lease_expires = ?, updated = ?",
+                                   (now + self.lease_seconds, now), post, worker)
+
+    def complete(self, post, worker):
+        """标记任务完成，租约已丢失时返回 False，此时调用方不应保存结果"""
+        return self._update_leased("UPDATE jobs SET status = ?, lease_expires = NULL, updated = ?",
+                                   (DONE, time.time()), post, worker)
+
+    def release(self, post, worker):
+        """生成失败时归还任务，让其他 worker 重试；尝试次数已用完时标记为 failed"""
+        return self._update_leased(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, "
+            "lease_expires = NULL, updated = ?", (self.max_attempts, FAILED, PENDING, time.time()), post, worker)
+
+    def reclaim(self):
+        """回收所有租约已过期的任务，返回数量"""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            return self._expire(time.time())
+
+    def retry_failed(self, dataset=None):
+        """把 failed 的任务放回待生成状态并清零尝试次数，返回数量"""
+        sql = "UPDATE jobs SET status = ?, attempts = 0, updated = ? WHERE status = ?"
+        params = [PENDING, time.time(), FAILED]
+        if dataset:
+            sql += " AND dataset = ?"
+            params.append(dataset)
+        with self.conn:
+            return self.conn.execute(sql, params).rowcount
+
+    def stats(self):
+        """按数据集统计各状态的任务数"""
+        stats = {}
+        for row in self.conn.execute("SELECT dataset, status, COUNT(*) FROM jobs GROUP BY dataset, status"):
+            stats.setdefault(row[0], {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0})[row[1]] = row[2]
+        return stats
+
+
+class Heartbeat:
+    """
+    在后台线程中定期续租，生成一篇文章期间保持租约
+    :param queue_file: 队列数据库（线程内单独打开连接）
+    :param post: 租用的文章
+    :param worker: worker id
+    :param lease_seconds: 租约时长，每 1/3 租约时长续租一次
+    """
+
+    def __init__(self, queue_file, post, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.queue_file = queue_file
+        self.post = post
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        queue = JobQueue(self.queue_file, self.lease_seconds)
+        try:
+            while not self._stopped.wait(self.lease_seconds / 3):
+                if not queue.heartbeat(self.post, self.worker):
+                    self.lost = True
+                    return
+        finally:
+            queue.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="文章生成任务队列")
+    parser.add_argument('--queue', default=DEFAULT_QUEUE_FILE, help='队列数据库文件')
+    parser.add_argument('--journal-mode', choices=('delete', 'wal'),
+                        help='设置数据库的日志模式，wal 只适用于所有 worker 在同一台机器上的情况')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='从数据集 JSON 文件导入任务')
+    import_parser.add_argument('datasets', nargs='+')
+
+    export_parser = subparsers.add_parser('export', help='把任务状态写回数据集 JSON 文件')
+    export_parser.add_argument('datasets', nargs='*', help='默认导出所有数据集')
+
+    subparsers.add_parser('stats', help='查看各数据集的任务状态')
+    subparsers.add_parser('reclaim', help='回收租约已过期的任务')
+    subparsers.add_parser('retry', help='把尝试次数已用完的任务重新放回待生成状态')
+    args = parser.parse_args()
+
+    job_queue = JobQueue(args.queue, journal_mode=args.journal_mode)
+    if args.command == 'import':
+        for dataset_file in args.datasets:
+            print(f"{dataset_file}: 新增 {job_queue.import_dataset(dataset_file)} 个任务")
+    elif args.command == 'export':
+        for dataset_file in args.datasets or job_queue.datasets():
+            print(f"{dataset_file}: 导出 {job_queue.export_dataset(dataset_file)} 篇文章")
+    elif args.command == 'reclaim':
+        print(f"回收 {job_queue.reclaim()} 个过期任务")
+    elif args.command == 'retry':
+        print(f"重新放回 {job_queue.retry_failed()} 个失败任务")
+    for dataset_file, counts in job_queue.stats().items():
+        print(f"{dataset_file}: 待生成 {counts[PENDING]}，进行中 {counts[LEASED]}，已完成 {counts[DONE]}，失败 {counts[FAILED]}")
+    job_queue.close()
@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+import tempfile
+
+# 默认缓存目录与容量上限，可通过环境变量覆盖
+DEFAULT_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".llm_cache")
+DEFAULT_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+
+def cache_key(model, system_prompt, user_prompt, params=None):
+    """根据模型、系统提示词、用户提示词和请求参数计算缓存键"""
+    payload = json.dumps({
+        "model": model,
+        "system": system_prompt,
+        "user": user_prompt,
+        "params": params or {},
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    基于内容寻址的 LLM 生成结果磁盘缓存
+    以 <dir>/<key[:2]>/<key[2:4]>/<key>.json 分片存储，文件修改时间作为最近使用时间，总大小超过上限时按 LRU 淘汰
+    :param cache_dir: 缓存目录
+    :param max_bytes: 缓存总大小上限
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key[2:4], f"{key}.json")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def total_bytes(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        return self._total_bytes
+
+    def _load(self, key):
+        """读取一条缓存条目并标记为最近使用，不存在或损坏时返回 None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        os.utime(path)  # 标记为最近使用
+        return entry
+
+    def get(self, key):
+        """读取缓存的生成结果，未命中返回 None"""
+        if not self.enabled:
+            return None
+        entry = self._load(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['content']
+
+    def lookup(self, models, system_prompt, user_prompt, params=None):
+        """
+        按模型顺序查找缓存的生成结果，每个模型的结果存放在以该模型计算的键下
+        元数据中记录的模型与键不一致的条目（降级模型的结果被存在了首选模型的键下）视为未命中
+        :return: (内容, 生成该内容的模型)，都未命中时返回 (None, None)
+        """
+        if not self.enabled:
+            return None, None
+        for model in models:
+            entry = self._load(cache_key(model, system_prompt, user_prompt, params))
+            if entry is not None and entry.get('metadata', {}).get('model', model) == model:
+                self.hits += 1
+                return entry['content'], model
+        self.misses += 1
+        return None, None
+
+    def put(self, key, content, metadata=None):
+        """原子写入一条生成结果，必要时淘汰最久未使用的条目"""
+        if not self.enabled or not content:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"key": key, "content": content, "metadata": metadata or {}}, ensure_ascii=False)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(data)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp_path, path)
+        self._total_bytes = self.total_bytes() + os.path.getsize(path) - previous
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """删除最久未使用的条目，直到总大小降到上限的 90% 以下"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total_bytes = total
+
+    def report(self):
+        """打印本次运行的缓存命中情况"""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0
+        print(f"缓存命中 {self.hits} 次，未命中 {self.misses} 次（命中率 {rate:.1f}%）")
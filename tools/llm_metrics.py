@@ -0,0 +1,181 @@
+import os
+import csv
+import json
+import time
+import math
+
+# 每百万 token 的价格（美元）：(输入, 缓存命中的输入, 输出)，未列出的模型不计算费用
+MODEL_PRICES = {
+    "gpt-4o-mini-2024-07-18": (0.15, 0.075, 0.60),
+    "gpt-4o-2024-05-13": (5.00, 5.00, 15.00),
+    "gpt-4o-2024-08-06": (2.50, 1.25, 10.00),
+}
+
+# Batch API 按半价计费
+BATCH_DISCOUNT = 0.5
+
+# 报告中的字段顺序
+FIELDS = ["time", "label", "model", "status", "latency", "ttft", "tokens_per_second",
+          "prompt_tokens", "cached_tokens", "completion_tokens", "cost", "error"]
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：ASCII 约 4 字符 1 个 token，其他字符按 1 个 token 计"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return max(1, ascii_chars // 4 + (len(text) - ascii_chars))
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0, batch=False):
+    """按 MODEL_PRICES 估算一次请求的费用（美元），未知模型返回 None"""
+    prices = MODEL_PRICES.get(model)
+    if not prices or prompt_tokens is None or completion_tokens is None:
+        return None
+    input_price, cached_price, output_price = prices
+    cached_tokens = cached_tokens or 0
+    cost = ((prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+            + completion_tokens * output_price) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+
+def percentile(values, p):
+    """最近秩法计算百分位数，values 为空时返回 None"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class RequestTimer:
+    """
+    单次请求的计时器，由 MetricsRecorder.start 创建
+    流式输出收到第一个内容块时调用 first_token，请求结束时调用 finish
+    """
+
+    def __init__(self, recorder, model, label):
+        self.recorder = recorder
+        self.model = model
+        self.label = label
+        self.started = time.perf_counter()
+        self.ttft = None
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+
+    def finish(self, usage=None, status="ok", error=None, batch=False):
+        """
+        记录请求结果
+        :param usage: 响应中的 usage（对象或 dict），没有时 token 数留空
+        :param status: ok / error / cached
+        :return: 记录的指标 dict
+        """
+        latency = time.perf_counter() - self.started
+        prompt_tokens = completion_tokens = cached_tokens = None
+        if usage is not None:
+            if not isinstance(usage, dict):
+                usage = usage.model_dump()
+            prompt_tokens = usage.get("prompt_tokens")
+            completion_tokens = usage.get("completion_tokens")
+            cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        generation_time = latency - (self.ttft or 0)
+        record = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "label": self.label,
+            "model": self.model,
+            "status": status,
+            "latency": None if batch else round(latency, 3),
+            "ttft": None if self.ttft is None else round(self.ttft, 3),
+            "tokens_per_second": (round(completion_tokens / generation_time, 1)
+                                  if completion_tokens and generation_time > 0 and not batch else None),
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": completion_tokens,
+            "cost": estimate_cost(self.model, prompt_tokens, completion_tokens, cached_tokens, batch),
+            "error": str(error) if error else None,
+        }
+        self.recorder.record(record)
+        return record
+
+
+class MetricsRecorder:
+    """
+    收集每次 LLM 请求的延迟、首 token 时间、token 数和费用
+    :param report_file: 报告文件，.csv 结尾写 CSV，否则写 JSONL，每条记录立即追加；为 None 时只在内存中汇总
+    :param hook: 可选回调，每条记录写入后以 dict 调用，供其他工具复用这些指标
+    """
+
+    def __init__(self, report_file=None, hook=None):
+        self.report_file = report_file
+        self.records = []
+        self.hooks = [hook] if hook else []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def start(self, model, label=""):
+        """开始计时一次请求"""
+        return RequestTimer(self, model, label)
+
+    def record(self, record):
+        self.records.append(record)
+        if self.report_file:
+            self._append(record)
+        for hook in self.hooks:
+            hook(record)
+
+    def _append(self, record):
+        folder_path = os.path.dirname(self.report_file)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        if self.report_file.endswith('.csv'):
+            new_file = not os.path.exists(self.report_file) or os.path.getsize(self.report_file) == 0
+            with open(self.report_file, 'a', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(record)
+        else:
+            with open(self.report_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def summary(self):
+        """按模型汇总 p50/p95 延迟、首 token 时间、生成速度以及 token 和费用合计"""
+        summary = {}
+        for model in sorted({record["model"] for record in self.records}):
+            records = [record for record in self.records if record["model"] == model]
+            ok = [record for record in records if record["status"] == "ok"]
+            column = {name: [record[name] for record in ok if record[name] is not None]
+                      for name in ("latency", "ttft", "tokens_per_second")}
+            costs = [record["cost"] for record in records if record["cost"] is not None]
+            summary[model] = {
+                "requests": len(records),
+                "ok": len(ok),
+                "errors": sum(1 for record in records if record["status"] == "error"),
+                "cached": sum(1 for record in records if record["status"] == "cached"),
+                **{f"{name}_p{p}": percentile(values, p) for name, values in column.items() for p in (50, 95)},
+                "prompt_tokens": sum(record["prompt_tokens"] or 0 for record in records),
+                "cached_tokens": sum(record["cached_tokens"] or 0 for record in records),
+                "completion_tokens": sum(record["completion_tokens"] or 0 for record in records),
+                "cost": sum(costs) if costs else None,
+            }
+        return summary
+
+    def report(self):
+        """打印本次运行的指标汇总"""
+        def fmt(value, unit=""):
+            return "-" if value is None else f"{value:.2f}{unit}"
+
+        for model, stats in self.summary().items():
+            print(f"[{model}] 请求 {stats['requests']} 次（成功 {stats['ok']}，失败 {stats['errors']}，"
+                  f"本地缓存 {stats['cached']}）")
+            print(f"  延迟 p50 {fmt(stats['latency_p50'], 's')} / p95 {fmt(stats['latency_p95'], 's')}，"
+                  f"首 token p50 {fmt(stats['ttft_p50'], 's')} / p95 {fmt(stats['ttft_p95'], 's')}，"
+                  f"生成速度 p50 {fmt(stats['tokens_per_second_p50'])} / "
+                  f"p95 {fmt(stats['tokens_per_second_p95'])} tokens/s")
+            cost = "-" if stats['cost'] is None else f"${stats['cost']:.4f}"
+            cached_rate = stats['cached_tokens'] / stats['prompt_tokens'] * 100 if stats['prompt_tokens'] else 0
+            print(f"  输入 {stats['prompt_tokens']} tokens（提示词缓存命中 {stats['cached_tokens']}，"
+                  f"{cached_rate:.1f}%），"
+                  f"输出 {stats['completion_tokens']} tokens，费用 {cost}")
+        if self.report_file and self.records:
+            print(f"指标报告已写入: {self.report_file}")
@@ -1,13 +1,65 @@
+"""
+从 sitemap 中流式提取所有 <loc> 链接，内存占用与 sitemap 大小无关
+支持 .xml.gz 文件；遇到 sitemap 索引时按链接路径在本地 public 目录中找到各个分片继续提取
+用法：
+    python tools/parse_sitemap.py                                   # public/sitemap.xml -> public/baidu_urls.txt
+    python tools/parse_sitemap.py public/sitemaps/posts-000.xml.gz -o urls.txt
+"""
+import os
+import gzip
+import argparse
+from urllib.parse import urlparse
 import xml.etree.ElementTree as ET
 
-# 读取sitemap.xml文件
-tree = ET.parse('public/sitemap.xml')
-root = tree.getroot()
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
 
-# 打开urls.txt文件以写入模式
-with open('public/baidu_urls.txt', 'w') as f:
-    # 查找所有的 <loc> 元素并写入到urls.txt文件中
-    for url in root.findall('.//{http://www.sitemaps.org/schemas/sitemap/0.9}loc'):
-        f.write(url.text + '\n')
 
-print("URLs 已提取并保存到 public/baidu_urls.txt 文件中。")
+def _open(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def iter_locs(path, public_dir='public'):
+    """
+    逐个返回 sitemap 中的链接
+    :param path: sitemap 或 sitemap 索引文件，可以是 gzip 压缩的
+    :param public_dir: 索引中的分片链接对应的本地根目录
+    """
+    with _open(path) as f:
+        context = ET.iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+        is_index = root.tag == f'{SITEMAP_NS}sitemapindex'
+        shards = []
+        for event, element in context:
+            if event != 'end':
+                continue
+            if element.tag == f'{SITEMAP_NS}loc':
+                loc = (element.text or '').strip()
+                if is_index:
+                    shards.append(loc)
+                elif loc:
+                    yield loc
+            elif element.tag in (f'{SITEMAP_NS}url', f'{SITEMAP_NS}sitemap'):
+                # 处理完一条就从树上删掉，保持内存占用不变
+                root.clear()
+    for loc in shards:
+        shard_path = os.path.join(public_dir, urlparse(loc).path.lstrip('/'))
+        if os.path.exists(shard_path):
+            yield from iter_locs(shard_path, public_dir)
+        else:
+            print(f"找不到分片 {loc} 对应的本地文件 {shard_path}，跳过")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="从 sitemap 中提取所有链接")
+    parser.add_argument('sitemap', nargs='?', default='public/sitemap.xml')
+    parser.add_argument('-o', '--output', default='public/baidu_urls.txt')
+    parser.add_argument('--public-dir', default='public', help='站点生成目录，用于查找 sitemap 索引中的分片')
+    args = parser.parse_args()
+
+    count = 0
+    with open(args.output, 'w') as f:
+        for url in iter_locs(args.sitemap, args.public_dir):
+            f.write(url + '\n')
+            count += 1
+
+    print(f"{count} 个 URL 已提取并保存到 {args.output} 文件中。")
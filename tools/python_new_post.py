@@ -1,14 +1,17 @@
 import os
 import pkgutil
-import subprocess
+from hexo_scaffold import HexoScaffolder
 
 def create_hexo_posts_for_standard_library_modules():
+    post_titles = []
     for module in pkgutil.iter_modules():
         if module.name.startswith('_'):  # skip private modules
             continue
         module_name = module.name
         post_title = f"Python：{module_name}库高级用法举例和应用详解"
-        command = f"hexo new \"{post_title}\""
-        subprocess.run(command, shell=True)
+        post_titles.append(post_title)
+    # 一次性在进程内创建所有文章，替代逐个执行 hexo new
+    for path in HexoScaffolder().create_many(post_titles):
+        print(f"Created: {path}")
 
-create_hexo_posts_for_standard_library_modules()
\ No newline at end of file
+create_hexo_posts_for_standard_library_modules()
@@ -0,0 +1,284 @@
+"""
+预先计算每篇文章的相关文章，写入 <source_dir>/_data/related_posts.json，主题通过 site.data.related_posts 读取，
+避免在 hexo generate 时对上千篇文章两两计算相似度
+- 特征：正文和标题的词（英文按词，中文按相邻两字），以及 categories / tags / keywords，按字段加权
+- 用 SciPy 稀疏矩阵构建 TF-IDF（次线性词频，行 L2 归一化），余弦相似度按行分块做稀疏矩阵乘法，
+  每块用 argpartition 取前 k 个，内存占用与块大小成正比
+- 每篇文章的词频与内容哈希一起缓存在语料索引数据库中，再次运行时只重新分词新增或修改的文章；
+  IDF 是全局的，相似度矩阵每次整体重算（千余篇文章不到一秒），结果没有变化时不改写 JSON 文件
+用法：
+    python tools/related_posts.py                  # 刷新并写入 source/_data/related_posts.json
+    python tools/related_posts.py --count 8 --min-score 0.1
+    python tools/related_posts.py --dry-run        # 只打印统计和变化的文章数
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+from scipy import sparse
+
+from corpus_index import CorpusIndex, PARALLEL_THRESHOLD
+from atomic_write import write_text_atomically
+
+DEFAULT_OUTPUT = os.path.join('_data', 'related_posts.json')
+# 分词规则变化时递增，缓存的词频会被清空重新计算
+TERMS_VERSION = 1
+RELATED_COUNT = 5
+MIN_SCORE = 0.05
+# 出现在超过这个比例的文章中的词没有区分度；只出现在一篇文章中的词对相似度没有贡献
+MAX_DF = 0.5
+MIN_DF = 2
+# 每块相似度矩阵（float32）的内存上限
+BLOCK_BYTES = 64 * 1024 * 1024
+# 各字段特征的权重，正文的词权重为 1
+FIELD_WEIGHTS = {'title': 3.0, 'categories': 5.0, 'tags': 3.0, 'keywords': 2.0}
+
+WORD = re.compile(r"[a-z][a-z0-9+#]*|[㐀-鿿]+")
+CODE_BLOCK = re.compile(r'^(```|~~~).*?^\1', re.MULTILINE | re.DOTALL)
+MARKUP = re.compile(r'!?\[([^\]]*)\]\([^)]*\)|<[^>]+>|https?://\S+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS related_terms (
+    path TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    terms TEXT NOT NULL
+);
+"""
+
+
+def tokenize(text):
+    """英文按词（至少两个字母），中文连续汉字按相邻两字切分"""
+    tokens = []
+    for word in WORD.findall(text.lower()):
+        if word[0] >= '㐀':
+            tokens.extend(word[i:i + 2] for i in range(max(1, len(word) - 1)))
+        elif len(word) > 1:
+            tokens.append(word)
+    return tokens
+
+
+def body_terms(text):
+    """正文的词频，去掉代码块、链接地址和 HTML 标签"""
+    text = CODE_BLOCK.sub(' ', text)
+    text = MARKUP.sub(lambda m: f" {m.group(1) or ''} ", text)
+    return Counter(tokenize(text))
+
+
+def _terms_many(items):
+    """items 为 [(path, body_offset)]，返回 [(path, 词频 dict)]"""
+    results = []
+    for path, body_offset in items:
+        with open(path, 'rb') as f:
+            f.seek(body_offset or 0)
+            results.append((path, dict(body_terms(f.read().decode('utf-8', errors='replace')))))
+    return results
+
+
+def field_features(post):
+    """标题和 front matter 字段的特征，带字段前缀以免与正文的词混在一起"""
+    features = Counter()
+    for word in tokenize(post['title'] or ''):
+        features[f"title:{word}"] += FIELD_WEIGHTS['title']
+    for field in ('categories', 'tags'):
+        for value in post[field]:
+            features[f"{field}:{str(value).strip().lower()}"] += FIELD_WEIGHTS[field]
+    for keyword in (post['keywords'] or '').split(','):
+        if keyword.strip():
+            features[f"keywords:{keyword.strip().lower()}"] += FIELD_WEIGHTS['keywords']
+    return features
+
+
+def tfidf_matrix(documents):
+    """
+    构建行归一化的 TF-IDF 稀疏矩阵
+    :param documents: [{特征: 权重}]
+    :return: CSR 矩阵（float32），形状为 (文章数, 特征数)
+    """
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    values = []
+    for document in documents:
+        for term, value in document.items():
+            indices.append(vocabulary.setdefault(term, len(vocabulary)))
+            values.append(value)
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix((np.array(values, dtype=np.float32), np.array(indices, dtype=np.int64),
+                                np.array(indptr, dtype=np.int64)), shape=(len(documents), len(vocabulary)))
+    # 次线性词频 1 + log(tf)，字段特征的权重不小于 1，同样适用
+    matrix.data = 1 + np.log(matrix.data)
+    df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    keep = (df >= MIN_DF) & (df <= max(MIN_DF, MAX_DF * len(documents)))
+    idf = np.log((1 + len(documents)) / (1 + df)).astype(np.float32) + 1
+    matrix = matrix @ sparse.diags(np.where(keep, idf, 0).astype(np.float32))
+    matrix.eliminate_zeros()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms).astype(np.float32) @ matrix)
+
+
+def top_neighbours(matrix, count=RELATED_COUNT, min_score=MIN_SCORE):
+    """
+    按行分块计算余弦相似度，返回每一行最相似的 count 行
+    :param matrix: 行归一化的 CSR 矩阵
+    :return: [[(行号, 相似度)]]，按相似度从高到低
+    """
+    rows = matrix.shape[0]
+    transposed = matrix.T.tocsc()
+    block = max(1, BLOCK_BYTES // (4 * max(1, rows)))
+    count = min(count, rows - 1)
+    neighbours = []
+    if count <= 0:
+        return [[] for _ in range(rows)]
+    for start in range(0, rows, block):
+        end = min(rows, start + block)
+        scores = (matrix[start:end] @ transposed).toarray()
+        scores[np.arange(end - start), np.arange(start, end)] = -1
+        best = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        for row_best, row_scores in zip(best.tolist(), best_scores.tolist()):
+            neighbours.append([(j, score) for j, score in zip(row_best, row_scores) if score >= min_score])
+    return neighbours
+
+
+def page_path(config, permalink):
+    """与 Hexo 的 page.path 一致：去掉站点地址和根路径后的相对路径"""
+    root = urlparse(config['url']).path.rstrip('/') + '/'
+    path = urlparse(permalink).path
+    return path[len(root):] if path.startswith(root) else path.lstrip('/')
+
+
+class RelatedPosts:
+    """
+    相关文章索引，分词结果缓存在语料索引的数据库中
+    :param corpus: CorpusIndex
+    """
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.conn = corpus.conn
+        self.conn.executescript(SCHEMA)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'related_terms_version'").fetchone()
+        if row is None or row[0] != str(TERMS_VERSION):
+            with self.conn:
+                self.conn.execute("DELETE FROM related_terms")
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('related_terms_version', ?)",
+                                  (str(TERMS_VERSION),))
+
+    def refresh(self, workers=None):
+        """
+        刷新语料索引，并为新增或内容变化的文章重新分词
+        :return: (已发布文章列表, 对应的正文词频列表, 统计 dict：total / tokenized / removed / seconds)
+        """
+        started = time.perf_counter()
+        self.corpus.refresh(workers)
+        posts = [post for post in self.corpus.posts(with_errors=False)
+                 if post['front_matter'].get('published') is not False]
+        by_path = {post['path']: post for post in posts}
+        known = {path: (content_hash, terms) for path, content_hash, terms
+                 in self.conn.execute("SELECT path, hash, terms FROM related_terms")}
+        changed = [(post['path'], post['body_offset']) for post in posts
+                   if known.get(post['path'], (None,))[0] != post['hash']]
+        removed = [path for path in known if path not in by_path]
+
+        if len(changed) >= PARALLEL_THRESHOLD and (workers or os.cpu_count() or 1) > 1:
+            workers = workers or os.cpu_count()
+            chunk = max(1, len(changed) // (workers * 4))
+            with ProcessPoolExecutor(workers) as pool:
+                results = [item for batch in pool.map(_terms_many,
+                                                      [changed[i:i + chunk] for i in range(0, len(changed), chunk)])
+                           for item in batch]
+        else:
+            results = _terms_many(changed)
+
+        fresh = dict(results)
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO related_terms (path, hash, terms) VALUES (?, ?, ?)",
+                                  [(path, by_path[path]['hash'], json.dumps(terms, ensure_ascii=False))
+                                   for path, terms in results])
+            self.conn.executemany("DELETE FROM related_terms WHERE path = ?", [(path,) for path in removed])
+        terms = [fresh[post['path']] if post['path'] in fresh else json.loads(known[post['path']][1])
+                 for post in posts]
+        return posts, terms, {'total': len(posts), 'tokenized': len(results), 'removed': len(removed),
+                              'seconds': time.perf_counter() - started}
+
+    def build(self, count=RELATED_COUNT, min_score=MIN_SCORE, workers=None):
+        """
+        计算所有已发布文章的相关文章
+        :return: (主题读取的数据 dict, 统计 dict)
+        """
+        posts, terms, stats = self.refresh(workers)
+        started = time.perf_counter()
+        documents = []
+        for post, body in zip(posts, terms):
+            document = field_features(post)
+            document.update(body)
+            documents.append(document)
+        matrix = tfidf_matrix(documents)
+        neighbours = top_neighbours(matrix, count, min_score)
+        config = self.corpus.config
+        paths = [page_path(config, post['permalink']) for post in posts]
+        # posts 中每篇文章只出现一次，related 用下标引用，JSON 更小
+        data = {
+            'version': 1,
+            'posts': [[path, post['title'] or path] for path, post in zip(paths, posts)],
+            'related': {path: [j for j, _ in row] for path, row in zip(paths, neighbours) if row},
+        }
+        stats.update(features=matrix.shape[1], nonzero=matrix.nnz, similarity_seconds=time.perf_counter() - started)
+        return data, stats
+
+
+def changed_pages(old, new):
+    """比较新旧数据，返回相关文章列表发生变化的页面数"""
+    def resolve(data):
+        posts = data.get('posts', [])
+        return {path: [posts[j][0] for j in related] for path, related in data.get('related', {}).items()}
+    old_related, new_related = resolve(old), resolve(new)
+    return sum(1 for path in old_related.keys() | new_related.keys()
+               if old_related.get(path) != new_related.get(path))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="预先计算每篇文章的相关文章")
+    parser.add_argument('--root', default='.', help='Hexo 站点根目录')
+    parser.add_argument('--index-file', help='语料索引文件')
+    parser.add_argument('--output', help=f'输出文件，默认 <source_dir>/{DEFAULT_OUTPUT}')
+    parser.add_argument('--count', type=int, default=RELATED_COUNT, help='每篇文章的相关文章数')
+    parser.add_argument('--min-score', type=float, default=MIN_SCORE, help='最低余弦相似度')
+    parser.add_argument('--workers', type=int, help='分词的进程数')
+    parser.add_argument('--dry-run', action='store_true', help='只打印统计，不写入文件')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with CorpusIndex(args.root, args.index_file) as corpus:
+        data, stats = RelatedPosts(corpus).build(args.count, args.min_score, args.workers)
+        output = args.output or os.path.join(args.root, corpus.config['source_dir'], DEFAULT_OUTPUT)
+
+    old = {}
+    if os.path.exists(output):
+        with open(output, 'r', encoding='utf-8') as f:
+            try:
+                old = json.load(f)
+            except json.JSONDecodeError:
+                pass
+    text = json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n'
+    written = False
+    if not args.dry_run and data != old:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        write_text_atomically(output, text)
+        written = True
+    print(f"{stats['total']} 篇文章，重新分词 {stats['tokenized']} 篇（{stats['seconds']:.2f}s），"
+          f"{stats['features']} 个特征，计算相似度 {stats['similarity_seconds']:.2f}s；"
+          f"{changed_pages(old, data)} 篇文章的相关文章有变化，"
+          f"{'写入 ' + output if written else '未写入文件'}（{len(text.encode('utf-8')) / 1024:.0f} KB），"
+          f"总用时 {time.perf_counter() - started:.2f}s", file=sys.stderr)
@@ -0,0 +1,235 @@
+"""
+生成请求的重试调度：错误分类、带抖动的指数退避（遵循 Retry-After）、按 models 列表降级，以及熔断
+用法：
+    scheduler = RetryScheduler(models)
+    article = scheduler.call(lambda model: request_article(model, ...))
+    article = await scheduler.call_async(lambda model: request_article_async(model, ...))
+"""
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import openai
+
+# 错误类别
+RATE_LIMIT = 'rate_limit'
+TIMEOUT = 'timeout'
+SERVER_ERROR = 'server_error'
+CONTENT_ERROR = 'content_error'
+FATAL = 'fatal'
+
+# 可以在同一模型上重试的错误类别
+RETRYABLE = {RATE_LIMIT, TIMEOUT, SERVER_ERROR}
+
+# 传输层异常（连接断开、读超时等）的类名关键字，这些异常不一定被 openai 包装
+TRANSIENT_NAMES = ('Timeout', 'Connect', 'Protocol', 'Network', 'ReadError', 'RemoteDisconnected')
+
+
+class ContentError(Exception):
+    """模型拒绝生成或返回了不可用的内容（如 finish_reason 为 content_filter、内容为空）"""
+
+
+class StreamInterruptedError(ConnectionError):
+    """流式输出在收到 finish_reason 之前就结束了，按超时类错误重试（可从断点续写）"""
+
+
+def classify_error(error):
+    """把异常归类为 rate_limit / timeout / server_error / content_error / fatal"""
+    if isinstance(error, ContentError):
+        return CONTENT_ERROR
+    if isinstance(error, openai.RateLimitError):
+        # 额度用尽不是暂时性的限流，重试没有意义
+        code = getattr(error, 'code', None)
+        return CONTENT_ERROR if code == 'insufficient_quota' else RATE_LIMIT
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return TIMEOUT
+    if isinstance(error, openai.InternalServerError):
+        return SERVER_ERROR
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code == 429:
+            return RATE_LIMIT
+        if error.status_code in (408, 409) or error.status_code >= 500:
+            return SERVER_ERROR
+        if isinstance(error, (openai.AuthenticationError, openai.PermissionDeniedError)):
+            return FATAL
+        # 400（上下文超长、内容策略）、404（模型不存在）、422 等换一个模型可能成功
+        return CONTENT_ERROR
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return TIMEOUT
+    if any(name in type(error).__name__ for name in TRANSIENT_NAMES):
+        return TIMEOUT
+    return FATAL
+
+
+def retry_after(error):
+    """从 Retry-After / retry-after-ms 响应头读取服务端要求的等待秒数，没有时返回 None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    最近 window 秒内的请求错误率达到 threshold（且至少 min_requests 个请求）时熔断 cooldown 秒，
+    熔断期间暂停派发新请求；冷却结束后放行请求，若仍然失败则再次熔断
+    """
+
+    def __init__(self, threshold=0.5, window=60, min_requests=5, cooldown=30):
+        self.threshold = threshold
+        self.window = window
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.results = deque()
+        self.open_until = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def _trim(self, now):
+        while self.results and self.results[0][0] < now - self.window:
+            self.results.popleft()
+
+    def record(self, ok):
+        now = time.monotonic()
+        with self.lock:
+            self.results.append((now, ok))
+            self._trim(now)
+            if ok or now < self.open_until or len(self.results) < self.min_requests:
+                return
+            total = len(self.results)
+            errors = sum(1 for _, result in self.results if not result)
+            if errors / total >= self.threshold:
+                self.open_until = now + self.cooldown
+                self.results.clear()
+                self.trips += 1
+                print(f"最近 {total} 个请求中 {errors} 个失败，暂停派发请求 {self.cooldown}s")
+
+    def wait_time(self):
+        """距离熔断结束还需等待的秒数"""
+        return max(0.0, self.open_until - time.monotonic())
+
+
+class RetryScheduler:
+    """
+    为一次生成请求调度重试和模型降级
+    限流、超时、服务端错误在同一模型上按带抖动的指数退避重试，超过 max_retries 后换下一个模型；
+    内容错误直接换下一个模型；鉴权等致命错误不重试
+    :param models: 模型列表，按优先级排列
+    :param max_retries: 每个模型最多重试次数
+    :param base_delay: 退避基数（秒）
+    :param max_delay: 单次退避上限（秒）
+    :param breaker: CircuitBreaker，为 None 时不熔断
+    """
+
+    def __init__(self, models, max_retries=3, base_delay=1.0, max_delay=60.0, breaker=None):
+        self.models = list(models)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.stats = {"requests": 0, "retries": 0, "fallbacks": 0, "failures": 0, "errors": {}}
+
+    def backoff(self, attempt, error=None):
+        """第 attempt 次重试前的等待秒数：full jitter 指数退避，且不少于 Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        server_delay = retry_after(error) if error is not None else None
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.max_delay))
+        return delay
+
+    def _plan(self, error, model_index, attempt):
+        """
+        根据错误决定下一步
+        :return: (下一个模型下标, 下一个重试次数, 等待秒数)，无法继续时返回 None
+        """
+        kind = classify_error(error)
+        self.stats["errors"][kind] = self.stats["errors"].get(kind, 0) + 1
+        if kind == FATAL:
+            return None
+        if kind in RETRYABLE and attempt < self.max_retries:
+            self.stats["retries"] += 1
+            delay = self.backoff(attempt, error)
+            print(f"请求失败（{kind}，模型 {self.models[model_index]}）: {error}，{delay:.1f}s 后第 {attempt + 1} 次重试")
+            return model_index, attempt + 1, delay
+        if model_index + 1 < len(self.models):
+            self.stats["fallbacks"] += 1
+            print(f"请求失败（{kind}，模型 {self.models[model_index]}）: {error}，改用 {self.models[model_index + 1]}")
+            return model_index + 1, 0, 0.0
+        return None
+
+    def _record(self, ok):
+        if self.breaker:
+            self.breaker.record(ok)
+
+    def call(self, request):
+        """
+        同步调度
+        :param request: request(model) 发起一次请求，失败时抛出异常
+        :return: request 的返回值，所有模型都失败时抛出最后一个异常
+        """
+        model_index, attempt = 0, 0
+        while True:
+            if self.breaker:
+                time.sleep(self.breaker.wait_time())
+            self.stats["requests"] += 1
+            try:
+                result = request(self.models[model_index])
+            except Exception as e:
+                self._record(False)
+                plan = self._plan(e, model_index, attempt)
+                if plan is None:
+                    self.stats["failures"] += 1
+                    raise
+                model_index, attempt, delay = plan
+                time.sleep(delay)
+                continue
+            self._record(True)
+            return result
+
+    async def call_async(self, request):
+        """call 的异步版本，request(model) 返回协程"""
+        model_index, attempt = 0, 0
+        while True:
+            if self.breaker:
+                await asyncio.sleep(self.breaker.wait_time())
+            self.stats["requests"] += 1
+            try:
+                result = await request(self.models[model_index])
+            except Exception as e:
+                self._record(False)
+                plan = self._plan(e, model_index, attempt)
+                if plan is None:
+                    self.stats["failures"] += 1
+                    raise
+                model_index, attempt, delay = plan
+                await asyncio.sleep(delay)
+                continue
+            self._record(True)
+            return result
+
+    def report(self):
+        """打印重试与降级统计"""
+        errors = "，".join(f"{kind} {count}" for kind, count in sorted(self.stats["errors"].items())) or "无"
+        trips = self.breaker.trips if self.breaker else 0
+        print(f"请求 {self.stats['requests']} 次，重试 {self.stats['retries']} 次，降级 {self.stats['fallbacks']} 次，"
+              f"熔断 {trips} 次，最终失败 {self.stats['failures']} 次（错误: {errors}）")
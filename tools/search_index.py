@@ -0,0 +1,324 @@
+"""
+为站内搜索生成分片的静态倒排索引，浏览器每次查询只下载清单和一两个几 KB 的分片，而不是全部文章
+- 分词：英文按词（小写），中文连续汉字按相邻两字切分，与主题中 js/search_index.js 的分词一致
+- 每个词的倒排表为 [文档号差值, 权重, ...]，权重为正文词频加上标题、分类、标签、关键词的加权命中
+- 按词的前缀分片：从首字符开始，分片超过 TARGET_SHARD_BYTES 时把较大的子前缀拆成独立分片（最长 MAX_PREFIX 个字符），
+  客户端用查询词在清单中最长的前缀找到分片；分片和文档信息都用 gzip 压缩（不写时间戳）
+- 客户端把最后一个查询词按前缀匹配时，至少需要两个字符，且最多多取 4 个更长前缀的分片，避免单个字母下载该字母下的所有分片
+- 每篇文章的词表与内容哈希、文档号一起缓存在语料索引数据库中，再次运行时只重新分词新增或修改的文章；
+  文档号保持稳定，内容没有变化的分片不会重写
+在 hexo generate 之后、deploy 之前运行：
+    python tools/search_index.py                     # 写入 public/search/
+    python tools/search_index.py --dry-run           # 只打印索引大小和用时
+"""
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import hashlib
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+from corpus_index import CorpusIndex, PARALLEL_THRESHOLD
+from atomic_write import write_bytes_atomically, write_json_atomically
+
+SEARCH_DIR = 'search'
+MANIFEST_FILE = 'index.json'
+INDEX_VERSION = 1
+# 分词规则变化时递增，缓存的词表会被清空重新计算
+TERMS_VERSION = 1
+# 分片（未压缩 JSON）的目标大小，压缩后约为三分之一
+TARGET_SHARD_BYTES = 24 * 1024
+MAX_PREFIX = 4
+# 每个文档信息文件包含的文章数
+DOC_CHUNK = 32
+MAX_TERM_LENGTH = 32
+DESCRIPTION_LENGTH = 160
+# 标题、分类、标签、关键词中每次命中相当于正文中出现的次数
+FIELD_WEIGHTS = {'title': 10, 'categories': 5, 'tags': 5, 'keywords': 5}
+MAX_WEIGHT = 255
+STOPWORDS = set("""
+a an the and or of for to with in on at by from as is are was were be been it its this that these those
+you your we our they their he she his her not no but if then than so such can will would should could
+""".split())
+
+WORD = re.compile(r"[a-z0-9][a-z0-9+#]*|[㐀-鿿]+")
+CODE_BLOCK = re.compile(r'^(```|~~~).*?^\1', re.MULTILINE | re.DOTALL)
+MARKUP = re.compile(r'!?\[([^\]]*)\]\([^)]*\)|<[^>]+>|https?://\S+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_terms (
+    path TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    terms TEXT NOT NULL
+);
+"""
+
+
+def tokenize(text):
+    """英文按词（去掉停用词和过长的词），中文连续汉字按相邻两字切分，单个汉字保留"""
+    tokens = []
+    for word in WORD.findall(text.lower()):
+        if word[0] >= '㐀':
+            tokens.extend(word[i:i + 2] for i in range(max(1, len(word) - 1)))
+        elif word not in STOPWORDS and len(word) <= MAX_TERM_LENGTH:
+            tokens.append(word)
+    return tokens
+
+
+def post_terms(text, post):
+    """
+    一篇文章的词及权重
+    :param text: 正文
+    :param post: 语料索引记录，提供标题和 front matter 字段
+    :return: {词: 权重}，权重不超过 MAX_WEIGHT
+    """
+    text = CODE_BLOCK.sub(' ', text)
+    text = MARKUP.sub(lambda m: f" {m.group(1) or ''} ", text)
+    weights = Counter(tokenize(text))
+    fields = {'title': post['title'] or '', 'keywords': post['keywords'] or '',
+              'categories': ' '.join(map(str, post['categories'])), 'tags': ' '.join(map(str, post['tags']))}
+    for field, value in fields.items():
+        for term in set(tokenize(value)):
+            weights[term] += FIELD_WEIGHTS[field]
+    return {term: min(weight, MAX_WEIGHT) for term, weight in weights.items()}
+
+
+def _terms_many(items):
+    """items 为语料索引记录列表，返回 [(path, 词表)]"""
+    results = []
+    for post in items:
+        with open(post['path'], 'rb') as f:
+            f.seek(post['body_offset'] or 0)
+            results.append((post['path'], post_terms(f.read().decode('utf-8', errors='replace'), post)))
+    return results
+
+
+def encode_postings(postings):
+    """[(文档号, 权重)] 按文档号排序后编码为 [差值, 权重, ...]"""
+    encoded = []
+    previous = 0
+    for doc_id, weight in sorted(postings):
+        encoded.extend((doc_id - previous, weight))
+        previous = doc_id
+    return encoded
+
+
+def assign_prefixes(sizes, prefix=''):
+    """
+    按前缀划分分片
+    :param sizes: {词: 倒排表编码后的大小}，所有词都以 prefix 开头
+    :return: {前缀: [词]}
+    较小的子前缀留在当前分片中，直到当前分片达到目标大小；其余子前缀递归拆分
+    """
+    if sum(sizes.values()) <= TARGET_SHARD_BYTES or len(prefix) >= MAX_PREFIX:
+        return {prefix: sorted(sizes)}
+    groups = {}
+    kept = []
+    for term, size in sizes.items():
+        if len(term) == len(prefix):
+            kept.append(term)
+        else:
+            groups.setdefault(term[:len(prefix) + 1], {})[term] = size
+    kept_size = sum(sizes[term] for term in kept)
+    shards = {}
+    for key, group in sorted(groups.items(), key=lambda item: (sum(item[1].values()), item[0])):
+        group_size = sum(group.values())
+        if kept_size + group_size <= TARGET_SHARD_BYTES:
+            kept.extend(group)
+            kept_size += group_size
+        else:
+            shards.update(assign_prefixes(group, key))
+    if kept:
+        shards[prefix] = sorted(kept)
+    return shards
+
+
+def shard_file(prefix):
+    """分片文件名：前缀的 UTF-8 十六进制，空前缀为 _"""
+    return f"{prefix.encode('utf-8').hex() or '_'}.json.gz"
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class SearchIndex:
+    """
+    静态搜索索引，词表缓存存放在语料索引的数据库中
+    :param corpus: CorpusIndex
+    """
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.conn = corpus.conn
+        self.conn.executescript(SCHEMA)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'search_terms_version'").fetchone()
+        if row is None or row[0] != str(TERMS_VERSION):
+            with self.conn:
+                self.conn.execute("DELETE FROM search_terms")
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('search_terms_version', ?)",
+                                  (str(TERMS_VERSION),))
+
+    def refresh(self, workers=None):
+        """
+        刷新语料索引，为新增或内容变化的文章重新分词；新文章使用最小的空闲文档号
+        :return: (已发布文章列表, 文档号列表, 词表列表, 统计 dict：total / tokenized / removed / seconds)
+        """
+        started = time.perf_counter()
+        self.corpus.refresh(workers)
+        posts = [post for post in self.corpus.posts(with_errors=False)
+                 if post['front_matter'].get('published') is not False]
+        by_path = {post['path']: post for post in posts}
+        known = {row[0]: row[1:] for row in self.conn.execute("SELECT path, hash, doc_id, terms FROM search_terms")}
+        changed = [post for post in posts if known.get(post['path'], (None,))[0] != post['hash']]
+        removed = [path for path in known if path not in by_path]
+
+        if len(changed) >= PARALLEL_THRESHOLD and (workers or os.cpu_count() or 1) > 1:
+            workers = workers or os.cpu_count()
+            chunk = max(1, len(changed) // (workers * 4))
+            with ProcessPoolExecutor(workers) as pool:
+                results = [item for batch in pool.map(_terms_many,
+                                                      [changed[i:i + chunk] for i in range(0, len(changed), chunk)])
+                           for item in batch]
+        else:
+            results = _terms_many(changed)
+
+        used = {known[path][1] for path in known if path in by_path}
+        doc_ids = {path: known[path][1] for path in known if path in by_path}
+        free = (doc_id for doc_id in range(len(posts) + len(known) + 1) if doc_id not in used)
+        for post in posts:
+            if post['path'] not in doc_ids:
+                doc_ids[post['path']] = next(free)
+        fresh = dict(results)
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO search_terms (path, hash, doc_id, terms) VALUES (?, ?, ?, ?)",
+                                  [(path, by_path[path]['hash'], doc_ids[path], json.dumps(terms, ensure_ascii=False))
+                                   for path, terms in results])
+            self.conn.executemany("DELETE FROM search_terms WHERE path = ?", [(path,) for path in removed])
+        terms = [fresh[post['path']] if post['path'] in fresh else json.loads(known[post['path']][2])
+                 for post in posts]
+        return posts, [doc_ids[post['path']] for post in posts], terms, {
+            'total': len(posts), 'tokenized': len(results), 'removed': len(removed),
+            'seconds': time.perf_counter() - started}
+
+    def build(self, workers=None):
+        """
+        生成分片和文档信息文件的内容
+        :return: (清单 dict, {相对路径: 未压缩的 JSON bytes}, 统计 dict)
+        """
+        posts, doc_ids, terms, stats = self.refresh(workers)
+        started = time.perf_counter()
+        inverted = {}
+        for doc_id, post_terms_ in zip(doc_ids, terms):
+            for term, weight in post_terms_.items():
+                inverted.setdefault(term, []).append((doc_id, weight))
+        postings = {term: encode_postings(items) for term, items in inverted.items()}
+        # 估算每个词在分片 JSON 中占用的字节数："词":[...],
+        sizes = {term: len(term.encode('utf-8')) + 6 + sum(len(str(value)) + 1 for value in encoded)
+                 for term, encoded in postings.items()}
+
+        files = {}
+        shards = {}
+        for prefix, shard_terms in assign_prefixes(sizes).items():
+            name = f"{SEARCH_DIR}/{shard_file(prefix)}"
+            files[name] = _dumps({term: postings[term] for term in shard_terms})
+            shards[prefix] = len(shard_terms)
+
+        config = self.corpus.config
+        root = urlparse(config['url']).path.rstrip('/') + '/'
+        docs = [None] * (max(doc_ids) + 1 if doc_ids else 0)
+        for doc_id, post in zip(doc_ids, posts):
+            path = urlparse(post['permalink']).path
+            description = (post['description'] or '')[:DESCRIPTION_LENGTH]
+            docs[doc_id] = [path[len(root):] if path.startswith(root) else path.lstrip('/'),
+                            post['title'] or '', description]
+        for start in range(0, len(docs), DOC_CHUNK):
+            files[f"{SEARCH_DIR}/docs/{start // DOC_CHUNK}.json.gz"] = _dumps(docs[start:start + DOC_CHUNK])
+
+        manifest = {
+            'version': INDEX_VERSION,
+            'docs': len(posts),
+            'doc_chunk': DOC_CHUNK,
+            'max_prefix': MAX_PREFIX,
+            # 客户端按文件内容摘要请求分片，内容不变时可以长期缓存
+            'files': {name[len(SEARCH_DIR) + 1:]: hashlib.sha256(data).hexdigest()[:10] for name, data in files.items()},
+            'shards': shards,
+        }
+        stats.update(terms=len(postings), postings=sum(len(items) for items in inverted.values()),
+                     index_seconds=time.perf_counter() - started)
+        return manifest, files, stats
+
+
+def write_index(manifest, files, public_dir):
+    """
+    写出分片、文档信息文件和清单，只重写内容变化的文件，删除不再使用的文件
+    :return: 统计 dict：files / written / removed / bytes（压缩后总大小）/ largest（最大分片）
+    """
+    search_dir = os.path.join(public_dir, SEARCH_DIR)
+    os.makedirs(os.path.join(search_dir, 'docs'), exist_ok=True)
+    manifest_path = os.path.join(search_dir, MANIFEST_FILE)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            try:
+                previous = json.load(f).get('files', {})
+            except json.JSONDecodeError:
+                pass
+
+    written = 0
+    sizes = {}
+    for name, data in files.items():
+        relative = name[len(SEARCH_DIR) + 1:]
+        path = os.path.join(public_dir, name)
+        if previous.get(relative) == manifest['files'][relative] and os.path.exists(path):
+            sizes[relative] = os.path.getsize(path)
+            continue
+        compressed = gzip.compress(data, mtime=0)
+        write_bytes_atomically(path, compressed)
+        sizes[relative] = len(compressed)
+        written += 1
+
+    removed = 0
+    for relative in previous:
+        path = os.path.join(search_dir, relative)
+        if relative not in manifest['files'] and os.path.exists(path):
+            os.remove(path)
+            removed += 1
+    write_json_atomically(manifest_path, manifest)
+    shard_sizes = [size for relative, size in sizes.items() if not relative.startswith('docs/')]
+    return {'files': len(files), 'written': written, 'removed': removed,
+            'bytes': sum(sizes.values()) + os.path.getsize(manifest_path),
+            'largest': max(shard_sizes, default=0), 'shards': len(shard_sizes)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="生成分片的静态搜索索引")
+    parser.add_argument('--root', default='.', help='Hexo 站点根目录')
+    parser.add_argument('--index-file', help='语料索引文件')
+    parser.add_argument('--public-dir', default='public', help='站点生成目录')
+    parser.add_argument('--workers', type=int, help='分词的进程数')
+    parser.add_argument('--dry-run', action='store_true', help='只打印统计，不写入文件')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with CorpusIndex(args.root, args.index_file) as corpus:
+        manifest, files, stats = SearchIndex(corpus).build(args.workers)
+        source_bytes = sum(post['size'] for post in corpus.posts(with_errors=False))
+    print(f"{stats['total']} 篇文章（{source_bytes / 1024 / 1024:.1f} MB），重新分词 {stats['tokenized']} 篇"
+          f"（{stats['seconds']:.2f}s），{stats['terms']} 个词，{stats['postings']} 条倒排记录"
+          f"（{stats['index_seconds']:.2f}s）", file=sys.stderr)
+    if args.dry_run:
+        raw = sum(len(data) for data in files.values())
+        print(f"{len(manifest['shards'])} 个分片，{len(files)} 个文件，未压缩 {raw / 1024:.0f} KB，"
+              f"总用时 {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    else:
+        result = write_index(manifest, files, os.path.join(args.root, args.public_dir))
+        print(f"{result['shards']} 个分片，{result['files']} 个文件，重写 {result['written']} 个，删除 {result['removed']} 个；"
+              f"压缩后共 {result['bytes'] / 1024:.0f} KB，最大分片 {result['largest'] / 1024:.1f} KB，"
+              f"总用时 {time.perf_counter() - started:.2f}s", file=sys.stderr)
@@ -0,0 +1,227 @@
+"""
+文章正文的 SimHash 指纹索引，用于找出正文几乎相同的文章（搜索引擎会惩罚重复内容）
+- 每篇文章的正文按 3 词 shingle 计算 64 位 SimHash，和内容哈希一起存入语料索引数据库，内容不变的文章不会重新计算
+- 海明距离不超过 k 的两个指纹，把 64 位分成 k + 1 段后至少有一段完全相同（抽屉原理），
+  因此对每一段建一张以该段取值为键的表，只比较同一个桶中的指纹，整体复杂度接近线性
+用法：
+    python tools/simhash_index.py                    # 刷新指纹并列出所有近似重复的文章对
+    python tools/simhash_index.py --new-only         # 只列出涉及本次新增或修改文章的文章对
+    python tools/simhash_index.py --distance 5 --json
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from corpus_index import CorpusIndex, PARALLEL_THRESHOLD
+
+DEFAULT_DISTANCE = 3
+# 指纹算法变化时递增，旧指纹会被清空重新计算
+SIMHASH_VERSION = 1
+SHINGLE_WORDS = 3
+# 同一个桶中最多比较的指纹数，避免该段取值没有区分度（如大量空文章）时退化为平方复杂度
+MAX_BUCKET = 1000
+WORD = re.compile(r'\w+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS simhash (
+    path TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    fingerprint INTEGER NOT NULL
+);
+"""
+
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+# 把相邻词的哈希组合成 shingle 哈希的系数（奇数，uint64 乘法按 2^64 取模）
+_SHINGLE_FACTORS = (np.uint64(0x9e3779b97f4a7c15), np.uint64(0xc2b2ae3d27d4eb4f), np.uint64(1))
+
+
+def _word_hash(word):
+    return int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _mix(values):
+    """splitmix64 的最终混合步骤，让组合后的哈希各位分布均匀"""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
+
+
+def simhash(text):
+    """
+    计算文本的 64 位 SimHash，特征为连续 SHINGLE_WORDS 个词，按出现次数加权
+    每个不同的词只做一次加密哈希，shingle 的哈希由词哈希用 numpy 批量组合得到
+    """
+    words = WORD.findall(text.lower())
+    if not words:
+        return 0
+    vocabulary = {}
+    ids = np.fromiter((vocabulary.setdefault(word, len(vocabulary)) for word in words), dtype=np.int64,
+                      count=len(words))
+    word_hashes = np.fromiter(map(_word_hash, vocabulary), dtype=np.uint64, count=len(vocabulary))[ids]
+    width = min(SHINGLE_WORDS, len(words))
+    count = len(words) - width + 1
+    combined = np.zeros(count, dtype=np.uint64)
+    for offset, factor in enumerate(_SHINGLE_FACTORS[-width:]):
+        combined = combined + word_hashes[offset:offset + count] * factor
+    features, weights = np.unique(_mix(combined), return_counts=True)
+    # 每一位：该位为 1 的特征权重之和减去为 0 的特征权重之和
+    bits = ((features[:, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.int64)
+    totals = weights @ (bits * 2 - 1)
+    return int(np.sum(np.uint64(1) << _BIT_SHIFTS[totals > 0], dtype=np.uint64))
+
+
+def _fingerprint_many(items):
+    """items 为 [(path, body_offset)]，返回 [(path, fingerprint)]"""
+    results = []
+    for path, body_offset in items:
+        with open(path, 'rb') as f:
+            f.seek(body_offset or 0)
+            results.append((path, simhash(f.read().decode('utf-8', errors='replace'))))
+    return results
+
+
+def _to_signed(value):
+    """SQLite 的 INTEGER 是有符号 64 位"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def popcount(values):
+    """uint64 数组每个元素中 1 的个数；np.bitwise_count 需要 numpy 2，numpy 1.x 上按字节展开后求和"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return np.unpackbits(np.ascontiguousarray(values).view(np.uint8)).reshape(-1, 64).sum(axis=1, dtype=np.uint8)
+
+
+def hamming_pairs(fingerprints, max_distance=DEFAULT_DISTANCE, targets=None):
+    """
+    找出海明距离不超过 max_distance 的所有指纹对
+    :param fingerprints: uint64 数组
+    :param targets: 只返回至少一端在这个下标集合中的对，为 None 时返回全部
+    :return: {(i, j): 距离}，i < j
+    """
+    fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+    blocks = max_distance + 1
+    bounds = [64 * block // blocks for block in range(blocks + 1)]
+    pairs = {}
+    for start, end in zip(bounds, bounds[1:]):
+        mask = np.uint64((1 << (end - start)) - 1)
+        keys = (fingerprints >> np.uint64(start)) & mask
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        sorted_values = fingerprints[order]
+        # 按该段排序后同一个桶中的指纹相邻，依次比较相隔 1、2、3……个位置的指纹，直到不再有相同的键
+        for offset in range(1, min(len(order), MAX_BUCKET)):
+            same = np.flatnonzero(sorted_keys[offset:] == sorted_keys[:-offset])
+            if not len(same):
+                break
+            distances = popcount(sorted_values[same] ^ sorted_values[same + offset])
+            for position, distance in zip(same[distances <= max_distance], distances[distances <= max_distance]):
+                i, j = sorted((int(order[position]), int(order[position + offset])))
+                if targets is None or i in targets or j in targets:
+                    pairs[(i, j)] = int(distance)
+    return pairs
+
+
+class SimHashIndex:
+    """
+    SimHash 指纹索引，存放在语料索引的数据库中
+    :param corpus: CorpusIndex
+    """
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.conn = corpus.conn
+        self.conn.executescript(SCHEMA)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'simhash_version'").fetchone()
+        if row is None or row[0] != str(SIMHASH_VERSION):
+            with self.conn:
+                self.conn.execute("DELETE FROM simhash")
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('simhash_version', ?)",
+                                  (str(SIMHASH_VERSION),))
+
+    def refresh(self, workers=None):
+        """
+        刷新语料索引，并为新增或内容变化的文章计算指纹
+        :return: 统计 dict：total / computed / removed / changed（本次计算的路径列表）/ seconds
+        """
+        started = time.perf_counter()
+        self.corpus.refresh(workers)
+        posts = {post['path']: post for post in self.corpus.posts(with_errors=False)}
+        known = dict(self.conn.execute("SELECT path, hash FROM simhash"))
+        changed = [(path, post['body_offset']) for path, post in posts.items() if known.get(path) != post['hash']]
+        removed = [path for path in known if path not in posts]
+
+        if len(changed) >= PARALLEL_THRESHOLD and (workers or os.cpu_count() or 1) > 1:
+            workers = workers or os.cpu_count()
+            chunk = max(1, len(changed) // (workers * 4))
+            with ProcessPoolExecutor(workers) as pool:
+                results = [item for batch in pool.map(_fingerprint_many,
+                                                      [changed[i:i + chunk] for i in range(0, len(changed), chunk)])
+                           for item in batch]
+        else:
+            results = _fingerprint_many(changed)
+
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO simhash (path, hash, fingerprint) VALUES (?, ?, ?)",
+                                  [(path, posts[path]['hash'], _to_signed(fingerprint))
+                                   for path, fingerprint in results])
+            self.conn.executemany("DELETE FROM simhash WHERE path = ?", [(path,) for path in removed])
+        return {'total': len(posts), 'computed': len(results), 'removed': len(removed),
+                'changed': [path for path, _ in results], 'seconds': time.perf_counter() - started}
+
+    def fingerprints(self):
+        """按路径排序返回 (路径列表, uint64 指纹数组)"""
+        rows = self.conn.execute("SELECT path, fingerprint FROM simhash ORDER BY path").fetchall()
+        return [row[0] for row in rows], np.array([_to_unsigned(row[1]) for row in rows], dtype=np.uint64)
+
+    def near_duplicates(self, max_distance=DEFAULT_DISTANCE, paths=None):
+        """
+        找出正文近似重复的文章对
+        :param max_distance: 海明距离阈值
+        :param paths: 只返回涉及这些文章的对，为 None 时返回全部
+        :return: [(路径, 路径, 距离)]，按距离排序
+        """
+        all_paths, fingerprints = self.fingerprints()
+        targets = None
+        if paths is not None:
+            wanted = set(paths)
+            targets = {i for i, path in enumerate(all_paths) if path in wanted}
+        pairs = hamming_pairs(fingerprints, max_distance, targets)
+        return sorted(((all_paths[i], all_paths[j], distance) for (i, j), distance in pairs.items()),
+                      key=lambda pair: (pair[2], pair[0], pair[1]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="用 SimHash 找出正文近似重复的文章")
+    parser.add_argument('--root', default='.', help='Hexo 站点根目录')
+    parser.add_argument('--index-file', help='语料索引文件')
+    parser.add_argument('--distance', type=int, default=DEFAULT_DISTANCE, help='海明距离阈值')
+    parser.add_argument('--new-only', action='store_true', help='只列出涉及本次新增或修改文章的文章对')
+    parser.add_argument('--workers', type=int, help='计算指纹的进程数')
+    parser.add_argument('--json', action='store_true', help='每个文章对输出一行 JSON')
+    args = parser.parse_args()
+
+    with CorpusIndex(args.root, args.index_file) as corpus:
+        index = SimHashIndex(corpus)
+        stats = index.refresh(args.workers)
+        started = time.perf_counter()
+        pairs = index.near_duplicates(args.distance, stats['changed'] if args.new_only else None)
+        seconds = time.perf_counter() - started
+    for path_a, path_b, distance in pairs:
+        if args.json:
+            print(json.dumps({'a': path_a, 'b': path_b, 'distance': distance}, ensure_ascii=False))
+        else:
+            print(f"{distance}\t{path_a}\t{path_b}")
+    print(f"{stats['total']} 篇文章，计算指纹 {stats['computed']} 篇（{stats['seconds']:.2f}s），"
+          f"找到 {len(pairs)} 对近似重复的文章（距离 <= {args.distance}，{seconds:.2f}s）", file=sys.stderr)
@@ -0,0 +1,184 @@
+"""
+流式输出校验：在生成过程中逐行检查文章格式，能修复的当场修复，明显不可用时立即中止，避免为整篇废稿付费
+检查项：
+- 去掉 ```markdown ... ``` 包裹
+- front matter 以 --- 开始和结束，缺少的开头/结尾 --- 自动补上
+- 必需字段齐全，title 加双引号，description 中的双引号转义（同 fix_format.py）
+- 正文中的代码块成对出现，结束时未闭合的代码块自动补上 ```
+- <!-- more --> 摘要标记
+"""
+import re
+
+from retry_scheduler import ContentError
+
+# 缺少时文章不可用的字段
+REQUIRED_KEYS = ('title', 'date', 'categories', 'tags')
+# 缺少时只给出警告的字段
+RECOMMENDED_KEYS = ('keywords', 'description')
+# 超过这个行数仍未结束的 front matter 视为损坏
+MAX_FRONT_MATTER_LINES = 40
+# 开头允许出现的非内容行数（空行、包裹用的 ``` 等）
+MAX_LEADING_LINES = 5
+
+MORE_MARKER = '<!-- more -->'
+WRAPPER_FENCE = re.compile(r'^(`{3,}|~{3,})\s*(markdown|md)?\s*$', re.IGNORECASE)
+FENCE = re.compile(r'^\s*(`{3,}|~{3,})')
+KEY_LINE = re.compile(r'^([A-Za-z_][\w-]*):(.*)$')
+DATE_VALUE = re.compile(r'^\d{4}-\d{2}-\d{2}( \d{2}:\d{2}(:\d{2})?)?$')
+
+
+class InvalidOutputError(ContentError):
+    """生成的内容格式明显不可用，应中止本次生成"""
+
+
+class StreamValidator:
+    """
+    逐块接收模型输出，按行校验并返回修复后的文本
+    只返回完整的行，未结束的行留在缓冲区，因此写入磁盘的内容总是以换行结尾，可以安全地断点续写
+    :param required_keys: front matter 必需字段
+    """
+
+    def __init__(self, required_keys=REQUIRED_KEYS):
+        self.required_keys = required_keys
+        self.state = 'start'
+        self.buffer = ''
+        self.wrapped = False
+        self.leading_lines = 0
+        self.keys = set()
+        self.front_matter_lines = 0
+        self.fence = None
+        self.pending_close = None
+        self.has_more = False
+        self.repairs = []
+        self.warnings = []
+
+    def feed(self, text):
+        """
+        输入一段流式输出
+        :return: 校验并修复后可以写出的文本（可能为空字符串）
+        :raises InvalidOutputError: 输出已经明显不可用
+        """
+        self.buffer += text
+        if '\n' not in self.buffer:
+            return ''
+        lines = self.buffer.split('\n')
+        self.buffer = lines.pop()
+        return ''.join(self._line(line) for line in lines)
+
+    def prime(self, text):
+        """断点续写时用已写出的内容恢复状态，不产生输出"""
+        self.feed(text)
+
+    def finish(self):
+        """
+        流结束：处理最后一行并做整体检查
+        :return: 还需要写出的文本
+        :raises InvalidOutputError: front matter 不完整
+        """
+        output = ''
+        if self.buffer:
+            output += self._line(self.buffer)
+            self.buffer = ''
+        if self.state != 'body':
+            raise InvalidOutputError("输出结束时 front matter 仍不完整")
+        if self.pending_close is not None:
+            # 末尾单独的 ``` 是包裹用的结束标记，丢弃
+            self.pending_close = None
+        if self.fence:
+            output += f"{self.fence}\n"
+            self.repairs.append("补全未闭合的代码块")
+            self.fence = None
+        if not self.has_more:
+            self.warnings.append(f"缺少 {MORE_MARKER} 摘要标记")
+        return output
+
+    def _line(self, line):
+        line = line.rstrip('\r')
+        if self.state == 'start':
+            return self._start_line(line)
+        if self.state == 'front_matter':
+            return self._front_matter_line(line)
+        return self._body_line(line)
+
+    def _start_line(self, line):
+        stripped = line.strip()
+        self.leading_lines += 1
+        if self.leading_lines > MAX_LEADING_LINES:
+            raise InvalidOutputError("输出没有以 front matter 开头")
+        if not stripped:
+            return ''
+        if WRAPPER_FENCE.match(stripped) and not self.wrapped:
+            self.wrapped = True
+            self.repairs.append("去掉 ```markdown 包裹")
+            return ''
+        self.state = 'front_matter'
+        if stripped == '---':
+            return '---\n'
+        if KEY_LINE.match(line):
+            self.repairs.append("补上 front matter 开头的 ---")
+            return '---\n' + self._front_matter_line(line)
+        raise InvalidOutputError(f"输出没有以 front matter 开头: {stripped[:40]!r}")
+
+    def _front_matter_line(self, line):
+        stripped = line.strip()
+        if stripped == '---':
+            return self._close_front_matter() + '---\n'
+        self.front_matter_lines += 1
+        if self.front_matter_lines > MAX_FRONT_MATTER_LINES:
+            raise InvalidOutputError("front matter 过长，缺少结尾的 ---")
+        if FENCE.match(line) or stripped.startswith('#'):
+            # 正文已经开始，说明模型漏写了结尾的 ---
+            output = self._close_front_matter() + '---\n'
+            self.repairs.append("补上 front matter 结尾的 ---")
+            return output + ('\n' if stripped.startswith('#') else '') + self._body_line(line)
+        match = KEY_LINE.match(line)
+        if not match:
+            return line + '\n'
+        key, value = match.group(1), match.group(2).strip()
+        self.keys.add(key)
+        if key == 'title' and value and not (value.startswith('"') and value.endswith('"')):
+            value = value.strip("'").replace('"', '\\"')
+            self.repairs.append("title 加上双引号")
+            return f'title: "{value}"\n'
+        if key == 'description' and '"' in value.strip('"'):
+            value = value.strip('"').replace('"', '&quot;')
+            self.repairs.append("转义 description 中的双引号")
+            return f'description: "{value}"\n'
+        if key == 'date' and value and not DATE_VALUE.match(value.strip('"\'')):
+            self.warnings.append(f"date 格式不正确: {value}")
+        return line + '\n'
+
+    def _close_front_matter(self):
+        missing = [key for key in self.required_keys if key not in self.keys]
+        if missing:
+            raise InvalidOutputError(f"front matter 缺少必需字段: {', '.join(missing)}")
+        for key in RECOMMENDED_KEYS:
+            if key not in self.keys:
+                self.warnings.append(f"front matter 缺少 {key}")
+        self.state = 'body'
+        return ''
+
+    def _body_line(self, line):
+        stripped = line.strip()
+        output = ''
+        if self.pending_close is not None:
+            if not stripped:
+                self.pending_close += '\n'
+                return ''
+            # 后面还有内容，之前的 ``` 是一个代码块的开始而不是包裹的结束
+            output, self.pending_close = self.pending_close, None
+            self.fence = FENCE.match(output).group(1)
+        if MORE_MARKER in line:
+            self.has_more = True
+        match = FENCE.match(line)
+        if match:
+            marker = match.group(1)
+            if self.fence is None:
+                if self.wrapped and stripped == marker:
+                    # 可能是包裹的结束标记，先不输出，看后面是否还有内容
+                    self.pending_close = line + '\n'
+                    return output
+                self.fence = marker
+            elif marker[0] == self.fence[0] and len(marker) >= len(self.fence) and stripped == marker:
+                self.fence = None
+        return output + line + '\n'
@@ -0,0 +1,75 @@
+import os
+
+# 生成中的文章先写到这个目录，不放在 source/_posts 下以免被 Hexo 处理
+PARTIAL_DIR = os.getenv("ARTICLE_PARTIAL_DIR", ".partials")
+
+# 断点续写时追加的用户消息
+CONTINUE_PROMPT = "上面的内容在输出过程中被中断了，请从中断处继续往下写，不要重复已经输出的内容，也不要添加任何说明。"
+
+
+class StreamingArticleWriter:
+    """
+    把流式输出直接写入临时文件，完成后一次原子重命名到目标路径
+    中断的生成会留下 <PARTIAL_DIR>/<文件名>.partial，下次可以从断点继续
+    :param target_path: 文章最终路径，例如 source/_posts/xxx.md
+    :param partial_dir: 临时文件目录
+    """
+
+    def __init__(self, target_path, partial_dir=PARTIAL_DIR):
+        self.target_path = target_path
+        self.partial_path = os.path.join(partial_dir, f"{os.path.basename(target_path)}.partial")
+        self.done_path = os.path.join(partial_dir, f"{os.path.basename(target_path)}.done")
+        self._file = None
+
+    def existing(self):
+        """返回上次中断留下的内容，没有时返回空字符串"""
+        if not os.path.exists(self.partial_path):
+            return ""
+        with open(self.partial_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def open(self, resume=False):
+        """开始写入，resume 为 True 时在已有内容后追加"""
+        self.close()
+        os.makedirs(os.path.dirname(self.partial_path), exist_ok=True)
+        self._file = open(self.partial_path, 'a' if resume else 'w', encoding='utf-8')
+
+    def write(self, text):
+        self._file.write(text)
+        self._file.flush()
+
+    def finish(self):
+        """流结束：落盘并去掉首尾空白，标记为已完成（.done）后返回完整文章内容"""
+        self.close()
+        content = self.existing()
+        article = content.strip()
+        if article != content:
+            with open(self.partial_path, 'w', encoding='utf-8') as f:
+                f.write(article)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(self.partial_path, self.done_path)
+        return article
+
+    def commit(self):
+        """把已完成的文章原子地移动到目标路径"""
+        self.close()
+        folder_path = os.path.dirname(self.target_path)
+        if folder_path:
+            os.makedirs(folder_path, exist_ok=True)
+        os.replace(self.done_path, self.target_path)
+        print(f"文章已保存至: {self.target_path}")
+
+    def discard(self):
+        """放弃本次生成的内容"""
+        self.close()
+        for path in (self.partial_path, self.done_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
@@ -0,0 +1,129 @@
+"""
+本地百度普通收录推送接口桩服务，用于离线测试 baidu_seo_push.py
+POST /urls?site=...&token=... 的行为与百度接口一致：按当天剩余配额接受链接，返回 success / remain，
+不属于该站点的链接放在 not_same_site 中，不合法的链接放在 not_valid 中，配额用尽时返回 400 over quota
+GET /stats 返回请求数、TCP 连接数和已接受的链接数，用于确认连接复用
+用法：
+    python tools/stub_baidu_push_server.py --port 8766 --quota 3000
+    BAIDU_PUSH_ENDPOINT=http://127.0.0.1:8766/urls BAIDU_SEO_SITE=https://gitceo.com BAIDU_SEO_KEY=stub \
+        python tools/baidu_seo_push.py
+"""
+import json
+import random
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 百度接口单次请求最多接受的链接数
+MAX_URLS_PER_REQUEST = 2000
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    token = None
+    fail_rate = 0.0
+    lock = threading.Lock()
+    remain = 0
+    stats = {"requests": 0, "connections": 0, "accepted": 0}
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            self.stats["connections"] += 1
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path.rstrip('/') == '/stats':
+            self._send_json(200, {**self.stats, "remain": self.remain})
+        else:
+            self._send_json(404, {"error": 404, "message": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8', errors='replace')
+        parsed = urlparse(self.path)
+        if parsed.path.rstrip('/') != '/urls':
+            self._send_json(404, {"error": 404, "message": "not found"})
+            return
+        with self.lock:
+            self.stats["requests"] += 1
+        if random.random() < self.fail_rate:
+            self._send_json(500, {"error": 500, "message": "internal error"})
+            return
+        query = parse_qs(parsed.query)
+        site = query.get('site', [''])[0]
+        if not site:
+            self._send_json(400, {"error": 400, "message": "site init fail"})
+            return
+        if self.token and query.get('token', [''])[0] != self.token:
+            self._send_json(401, {"error": 401, "message": "token is not valid"})
+            return
+        urls = [line.strip() for line in body.splitlines() if line.strip()]
+        if not urls:
+            self._send_json(400, {"error": 400, "message": "empty content"})
+            return
+        if len(urls) > MAX_URLS_PER_REQUEST:
+            self._send_json(400, {"error": 400, "message": "over limit"})
+            return
+        site_host = urlparse(site if '://' in site else f'https://{site}').hostname
+        not_same_site, not_valid, valid = [], [], []
+        for url in urls:
+            parts = urlparse(url)
+            if parts.scheme not in ('http', 'https'):
+                not_valid.append(url)
+            elif parts.hostname != site_host:
+                not_same_site.append(url)
+            else:
+                valid.append(url)
+        handler = type(self)
+        with handler.lock:
+            if handler.remain <= 0:
+                self._send_json(400, {"error": 400, "message": "over quota"})
+                return
+            # 配额不足时百度只接受前 remain 个链接
+            valid = valid[:handler.remain]
+            handler.remain -= len(valid)
+            handler.stats["accepted"] += len(valid)
+            remain = handler.remain
+        response = {"success": len(valid), "remain": remain}
+        if not_same_site:
+            response["not_same_site"] = not_same_site
+        if not_valid:
+            response["not_valid"] = not_valid
+        self._send_json(200, response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地百度推送接口桩服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--quota', type=int, default=3000, help="每天的推送配额")
+    parser.add_argument('--token', help="要求的 token，不指定时不校验")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="返回 500 的请求比例（0~1）")
+    args = parser.parse_args()
+
+    StubHandler.remain = args.quota
+    StubHandler.token = args.token
+    StubHandler.fail_rate = args.fail_rate
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Stub Baidu push server listening on http://{args.host}:{args.port}/urls")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
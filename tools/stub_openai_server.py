@@ -0,0 +1,457 @@
+"""
+本地 OpenAI 兼容桩服务，用于离线测试文章生成脚本
+支持 /v1/chat/completions（含流式），以及基于本地目录存储的 /v1/files 与 /v1/batches
+可以按比例注入故障（429、5xx、超时、流中断、内容过滤、格式错误的输出），用于测试重试、降级和输出校验
+GET /v1/stub/stats 返回每个 chat completions 请求的模型、时间和注入的故障，以及最大并发请求数
+用法：
+    python tools/stub_openai_server.py --port 8765 --latency 0.5
+    python tools/stub_openai_server.py --fail-rate 0.3 --fail-kinds 429,500,disconnect --fail-model gpt-4o-mini-2024-07-18
+    python tools/stub_openai_server.py --fail-first 2 --fail-kinds 429,500   # 前两个请求依次返回 429、500
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python tools/generate_articles_pro.py ...
+"""
+import argparse
+import email
+import email.policy
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_metrics import estimate_tokens
+
+
+def fake_article(user_prompt):
+    """根据用户提示词最后一行中的标题生成一篇格式正确的假文章"""
+    lines = user_prompt.strip().splitlines() or [""]
+    title = re.sub(r'^.*?[：:]', '', lines[-1], count=1).strip() or "Stub Article"
+    return (
+        "---\n"
+        f"title: \"{title}\"\n"
+        "date: 2024-07-25 20:27:12\n"
+        "keywords: \"stub, test\"\n"
+        "description: \"A stub article generated by the local test server.\"\n"
+        "categories:\n"
+        "  - stub\n"
+        "tags:\n"
+        "  - stub\n"
+        "---\n\n"
+        f"### Introduction to {title}\n\n"
+        "This article was produced by the local stub server.\n\n"
+        "<!-- more -->\n\n"
+        "### Details\n\n"
+        "```python\nprint('hello')  # 打印问候语\n```\n\n"
+        "### Conclusion\n\n"
+        "Thanks for reading.\n"
+    )
+
+
+class PromptCache:
+    """
+    模拟服务端的提示词前缀缓存：与最近的请求共享的前缀达到 1024 tokens 时，按 128 tokens 为单位计为缓存命中
+    :param size: 记住的最近请求数
+    """
+
+    MIN_TOKENS = 1024
+    BLOCK_TOKENS = 128
+
+    def __init__(self, size=256):
+        self.size = size
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def cached_tokens(self, prompt_text):
+        with self.lock:
+            longest = 0
+            for seen in self.prompts:
+                common = os.path.commonprefix([seen, prompt_text])
+                longest = max(longest, len(common))
+            if prompt_text not in self.prompts:
+                self.prompts = (self.prompts + [prompt_text])[-self.size:]
+        tokens = estimate_tokens(prompt_text[:longest]) if longest else 0
+        if tokens < self.MIN_TOKENS:
+            return 0
+        return tokens // self.BLOCK_TOKENS * self.BLOCK_TOKENS
+
+
+prompt_cache = PromptCache()
+
+
+class RequestLog:
+    """记录 chat completions 请求的模型、开始时间、注入的故障，以及同时进行的最大请求数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+
+    def start(self, model):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            entry = {"model": model, "time": time.time(), "fault": None}
+            self.requests.append(entry)
+        return entry
+
+    def finish(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self.lock:
+            return {"in_flight": self.in_flight, "max_in_flight": self.max_in_flight,
+                    "requests": [dict(entry) for entry in self.requests]}
+
+
+request_log = RequestLog()
+
+
+def completion_result(request):
+    """根据 chat completions 请求生成假文章和 usage"""
+    messages = request.get('messages', [])
+    user_prompt = next((m['content'] for m in messages if m['role'] == 'user'), '')
+    # 按消息顺序拼接，前缀相同的请求才能命中缓存
+    prompt_text = ''.join(f"{m['role']}:{m['content']}" for m in messages)
+    article = fake_article(user_prompt)
+    usage = {
+        "prompt_tokens": estimate_tokens(prompt_text),
+        "completion_tokens": estimate_tokens(article),
+        "prompt_tokens_details": {"cached_tokens": prompt_cache.cached_tokens(prompt_text)},
+    }
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    return article, usage
+
+
+def completion_body(request, article, usage):
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get('model', 'stub-model'),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": article},
+                     "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+
+class FileStore:
+    """
+    以本地目录模拟 Files 与 Batches 接口的存储
+    :param data_dir: 存放上传文件、批处理状态和结果的目录
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(data_dir, 'files'), exist_ok=True)
+        os.makedirs(os.path.join(data_dir, 'batches'), exist_ok=True)
+
+    def _meta_path(self, kind, object_id):
+        return os.path.join(self.data_dir, kind, f"{object_id}.json")
+
+    def save_meta(self, kind, obj):
+        with self.lock:
+            temp_path = self._meta_path(kind, obj['id']) + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(obj, f)
+            os.replace(temp_path, self._meta_path(kind, obj['id']))
+
+    def load_meta(self, kind, object_id):
+        try:
+            with open(self._meta_path(kind, object_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def create_file(self, filename, purpose, content):
+        file_id = f"file-{uuid.uuid4().hex}"
+        with open(os.path.join(self.data_dir, 'files', file_id), 'wb') as f:
+            f.write(content)
+        obj = {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+               "filename": filename, "purpose": purpose, "status": "processed"}
+        self.save_meta('files', obj)
+        return obj
+
+    def file_content(self, file_id):
+        path = os.path.join(self.data_dir, 'files', file_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def run_batch(self, batch, delay):
+        """后台处理批任务：逐行生成假结果并写入输出文件"""
+        time.sleep(delay)
+        batch.update(status="in_progress", in_progress_at=int(time.time()))
+        self.save_meta('batches', batch)
+        lines = self.file_content(batch['input_file_id']).decode('utf-8').splitlines()
+        output, completed, failed = [], 0, 0
+        for line in lines:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            body = item.get('body', {})
+            if not body.get('messages'):
+                failed += 1
+                output.append({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": item.get('custom_id'),
+                               "response": None, "error": {"code": "invalid_request", "message": "messages required"}})
+                continue
+            article, usage = completion_result(body)
+            completed += 1
+            output.append({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": item.get('custom_id'),
+                           "response": {"status_code": 200, "request_id": uuid.uuid4().hex,
+                                        "body": completion_body(body, article, usage)},
+                           "error": None})
+        time.sleep(delay)
+        content = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in output).encode('utf-8')
+        output_file = self.create_file(f"{batch['id']}_output.jsonl", "batch_output", content)
+        batch.update(status="completed", completed_at=int(time.time()), output_file_id=output_file['id'],
+                     request_counts={"total": completed + failed, "completed": completed, "failed": failed})
+        self.save_meta('batches', batch)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    chunk_size = 16
+    chunk_delay = 0.0
+    batch_delay = 0.5
+    store = None
+    fail_rate = 0.0
+    fail_first = 0
+    fail_kinds = ()
+    fault_lock = threading.Lock()
+    faults_injected = 0
+    fail_model = None
+    retry_after = 1.0
+    timeout_delay = 5.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        path = self.path.rstrip('/')
+        if path.endswith('/chat/completions'):
+            request = self._read_json()
+            entry = request_log.start(request.get('model', 'stub-model'))
+            try:
+                self.chat_completions(request, entry)
+            finally:
+                request_log.finish()
+        elif path.endswith('/files'):
+            self.upload_file()
+        elif path.endswith('/batches'):
+            self.create_batch(self._read_json())
+        else:
+            self._not_found()
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path.endswith('/stub/stats'):
+            return self._send_json(200, request_log.snapshot())
+        match = re.search(r'/files/([\w-]+)(/content)?$', path)
+        if match:
+            if match.group(2):
+                content = self.store.file_content(match.group(1))
+                if content is None:
+                    return self._not_found()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+                return
+            obj = self.store.load_meta('files', match.group(1))
+            return self._send_json(200, obj) if obj else self._not_found()
+        match = re.search(r'/batches/([\w-]+)$', path)
+        if match:
+            obj = self.store.load_meta('batches', match.group(1))
+            return self._send_json(200, obj) if obj else self._not_found()
+        self._not_found()
+
+    def upload_file(self):
+        """解析 multipart/form-data 上传的文件"""
+        length = int(self.headers.get('Content-Length', 0))
+        raw = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode('utf-8') + self.rfile.read(length)
+        message = email.message_from_bytes(raw, policy=email.policy.default)
+        fields, filename, content = {}, 'upload.jsonl', b''
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if part.get_filename():
+                filename, content = part.get_filename(), part.get_payload(decode=True)
+            else:
+                fields[name] = part.get_payload(decode=True).decode('utf-8')
+        self._send_json(200, self.store.create_file(filename, fields.get('purpose', 'batch'), content))
+
+    def create_batch(self, request):
+        if not self.store.load_meta('files', request.get('input_file_id', '')):
+            return self._send_json(400, {"error": {"message": "input_file_id not found"}})
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": request.get('endpoint', '/v1/chat/completions'),
+            "input_file_id": request['input_file_id'],
+            "completion_window": request.get('completion_window', '24h'),
+            "status": "validating",
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": request.get('metadata'),
+        }
+        self.store.save_meta('batches', batch)
+        threading.Thread(target=self.store.run_batch, args=(dict(batch), self.batch_delay), daemon=True).start()
+        self._send_json(200, batch)
+
+    def pick_fault(self, request):
+        """
+        决定本次请求注入的故障，不注入时返回 None
+        设置了 --fail-first 时前 N 个请求依次按 --fail-kinds 注入，之后不再注入；否则按 --fail-rate 随机注入
+        """
+        if not self.fail_kinds or (self.fail_model and request.get('model') != self.fail_model):
+            return None
+        if self.fail_first:
+            with self.fault_lock:
+                index = StubHandler.faults_injected
+                StubHandler.faults_injected += 1
+            if index >= self.fail_first:
+                return None
+            fault = self.fail_kinds[index % len(self.fail_kinds)]
+        elif random.random() >= self.fail_rate:
+            return None
+        else:
+            fault = random.choice(self.fail_kinds)
+        print(f"inject {fault} into {request.get('model')}", flush=True)
+        return fault
+
+    def chat_completions(self, request, entry):
+        article, usage = completion_result(request)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get('model', 'stub-model')
+        time.sleep(self.latency)
+
+        fault = entry["fault"] = self.pick_fault(request)
+        if fault == '429':
+            return self._send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "requests",
+                                                   "code": "rate_limit_exceeded"}},
+                                   {"Retry-After": str(self.retry_after)})
+        if fault in ('500', '502', '503'):
+            return self._send_json(int(fault), {"error": {"message": "The server had an error (stub)",
+                                                          "type": "server_error"}})
+        if fault == 'timeout':
+            # 迟迟不响应，然后直接断开连接
+            time.sleep(self.timeout_delay)
+            self.close_connection = True
+            return
+        if fault == 'content_filter':
+            article = ""
+        elif fault == 'wrapped':
+            article = f"```markdown\n{article}```\n"
+        elif fault == 'chatter':
+            article = "好的，下面是为你撰写的文章：\n\n" + article.split('---\n', 2)[-1] * 20
+
+        if not request.get('stream'):
+            self._send_json(200, completion_body(request, article, usage))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def send_event(payload):
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        def chunk(delta, finish_reason=None):
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        try:
+            send_event(chunk({"role": "assistant", "content": ""}))
+            for start in range(0, len(article), self.chunk_size):
+                if fault == 'disconnect' and start >= len(article) // 2:
+                    # 输出一半后断开，模拟流中断
+                    return
+                send_event(chunk({"content": article[start:start + self.chunk_size]}))
+                if self.chunk_delay:
+                    time.sleep(self.chunk_delay)
+            send_event(chunk({}, "content_filter" if fault == 'content_filter' else "stop"))
+            if (request.get('stream_options') or {}).get('include_usage'):
+                payload = chunk({})
+                payload["choices"] = []
+                payload["usage"] = usage
+                send_event(payload)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容桩服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求开始输出前的延迟（秒）")
+    parser.add_argument('--chunk-size', type=int, default=16, help="每个流式分片的字符数")
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help="流式分片之间的延迟（秒）")
+    parser.add_argument('--data-dir', default='.stub_openai', help="Files / Batches 接口的存储目录")
+    parser.add_argument('--batch-delay', type=float, default=0.5, help="批任务各阶段之间的延迟（秒）")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="注入故障的请求比例（0~1）")
+    parser.add_argument('--fail-first', type=int, default=0,
+                        help="前 N 个请求依次按 --fail-kinds 注入故障（可重复的测试用），设置后忽略 --fail-rate")
+    parser.add_argument('--fail-kinds', default='429,500,timeout,disconnect',
+                        help="注入的故障类型，逗号分隔：429,500,502,503,timeout,disconnect,content_filter,wrapped,chatter")
+    parser.add_argument('--fail-model', help="只对该模型的请求注入故障，用于测试降级")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="429 响应中 Retry-After 的秒数")
+    parser.add_argument('--timeout-delay', type=float, default=5.0, help="timeout 故障在断开连接前等待的秒数")
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.chunk_size = args.chunk_size
+    StubHandler.chunk_delay = args.chunk_delay
+    StubHandler.batch_delay = args.batch_delay
+    StubHandler.store = FileStore(args.data_dir)
+    StubHandler.fail_rate = args.fail_rate
+    StubHandler.fail_first = args.fail_first
+    StubHandler.fail_kinds = tuple(kind.strip() for kind in args.fail_kinds.split(',') if kind.strip())
+    StubHandler.fail_model = args.fail_model
+    StubHandler.retry_after = args.retry_after
+    StubHandler.timeout_delay = args.timeout_delay
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Stub OpenAI server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()